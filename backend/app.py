@@ -7,6 +7,7 @@ sys.path.insert(0, str(backend_dir))
 
 from flask import Flask, request, jsonify, send_from_directory, g
 from flask_cors import CORS
+import click
 from utils.firebase_connector import initialize_firebase, get_db
 from dotenv import load_dotenv
 import os
@@ -23,7 +24,14 @@ from routes.ai_recipes import ai_recipes_bp
 from routes.dashboard import dashboard_bp
 from routes.receipt_scanner import receipt_scanner_bp
 from routes.food_scanner import food_scanner_bp
-from utils.auth import attach_current_user
+from routes.jobs import jobs_bp
+from utils.auth import get_user_cache_stats, public_endpoint
+from services.fridge_service import get_fridge_cache_stats
+from services.ai_service import warm_up_ai_generator
+from services.job_queue import get_job_queue
+from services.scan_cache import get_scan_cache
+from services.vision_client import vision_client_stats
+from services.dashboard_stats import reconcile_stats
 
 # Load environment variables
 load_dotenv()
@@ -54,6 +62,13 @@ initialize_firebase()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Build the shared AI client up front instead of on the first request
+if not warm_up_ai_generator():
+    logger.warning("AI generator unavailable at startup; AI endpoints will retry on demand")
+
+# Open the job store now so scans interrupted by the last shutdown are marked failed
+get_job_queue()
+
 # Register blueprints - AI Recipes only (no CRUD)
 app.register_blueprint(ai_recipes_bp, url_prefix='/api/recipes')
 app.register_blueprint(nutrition_bp, url_prefix='/api/nutrition')
@@ -64,13 +79,10 @@ app.register_blueprint(fridge_bp, url_prefix='/api/fridge')
 app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
 app.register_blueprint(receipt_scanner_bp, url_prefix='/api/receipt')
 app.register_blueprint(food_scanner_bp, url_prefix='/api/food')
+app.register_blueprint(jobs_bp, url_prefix='/api/jobs')
 
-@app.before_request
-def load_authenticated_user():
-    """Attach the current user to the request context."""
-    attach_current_user()
-
-
+# The current user is resolved lazily by require_current_user()/get_current_user_id(),
+# so asset and health traffic never pays for token verification or Firestore reads.
 @app.after_request
 def inject_user_header(response):
     """Surface the resolved user id to the client for subsequent requests."""
@@ -80,6 +92,7 @@ def inject_user_header(response):
 
 @app.route('/')
 @app.route('/<path:path>')
+@public_endpoint
 def serve_react_app(path=''):
     """Serve the React application for all non-API routes"""
     if path and os.path.exists(os.path.join(app.static_folder, path)):
@@ -88,6 +101,7 @@ def serve_react_app(path=''):
         return send_from_directory(app.static_folder, 'index.html')
 
 @app.route('/api/health')
+@public_endpoint
 def health_check():
     """Health check endpoint"""
     try:
@@ -100,10 +114,16 @@ def health_check():
         logger.error(f"Database connection error: {e}")
         db_status = "disconnected"
     
+    scan_cache = get_scan_cache()
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.utcnow().isoformat(),
         'database': db_status,
+        'user_cache': get_user_cache_stats(),
+        'fridge_cache': get_fridge_cache_stats(),
+        'jobs': get_job_queue().stats(),
+        'scan_cache': scan_cache.stats() if scan_cache else None,
+        'vision_model': vision_client_stats(),
         'version': '1.0.0'
     })
 
@@ -123,6 +143,25 @@ def bad_request(error):
     """Handle 400 errors"""
     return jsonify({'error': 'Bad request', 'message': str(error)}), 400
 
+@app.cli.command('reconcile-dashboard-stats')
+@click.option('--user-id', default=None, help='Reconcile a single user instead of every user')
+def reconcile_dashboard_stats_command(user_id):
+    """Rebuild users/{uid}/stats/dashboard from the fridge, recipe and meal plan documents.
+
+    Run periodically (e.g. nightly from cron) to repair counter drift and
+    prune past per-day entries; the dashboard also reconciles lazily.
+    """
+    db = get_db()
+    user_ids = [user_id] if user_id else [doc.id for doc in db.collection('User').select([]).stream()]
+    failed = 0
+    for uid in user_ids:
+        try:
+            reconcile_stats(db, uid)
+        except Exception as e:
+            failed += 1
+            logger.error(f"Failed to reconcile dashboard stats for user {uid}: {e}")
+    click.echo(f"Reconciled dashboard stats for {len(user_ids) - failed}/{len(user_ids)} users")
+
 if __name__ == '__main__':
     # Run the application without the Flask reloader to mirror production behavior
     port = int(os.getenv('PORT', 5000))
@@ -0,0 +1,141 @@
+"""
+Benchmark: meal plan -> grocery list on a synthetic 3-month plan
+
+Generates three meals a day for 90 days drawn from a pool of recipes, plus
+a stocked fridge, and compares the old per-route loop (one recipe get() per
+plan, string name_unit keys) with the shared aggregation engine (one
+batched get_all for all recipes). Firestore is simulated by sleeping a
+fixed latency per round trip; CPU time of the aggregation itself is real.
+
+Usage (from backend/):
+    python benchmarks/bench_grocery_aggregation.py [--days 90] [--recipes 40] [--rpc-ms 15] [--runs 3]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.grocery_aggregation import (  # noqa: E402
+    aggregate_ingredients, shopping_items, subtract_fridge_stock
+)
+
+INGREDIENTS = [
+    ('flour', ('g', 'kg')), ('sugar', ('g', 'kg')), ('butter', ('g',)), ('milk', ('ml', 'l', 'cup')),
+    ('rice', ('g', 'kg')), ('pasta', ('g',)), ('chicken breast', ('g', 'kg', 'lb')), ('beef', ('g', 'kg')),
+    ('tomato', ('pcs', 'piece')), ('onion', ('pcs',)), ('garlic', ('clove',)), ('olive oil', ('tbsp', 'ml')),
+    ('egg', ('pcs', 'dozen')), ('cheddar', ('g', 'oz')), ('spinach', ('g',)), ('carrot', ('pcs',)),
+    ('potato', ('g', 'kg')), ('yogurt', ('ml', 'cup')), ('lemon', ('pcs',)), ('salt', ('tsp', 'g')),
+]
+
+
+class SimulatedRpc:
+    """Counts Firestore round trips and sleeps ``latency_ms`` for each."""
+
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+        self.calls = 0
+
+    def __call__(self, result):
+        self.calls += 1
+        time.sleep(self.latency)
+        return result
+
+
+def make_dataset(days: int, recipe_count: int, seed: int = 7):
+    rng = random.Random(seed)
+    recipes = {}
+    for index in range(recipe_count):
+        ingredients = []
+        for name, units in rng.sample(INGREDIENTS, rng.randint(5, 10)):
+            display = name.title() if rng.random() < 0.3 else name + ('s' if rng.random() < 0.2 else '')
+            ingredients.append({'name': display, 'quantity': rng.choice([1, 2, 0.5, 100, 250]), 'unit': rng.choice(units)})
+        recipes[f"Recipe/r{index}"] = {'ingredients': ingredients}
+
+    plans = [
+        {'recipe': rng.choice(list(recipes)), 'servings': rng.choice([1, 2, 4])}
+        for _ in range(days * 3)
+    ]
+    fridge = [
+        {'ingredientName': name, 'quantity': rng.choice([1, 200, 500]), 'unit': units[0]}
+        for name, units in rng.sample(INGREDIENTS, 12)
+    ]
+    return plans, recipes, fridge
+
+
+def legacy(plans, recipes, fridge, rpc):
+    """The loop both routes used to run (keys on "name_unit", get() per plan)."""
+    items = {}
+    for plan in rpc(plans):
+        servings = plan.get('servings', 1)
+        ingredients = rpc(recipes[plan['recipe']])['ingredients']
+        for ing in ingredients:
+            quantity = float(ing.get('quantity', 1)) * servings
+            key = f"{ing['name'].lower()}_{ing['unit']}"
+            if key in items:
+                items[key]['quantity'] += quantity
+            else:
+                items[key] = {'name': ing['name'], 'quantity': quantity, 'unit': ing['unit']}
+    rpc([])  # the 'Fridge' query, which never matched anything
+    return [item for item in items.values() if item['quantity'] > 0]
+
+
+class Snapshot:
+    def __init__(self, data):
+        self._data = data
+
+    def to_dict(self):
+        return self._data
+
+
+def engine(plans, recipes, fridge, rpc):
+    """Range query, one get_all for the distinct recipes, cached fridge snapshot."""
+    plans = rpc(plans)
+    wanted = {plan['recipe'] for plan in plans}
+    fetched = rpc({path: Snapshot(recipes[path]) for path in wanted})
+    resolved = [{**plan, 'ingredients': fetched[plan['recipe']].to_dict()['ingredients'], 'recipe': None} for plan in plans]
+    entries = aggregate_ingredients(resolved, {})
+    subtract_fridge_stock(entries, fridge)
+    return shopping_items(entries)
+
+
+def measure(func, runs):
+    timings, calls, result = [], 0, None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result, calls = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), calls, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--recipes', type=int, default=40)
+    parser.add_argument('--rpc-ms', type=float, default=15.0, help='Simulated Firestore round trip')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    plans, recipes, fridge = make_dataset(args.days, args.recipes)
+    print(f"{len(plans)} meal plans over {args.days} days, {len(recipes)} recipes, {len(fridge)} fridge items")
+    print(f"Simulated round trip: {args.rpc_ms:.0f} ms, median of {args.runs} runs\n")
+    print(f"{'pipeline':<12}{'round trips':>12}{'lines':>8}{'latency':>12}{'cpu only':>12}")
+
+    for label, func in (('legacy', legacy), ('engine', engine)):
+        def run():
+            rpc = SimulatedRpc(args.rpc_ms)
+            return func(plans, recipes, fridge, rpc), rpc.calls
+
+        def run_cpu():
+            return func(plans, recipes, fridge, SimulatedRpc(0)), 0
+
+        ms, calls, items = measure(run, args.runs)
+        cpu_ms, _, _ = measure(run_cpu, args.runs)
+        print(f"{label:<12}{calls:>12}{len(items):>8}{ms:>10.0f} ms{cpu_ms:>9.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
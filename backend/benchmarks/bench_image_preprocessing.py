@@ -0,0 +1,101 @@
+"""
+Benchmark: vision scan latency with and without image preprocessing
+
+Builds a synthetic phone-sized photo, wraps it in the JSON body the scanners
+receive, and times the request path end to end against a stubbed vision
+model whose latency grows with the payload it is sent (upload + image
+tokenisation). Real model latency differs, but the payload-driven part is
+what preprocessing removes.
+
+Usage (from backend/):
+    python benchmarks/bench_image_preprocessing.py [--runs 5] [--ms-per-mb 350]
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image  # noqa: E402
+
+from services.image_preprocessing import PHOTO, RECEIPT, preprocess_image  # noqa: E402
+
+
+def make_photo(width=4032, height=3024, quality=92) -> bytes:
+    """Noisy gradient image - compresses about as badly as a real phone photo."""
+    noise = Image.effect_noise((width, height), 48).convert('RGB')
+    gradient = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    photo = Image.blend(noise, gradient, 0.5)
+    buffer = io.BytesIO()
+    photo.save(buffer, format='JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+class StubVisionModel:
+    """Stand-in for ollama.chat: decodes the image and sleeps per MB received."""
+
+    def __init__(self, base_ms: float, ms_per_mb: float):
+        self.base_ms = base_ms
+        self.ms_per_mb = ms_per_mb
+
+    def __call__(self, image_base64: str) -> dict:
+        request_body = json.dumps({'images': [image_base64]})
+        base64.b64decode(json.loads(request_body)['images'][0])
+        time.sleep((self.base_ms + self.ms_per_mb * len(request_body) / 1e6) / 1000)
+        return {'is_food': True}
+
+
+def run_raw(body: bytes, model: StubVisionModel) -> int:
+    image_base64 = json.loads(body)['image']
+    if 'base64,' in image_base64:
+        image_base64 = image_base64.split('base64,')[1]
+    model(image_base64)
+    return len(image_base64)
+
+
+def run_preprocessed(body: bytes, model: StubVisionModel, mode: str) -> int:
+    prepared = preprocess_image(json.loads(body)['image'], mode=mode)
+    model(prepared.base64)
+    return len(prepared.base64)
+
+
+def measure(func, runs: int):
+    timings = []
+    payload = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        payload = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), payload
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--base-ms', type=float, default=800.0, help='Fixed stub model latency')
+    parser.add_argument('--ms-per-mb', type=float, default=350.0, help='Stub latency per MB of request')
+    args = parser.parse_args()
+
+    photo = make_photo()
+    body = json.dumps({'image': 'data:image/jpeg;base64,' + base64.b64encode(photo).decode('ascii')}).encode()
+    model = StubVisionModel(args.base_ms, args.ms_per_mb)
+
+    print(f"Source photo: 4032x3024, {len(photo) / 1e6:.2f} MB JPEG, request body {len(body) / 1e6:.2f} MB")
+    print(f"Stub model: {args.base_ms:.0f} ms + {args.ms_per_mb:.0f} ms/MB, median of {args.runs} runs\n")
+    print(f"{'pipeline':<26}{'payload to model':>18}{'latency':>12}")
+
+    raw_ms, raw_payload = measure(lambda: run_raw(body, model), args.runs)
+    print(f"{'raw base64':<26}{raw_payload / 1e6:>15.2f} MB{raw_ms:>10.0f} ms")
+
+    for label, mode in (('preprocessed (photo)', PHOTO), ('preprocessed (receipt)', RECEIPT)):
+        ms, payload = measure(lambda: run_preprocessed(body, model, mode), args.runs)
+        print(f"{label:<26}{payload / 1e6:>15.2f} MB{ms:>10.0f} ms  ({100 * (raw_ms - ms) / raw_ms:+.0f}% faster)")
+
+
+if __name__ == '__main__':
+    main()
@@ -57,6 +57,47 @@ class Config:
     GEMINI_EMBEDDING_MODEL = os.getenv('GEMINI_EMBEDDING_MODEL', 'models/text-embedding-004')
     
     # AI Generation Mode: Direct (no RAG, no dataset required)
+    AI_MAX_CONCURRENCY = int(os.getenv('AI_MAX_CONCURRENCY', '3'))  # Concurrent Gemini calls per process
+    AI_CALL_TIMEOUT = float(os.getenv('AI_CALL_TIMEOUT', '30'))  # Seconds per generation call
+    
+    # AI recipe response cache (local SQLite file, survives restarts)
+    RECIPE_CACHE_ENABLED = os.getenv('RECIPE_CACHE_ENABLED', 'true').lower() == 'true'
+    RECIPE_CACHE_PATH = os.getenv('RECIPE_CACHE_PATH', str(DATA_DIR / 'recipe_cache.sqlite3'))
+    RECIPE_CACHE_TTL = int(os.getenv('RECIPE_CACHE_TTL', '604800'))  # 7 days
+    RECIPE_CACHE_MAX_ENTRIES = int(os.getenv('RECIPE_CACHE_MAX_ENTRIES', '5000'))
+    RECIPE_CACHE_VARIANTS = int(os.getenv('RECIPE_CACHE_VARIANTS', '3'))  # Pool size per request; 1 = max reuse
+    
+    # Ollama vision model (receipt and food scanners)
+    OLLAMA_HOST = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
+    OLLAMA_VISION_MODEL = os.getenv('OLLAMA_VISION_MODEL', 'qwen3-vl:235b-instruct-cloud')
+    OLLAMA_CONNECT_TIMEOUT = float(os.getenv('OLLAMA_CONNECT_TIMEOUT', '5'))  # Seconds to establish a connection
+    OLLAMA_READ_TIMEOUT = float(os.getenv('OLLAMA_READ_TIMEOUT', '90'))  # Seconds to wait for the model's reply
+    OLLAMA_POOL_SIZE = int(os.getenv('OLLAMA_POOL_SIZE', '4'))  # Kept-alive connections to Ollama
+    OLLAMA_MAX_RETRIES = int(os.getenv('OLLAMA_MAX_RETRIES', '2'))  # Retries on connect errors / 5xx
+    OLLAMA_BACKOFF_BASE = float(os.getenv('OLLAMA_BACKOFF_BASE', '0.5'))  # Seconds, doubled per retry (jittered)
+    OLLAMA_BACKOFF_MAX = float(os.getenv('OLLAMA_BACKOFF_MAX', '4'))
+    OLLAMA_BREAKER_THRESHOLD = int(os.getenv('OLLAMA_BREAKER_THRESHOLD', '5'))  # Consecutive failures before failing fast
+    OLLAMA_BREAKER_RESET = float(os.getenv('OLLAMA_BREAKER_RESET', '30'))  # Seconds before a trial call is let through
+    
+    # Vision scans: uploads are downscaled/re-encoded before reaching the model
+    VISION_PREPROCESS_ENABLED = os.getenv('VISION_PREPROCESS_ENABLED', 'true').lower() == 'true'
+    VISION_MAX_EDGE = int(os.getenv('VISION_MAX_EDGE', '1600'))  # Longest edge in pixels
+    VISION_JPEG_QUALITY = int(os.getenv('VISION_JPEG_QUALITY', '85'))
+    MAX_IMAGE_UPLOAD_BYTES = int(os.getenv('MAX_IMAGE_UPLOAD_BYTES', str(15 * 1024 * 1024)))  # 15 MB
+    
+    # Vision scan results keyed by image content hash (memory + local SQLite file)
+    SCAN_CACHE_ENABLED = os.getenv('SCAN_CACHE_ENABLED', 'true').lower() == 'true'
+    SCAN_CACHE_PATH = os.getenv('SCAN_CACHE_PATH', str(DATA_DIR / 'scan_cache.sqlite3'))
+    SCAN_CACHE_TTL = int(os.getenv('SCAN_CACHE_TTL', '2592000'))  # 30 days; also the receipt re-scan window
+    SCAN_CACHE_MAX_BYTES = int(os.getenv('SCAN_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))  # LRU size cap on disk
+    SCAN_CACHE_MEMORY_SIZE = int(os.getenv('SCAN_CACHE_MEMORY_SIZE', '256'))  # Entries kept in process
+    
+    # Background jobs (vision scans); status is kept in a local SQLite file
+    JOB_QUEUE_PATH = os.getenv('JOB_QUEUE_PATH', str(DATA_DIR / 'jobs.sqlite3'))
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))  # Concurrent vision model calls per process
+    JOB_MAX_PENDING = int(os.getenv('JOB_MAX_PENDING', '20'))  # Queued + running jobs before rejecting
+    JOB_RESULT_TTL = int(os.getenv('JOB_RESULT_TTL', '3600'))  # Keep finished results for 1 hour
+    JOB_MAX_WAIT = float(os.getenv('JOB_MAX_WAIT', '25'))  # Upper bound for long-poll waits (seconds)
     
     # Logging
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
@@ -72,6 +113,17 @@ class Config:
     JWT_ACCESS_TOKEN_EXPIRES = int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES', '3600'))  # 1 hour
     JWT_REFRESH_TOKEN_EXPIRES = int(os.getenv('JWT_REFRESH_TOKEN_EXPIRES', '2592000'))  # 30 days
     
+    # User session cache (per process)
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '300'))  # 5 minutes
+    USER_CACHE_MAX_SIZE = int(os.getenv('USER_CACHE_MAX_SIZE', '2048'))
+    
+    # Fridge inventory snapshot cache (per process, invalidated on writes)
+    FRIDGE_CACHE_TTL = int(os.getenv('FRIDGE_CACHE_TTL', '120'))  # 2 minutes
+    FRIDGE_CACHE_MAX_SIZE = int(os.getenv('FRIDGE_CACHE_MAX_SIZE', '1024'))
+    
+    # Dashboard counters (users/{uid}/stats/dashboard) are rebuilt from scratch after this long
+    DASHBOARD_STATS_MAX_AGE = int(os.getenv('DASHBOARD_STATS_MAX_AGE', '86400'))  # 1 day
+    
     # Demo mode
     DEMO_MODE_ENABLED = os.getenv('DEMO_MODE_ENABLED', 'true').lower() == 'true'
     DEMO_USER_ID = 'demo_user_01'
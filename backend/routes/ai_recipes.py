@@ -2,11 +2,18 @@
 AI-powered recipe generation routes
 Accessible from all pages without authentication
 """
-from flask import Blueprint, request, jsonify, g
+from flask import Blueprint, Response, request, jsonify, g, stream_with_context
 from utils.firebase_connector import get_db
-from utils.auth import get_current_user_id
-from services.ai_service import AIRecipeGenerator
+from utils.auth import get_current_user_id, public_endpoint
+from services.ai_service import RECIPE_REQUIRED_FIELDS, get_ai_generator, ai_generator_status
+from services.llm_json import strip_code_fences, validate_items
+from services.fridge_service import get_fridge_ingredient_names
+from services.recipe_cache import get_recipe_cache, requirements_fingerprint
+from services.recipe_stream import IncrementalRecipeParser
+from services.dashboard_stats import recipe_change, stats_writes
+from utils.firestore_batch import commit_batched
 from utils.response_handler import success_response, error_response
+import json
 import logging
 from datetime import datetime
 from google.cloud.firestore_v1.base_query import FieldFilter
@@ -14,19 +21,9 @@ from google.cloud.firestore_v1.base_query import FieldFilter
 logger = logging.getLogger(__name__)
 ai_recipes_bp = Blueprint('ai_recipes', __name__)
 
-# Initialize services
-ai_generator = None
-
 def initialize_services():
-    """Initialize AI services"""
-    global ai_generator
-    
-    if ai_generator is None:
-        try:
-            ai_generator = AIRecipeGenerator()
-            logger.info("✅ AI generator initialized")
-        except Exception as e:
-            logger.error(f"❌ Failed to initialize AI generator: {e}")
+    """Return the shared AI generator (None if unavailable)"""
+    return get_ai_generator()
 
 def get_user_id():
     """Get user ID from request context or use demo user"""
@@ -80,6 +77,113 @@ def _build_direct_prompt(user_query, user_requirements):
     
     return "\n".join(prompt_parts)
 
+def _resolve_generation_request(data, db):
+    """
+    Extract generation parameters from a request body, optionally filling
+    them from the user's stored preferences and fridge
+    
+    Raises:
+        ValueError: If neither a query nor any ingredients are available
+    """
+    # Get user ID (from request or use demo)
+    user_id = data.get('userId') or get_user_id()
+    
+    # Extract parameters with defaults
+    user_query = data.get('query', '')
+    ingredients = data.get('ingredients', [])
+    dietary_preferences = data.get('dietary_preferences', [])
+    preferred_cuisines = data.get('preferred_cuisines', [])
+    max_cooking_time = data.get('max_cooking_time')
+    difficulty = data.get('difficulty', 'medium')
+    cooking_skill = data.get('cooking_skill', 'medium')
+    servings = data.get('servings', 4)
+    use_fridge = data.get('use_fridge', False)
+    use_preferences = data.get('use_preferences', False)
+    
+    # OPTIONAL: Fetch user preferences from database
+    if use_preferences:
+        try:
+            user_doc = db.collection('User').document(user_id).get()
+            if user_doc.exists:
+                user_data = user_doc.to_dict()
+                dietary_preferences = dietary_preferences or user_data.get('dietaryPreferences', [])
+                preferred_cuisines = preferred_cuisines or user_data.get('preferredCuisines', [])
+                cooking_skill = cooking_skill or user_data.get('cookingSkill', 'medium')
+                max_cooking_time = max_cooking_time or user_data.get('maxCookingTime', 60)
+                servings = servings or user_data.get('defaultServings', 4)
+                logger.info(f"📝 Loaded preferences for user {user_id}")
+        except Exception as e:
+            logger.warning(f"Could not load user preferences: {e}")
+    
+    # OPTIONAL: Fetch ingredients from user's fridge
+    if use_fridge:
+        try:
+            fridge_ingredients = get_fridge_ingredient_names(db, user_id)
+            
+            if fridge_ingredients:
+                ingredients = ingredients or fridge_ingredients
+                logger.info(f"🍳 Using {len(fridge_ingredients)} ingredients from fridge")
+        except Exception as e:
+            logger.warning(f"Could not load fridge ingredients: {e}")
+    
+    # Validate: Need at least a query OR ingredients
+    if not user_query and not ingredients:
+        raise ValueError('Provide either a query or at least one ingredient')
+    
+    return {
+        'user_id': user_id,
+        'user_query': user_query,
+        'use_fridge': use_fridge,
+        'use_preferences': use_preferences,
+        'save_to_db': data.get('save_to_db', True),
+        'fresh': data.get('fresh', False),
+        'requirements': {
+            'ingredients': ingredients,
+            'dietary_preferences': dietary_preferences,
+            'preferred_cuisines': preferred_cuisines,
+            'max_cooking_time': max_cooking_time,
+            'difficulty': difficulty,
+            'cooking_skill': cooking_skill,
+            'servings': servings
+        }
+    }
+
+def _finalize_generated_recipe(db, generated_recipe, params):
+    """Attach generation metadata and optionally save the recipe to Firestore"""
+    requirements = params['requirements']
+    
+    generated_recipe['createdAt'] = datetime.utcnow()
+    generated_recipe['generatedByAI'] = True
+    generated_recipe['userId'] = params['user_id']
+    generated_recipe['generationContext'] = {
+        'usedFridge': params['use_fridge'],
+        'usedPreferences': params['use_preferences'],
+        'ingredientsProvided': len(requirements['ingredients']),
+        'preferencesApplied': len(requirements['dietary_preferences']) + len(requirements['preferred_cuisines'])
+    }
+    if params['user_query']:
+        generated_recipe['userQuery'] = params['user_query']
+    
+    if params['save_to_db']:
+        recipe_ref = db.collection('Recipe').document()
+        writes = [('set', recipe_ref, generated_recipe)]
+        if params['user_id']:
+            writes += stats_writes(db, params['user_id'], recipe_change(generated_recipe))
+        commit_batched(db, writes)
+        generated_recipe['id'] = recipe_ref.id
+        logger.info(f"💾 Saved generated recipe: {recipe_ref.id}")
+    
+    return generated_recipe
+
+def _generation_context(params, cache_status):
+    return {
+        'user_id': params['user_id'],
+        'used_fridge': params['use_fridge'],
+        'used_preferences': params['use_preferences'],
+        'ingredients_count': len(params['requirements']['ingredients']),
+        'cache': cache_status
+    }
+
 @ai_recipes_bp.route('/generate-with-ai', methods=['POST', 'OPTIONS'])
 def generate_recipe_with_ai():
     """
@@ -101,6 +205,7 @@ def generate_recipe_with_ai():
         "use_fridge": false,  // If true, fetch ingredients from user's fridge
         "use_preferences": false,  // If true, fetch user preferences from DB
         "save_to_db": true,
+        "fresh": false,  // If true, bypass the recipe cache and always call the model
         "userId": "optional_user_id"  // Optional, defaults to demo_user_01
     }
     
@@ -119,123 +224,45 @@ def generate_recipe_with_ai():
             return success_response({'message': 'CORS preflight successful'})
         
         # Initialize services if needed
-        initialize_services()
+        ai_generator = initialize_services()
         
         if not ai_generator:
             return error_response('AI services not initialized. Check GEMINI_API_KEY in backend/.env', 503)
         
-        # Get request data
-        data = request.get_json() or {}
-        
-        # Get user ID (from request or use demo)
-        user_id = data.get('userId') or get_user_id()
-        
-        # Extract parameters with defaults
-        user_query = data.get('query', '')
-        ingredients = data.get('ingredients', [])
-        dietary_preferences = data.get('dietary_preferences', [])
-        preferred_cuisines = data.get('preferred_cuisines', [])
-        max_cooking_time = data.get('max_cooking_time')
-        difficulty = data.get('difficulty', 'medium')
-        cooking_skill = data.get('cooking_skill', 'medium')
-        servings = data.get('servings', 4)
-        save_to_db = data.get('save_to_db', True)
-        use_fridge = data.get('use_fridge', False)
-        use_preferences = data.get('use_preferences', False)
-        
         db = get_db()
+        params = _resolve_generation_request(request.get_json() or {}, db)
+        user_query = params['user_query']
+        user_requirements = params['requirements']
         
-        # OPTIONAL: Fetch user preferences from database
-        if use_preferences:
-            try:
-                user_doc = db.collection('User').document(user_id).get()
-                if user_doc.exists:
-                    user_data = user_doc.to_dict()
-                    dietary_preferences = dietary_preferences or user_data.get('dietaryPreferences', [])
-                    preferred_cuisines = preferred_cuisines or user_data.get('preferredCuisines', [])
-                    cooking_skill = cooking_skill or user_data.get('cookingSkill', 'medium')
-                    max_cooking_time = max_cooking_time or user_data.get('maxCookingTime', 60)
-                    servings = servings or user_data.get('defaultServings', 4)
-                    logger.info(f"📝 Loaded preferences for user {user_id}")
-            except Exception as e:
-                logger.warning(f"Could not load user preferences: {e}")
-        
-        # OPTIONAL: Fetch ingredients from user's fridge
-        if use_fridge:
-            try:
-                fridge_query = db.collection('FridgeItem').where(
-                    filter=FieldFilter('userId', '==', user_id)
-                )
-                fridge_docs = fridge_query.stream()
-                
-                fridge_ingredients = []
-                for doc in fridge_docs:
-                    item = doc.to_dict()
-                    ingredient_name = item.get('ingredientName')
-                    if ingredient_name:
-                        fridge_ingredients.append(ingredient_name)
-                
-                if fridge_ingredients:
-                    ingredients = ingredients or fridge_ingredients
-                    logger.info(f"🍳 Using {len(fridge_ingredients)} ingredients from fridge")
-            except Exception as e:
-                logger.warning(f"Could not load fridge ingredients: {e}")
-        
-        # Validate: Need at least a query OR ingredients
-        if not user_query and not ingredients:
-            return error_response('Provide either a query or at least one ingredient', 400)
-        
-        logger.info(f"🎯 Generating recipe - Query: '{user_query}', Ingredients: {ingredients}, User: {user_id}")
-        
-        # Build user requirements
-        user_requirements = {
-            'ingredients': ingredients,
-            'dietary_preferences': dietary_preferences,
-            'preferred_cuisines': preferred_cuisines,
-            'max_cooking_time': max_cooking_time,
-            'difficulty': difficulty,
-            'cooking_skill': cooking_skill,
-            'servings': servings
-        }
-
+        logger.info(f"🎯 Generating recipe - Query: '{user_query}', Ingredients: {user_requirements['ingredients']}, User: {params['user_id']}")
         logger.info("🤖 Using direct AI generation")
         
         # BUILD PROMPT
         context_prompt = _build_direct_prompt(user_query, user_requirements)
         
-        # GENERATION - Create recipe with AI
-        generated_recipe = ai_generator.generate_recipe(
-            context_prompt=context_prompt,
-            temperature=0.9  # High creativity
-        )
-        
-        # Add comprehensive metadata
-        generated_recipe['createdAt'] = datetime.utcnow()
-        generated_recipe['generatedByAI'] = True
-        generated_recipe['userId'] = user_id
-        generated_recipe['generationContext'] = {
-            'usedFridge': use_fridge,
-            'usedPreferences': use_preferences,
-            'ingredientsProvided': len(ingredients),
-            'preferencesApplied': len(dietary_preferences) + len(preferred_cuisines)
-        }
-        if user_query:
-            generated_recipe['userQuery'] = user_query
-        
-        # SAVE to Firestore (optional)
-        if save_to_db:
-            _, recipe_ref = db.collection('Recipe').add(generated_recipe)
-            generated_recipe['id'] = recipe_ref.id
-            logger.info(f"💾 Saved generated recipe: {recipe_ref.id}")
+        # CACHE - Serve a pooled recipe for near-identical requests unless "fresh" is set
+        recipe_cache = None if params['fresh'] else get_recipe_cache()
+        fingerprint = requirements_fingerprint(user_query, user_requirements)
+        generated_recipe = recipe_cache.get(fingerprint) if recipe_cache else None
+        cache_status = 'hit' if generated_recipe else 'miss'
+        
+        if generated_recipe is None:
+            # GENERATION - Create recipe with AI
+            generated_recipe = ai_generator.generate_recipe(
+                context_prompt=context_prompt,
+                temperature=0.9  # High creativity
+            )
+            if recipe_cache:
+                recipe_cache.put(fingerprint, generated_recipe)
+        else:
+            logger.info(f"⚡ Served cached recipe for fingerprint {fingerprint[:12]}")
+        
+        # Add metadata and SAVE to Firestore (optional)
+        generated_recipe = _finalize_generated_recipe(db, generated_recipe, params)
         
         return success_response({
             'recipe': generated_recipe,
-            'generation_context': {
-                'user_id': user_id,
-                'used_fridge': use_fridge,
-                'used_preferences': use_preferences,
-                'ingredients_count': len(ingredients)
-            },
+            'generation_context': _generation_context(params, cache_status),
             'message': 'Recipe generated successfully with AI! 🎉'
         }, 201)
         
@@ -249,6 +276,102 @@ def generate_recipe_with_ai():
         traceback.print_exc()
         return error_response(f'Failed to generate recipe: {str(e)}', 500)
 
+def _sse_event(event, data):
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@ai_recipes_bp.route('/generate-with-ai/stream', methods=['POST', 'OPTIONS'])
+def stream_recipe_with_ai():
+    """
+    Streaming variant of /generate-with-ai using Server-Sent Events
+    
+    Takes the same request body as /generate-with-ai. The response is a
+    text/event-stream of:
+        event: start        {"generation_context": {...}}
+        event: field        {"name": "title", "value": "..."}
+        event: ingredient   {"index": 0, "value": {...}}
+        event: instruction  {"index": 0, "value": "..."}
+        event: done         {"recipe": {...}, "generation_context": {...}}
+        event: error        {"message": "..."}
+    
+    Fields are sent as soon as the model has finished writing them, so the
+    title and ingredients can be shown long before the full recipe is done.
+    Cache hits replay the cached recipe through the same events.
+    """
+    # Handle OPTIONS preflight
+    if request.method == 'OPTIONS':
+        return success_response({'message': 'CORS preflight successful'})
+    
+    ai_generator = initialize_services()
+    if not ai_generator:
+        return error_response('AI services not initialized. Check GEMINI_API_KEY in backend/.env', 503)
+    
+    try:
+        db = get_db()
+        params = _resolve_generation_request(request.get_json() or {}, db)
+    except ValueError as e:
+        logger.error(f"Validation error: {e}")
+        return error_response(str(e), 400)
+    except Exception as e:
+        logger.error(f"Error preparing streamed recipe generation: {e}")
+        return error_response(f'Failed to generate recipe: {str(e)}', 500)
+    
+    user_query = params['user_query']
+    user_requirements = params['requirements']
+    recipe_cache = None if params['fresh'] else get_recipe_cache()
+    fingerprint = requirements_fingerprint(user_query, user_requirements)
+    
+    def generate_events():
+        try:
+            cached_recipe = recipe_cache.get(fingerprint) if recipe_cache else None
+            cache_status = 'hit' if cached_recipe else 'miss'
+            yield _sse_event('start', {'generation_context': _generation_context(params, cache_status)})
+            
+            if cached_recipe is not None:
+                # Replay the cached recipe in the same event shape as a live stream
+                parser = IncrementalRecipeParser()
+                for event in parser.feed(json.dumps(cached_recipe)):
+                    yield _sse_event(event['event'], event['data'])
+                recipe = cached_recipe
+            else:
+                context_prompt = _build_direct_prompt(user_query, user_requirements)
+                parser = IncrementalRecipeParser()
+                chunks = []
+                for text in ai_generator.stream_recipe(context_prompt, temperature=0.9):
+                    chunks.append(text)
+                    for event in parser.feed(text):
+                        yield _sse_event(event['event'], event['data'])
+                
+                try:
+                    recipe = json.loads(strip_code_fences(''.join(chunks)))
+                except json.JSONDecodeError:
+                    if not parser.done:
+                        raise ValueError('AI returned incomplete recipe JSON')
+                    recipe = parser.result()
+                
+                if not isinstance(recipe, dict) or not validate_items([recipe], RECIPE_REQUIRED_FIELDS):
+                    raise ValueError('AI returned an incomplete recipe')
+                if recipe_cache:
+                    recipe_cache.put(fingerprint, recipe)
+            
+            recipe = _finalize_generated_recipe(db, recipe, params)
+            yield _sse_event('done', {
+                'recipe': recipe,
+                'generation_context': _generation_context(params, cache_status)
+            })
+        
+        except Exception as e:
+            logger.error(f"Error streaming recipe with AI: {e}")
+            yield _sse_event('error', {'message': f'Failed to generate recipe: {str(e)}'})
+    
+    return Response(
+        stream_with_context(generate_events()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Disable proxy buffering (nginx)
+        }
+    )
 
 @ai_recipes_bp.route('/list', methods=['GET'])
 def list_recipes():
@@ -366,7 +489,8 @@ def generate_multiple_recipes():
         "maxTime": 60,
         "count": 3,
         "cuisine": "italian",
-        "dietaryPreferences": ["healthy"]
+        "dietaryPreferences": ["healthy"],
+        "mode": "batch"  // or "parallel"
     }
     
     Returns: 3 different recipe options
@@ -375,7 +499,7 @@ def generate_multiple_recipes():
         if request.method == 'OPTIONS':
             return success_response({'message': 'CORS preflight successful'})
         
-        initialize_services()
+        ai_generator = initialize_services()
         
         if not ai_generator:
             return error_response('AI service not initialized', 503)
@@ -390,53 +514,86 @@ def generate_multiple_recipes():
         cuisine = data.get('cuisine')
         dietary_prefs = data.get('dietaryPreferences', [])
         count = min(data.get('count', 3), 5)  # Max 5 recipes
+        mode = data.get('mode', 'batch')  # 'batch' = one model call, 'parallel' = one call per recipe
         
         if not ingredients:
             return error_response('At least one ingredient is required', 400)
         
         logger.info(f"🎯 Generating {count} recipes with ingredients: {ingredients}")
         
-        recipes = []
         variation_hints = [
             "Create a classic, traditional version",
             "Create a quick and easy version",
             "Create a gourmet, elevated version"
         ]
         
-        for i in range(count):
-            try:
-                # Build varied prompts for different recipe styles
-                prompt = f"""You are a creative chef AI. {variation_hints[i % len(variation_hints)]}.
-
-Create a unique recipe with these requirements:
-- Main ingredients: {', '.join(ingredients)}
+        requirements = f"""- Main ingredients: {', '.join(ingredients)}
 - Difficulty: {difficulty}
 - Servings: {servings}
 - Maximum time: {max_time} minutes
 {f'- Cuisine style: {cuisine}' if cuisine else ''}
-{f'- Dietary preferences: {", ".join(dietary_prefs)}' if dietary_prefs else ''}
+{f'- Dietary preferences: {", ".join(dietary_prefs)}' if dietary_prefs else ''}"""
+        
+        generated = {}
+        failures = {}
+        
+        if mode == 'batch':
+            # One round-trip: ask for all variations as a JSON array
+            styles = "\n".join(
+                f"{i + 1}. {variation_hints[i % len(variation_hints)]}"
+                for i in range(count)
+            )
+            batch_prompt = f"""You are a creative chef AI. Create {count} different recipes, one per style below, in this order:
+{styles}
 
-Make this recipe distinct from other variations. Be creative!
-Provide clear instructions and realistic nutrition estimates."""
+Every recipe must meet these requirements:
+{requirements}
 
-                recipe = ai_generator.generate_recipe(
-                    context_prompt=prompt,
-                    temperature=0.95  # High creativity for variety
-                )
-                
-                # Add metadata
-                recipe['createdAt'] = datetime.utcnow().isoformat()
-                recipe['generatedByAI'] = True
-                recipe['userId'] = user_id
-                recipe['variationIndex'] = i
-                recipe['servingSize'] = servings
-                
-                recipes.append(recipe)
-                logger.info(f"✅ Generated recipe {i+1}/{count}: {recipe.get('title', 'Unknown')}")
-                
+Make each recipe clearly distinct from the others. Be creative!
+Provide clear instructions and realistic nutrition estimates."""
+            
+            try:
+                batch = ai_generator.generate_recipes(count, batch_prompt, temperature=0.95)
+                generated = dict(enumerate(batch))
             except Exception as e:
-                logger.warning(f"Failed to generate recipe {i+1}: {e}")
-                continue
+                logger.warning(f"Batch recipe generation failed, falling back to parallel calls: {e}")
+        
+        # Parallel mode, or top up whatever the batch call did not return
+        missing = [i for i in range(count) if i not in generated]
+        if missing:
+            # Build varied prompts for different recipe styles
+            prompts = [
+                f"""You are a creative chef AI. {variation_hints[i % len(variation_hints)]}.
+
+Create a unique recipe with these requirements:
+{requirements}
+
+Make this recipe distinct from other variations. Be creative!
+Provide clear instructions and realistic nutrition estimates."""
+                for i in missing
+            ]
+            
+            # Variations are generated concurrently; failures/timeouts are dropped
+            extra, extra_failures = ai_generator.generate_recipes_concurrently(
+                prompts,
+                temperature=0.95  # High creativity for variety
+            )
+            generated.update({missing[j]: recipe for j, recipe in extra.items()})
+            failures.update({missing[j]: error for j, error in extra_failures.items()})
+        
+        recipes = []
+        for i in sorted(generated):
+            recipe = generated[i]
+            
+            # Add metadata
+            recipe['createdAt'] = datetime.utcnow().isoformat()
+            recipe['generatedByAI'] = True
+            recipe['userId'] = user_id
+            recipe['variationIndex'] = i
+            recipe['servingSize'] = servings
+            
+            recipes.append(recipe)
+            logger.info(f"✅ Generated recipe {i+1}/{count}: {recipe.get('title', 'Unknown')}")
         
         if not recipes:
             return error_response('Failed to generate any recipes', 500)
@@ -444,6 +601,11 @@ Provide clear instructions and realistic nutrition estimates."""
         return success_response({
             'recipes': recipes,
             'count': len(recipes),
+            'requested': count,
+            'failed': [
+                {'variationIndex': i, 'error': error}
+                for i, error in sorted(failures.items())
+            ],
             'message': f'Generated {len(recipes)} recipe options! 🎉'
         }, 201)
         
@@ -454,6 +616,7 @@ Provide clear instructions and realistic nutrition estimates."""
         return error_response(f'Failed to generate recipes: {str(e)}', 500)
 
 @ai_recipes_bp.route('/status', methods=['GET'])
+@public_endpoint
 def ai_service_status():
     """
     ℹ️ AI SERVICE STATUS - Check if AI services are operational
@@ -465,13 +628,16 @@ def ai_service_status():
     Returns: Status of all AI services
     """
     try:
-        initialize_services()
+        ai_generator = initialize_services()
+        recipe_cache = get_recipe_cache()
         
         from config import config
         
         status = {
             'ai_generator': 'operational ✅' if ai_generator else 'not initialized ❌',
             'gemini_api_key': 'configured ✅' if config.GEMINI_API_KEY else 'missing ❌',
+            'generator_state': ai_generator_status(),
+            'recipe_cache': recipe_cache.stats() if recipe_cache else 'disabled',
             'mode': 'direct AI generation (no dataset required)'
         }
         
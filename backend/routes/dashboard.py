@@ -2,82 +2,33 @@
 Dashboard Routes - Provides endpoints for dashboard statistics and data
 """
 from flask import Blueprint, request, jsonify
-from datetime import datetime, timedelta
+from datetime import datetime
 from utils.firebase_connector import get_db
 from utils.response_handler import success_response, error_response
+from utils.auth import public_endpoint, require_current_user
+from services.dashboard_stats import get_dashboard_stats as load_dashboard_stats
+from config import config
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
 
 @dashboard_bp.route('/stats', methods=['GET'])
 def get_dashboard_stats():
-    """Get dashboard statistics for the current user"""
+    """Get dashboard statistics for the current user (one read of users/{uid}/stats/dashboard)"""
     try:
-        # Get user_id from request headers or default
-        user_id = request.headers.get('X-User-ID', 'demo_user')
+        user_id = require_current_user()
         db = get_db()
         
-        # Count total recipes
-        recipes_ref = db.collection('users').document(user_id).collection('recipes')
-        recipes = list(recipes_ref.stream())
-        total_recipes = len(recipes)
-        
-        # Count saved/favorite recipes
-        saved_recipes = sum(1 for r in recipes if r.to_dict().get('isFavorite', False))
+        stats = load_dashboard_stats(db, user_id, max_age=config.DASHBOARD_STATS_MAX_AGE)
         
-        # Count fridge items
-        fridge_ref = db.collection('users').document(user_id).collection('fridge')
-        fridge_items = list(fridge_ref.stream())
-        total_fridge_items = len(fridge_items)
-        
-        # Count expiring items (within 3 days)
-        today = datetime.now()
-        expiring_count = 0
-        for item in fridge_items:
-            item_data = item.to_dict()
-            exp_date = item_data.get('expirationDate')
-            if exp_date:
-                if isinstance(exp_date, str):
-                    try:
-                        exp_date = datetime.fromisoformat(exp_date.replace('Z', '+00:00'))
-                    except:
-                        continue
-                if hasattr(exp_date, 'date'):
-                    days_until = (exp_date.date() - today.date()).days
-                    if 0 <= days_until <= 3:
-                        expiring_count += 1
-        
-        # Count meals planned (for this week)
-        meal_plans_ref = db.collection('users').document(user_id).collection('meal_plans')
-        week_start = today - timedelta(days=today.weekday())
-        week_end = week_start + timedelta(days=7)
-        
-        meals_planned = 0
-        for plan in meal_plans_ref.stream():
-            plan_data = plan.to_dict()
-            plan_date = plan_data.get('date')
-            if plan_date:
-                if isinstance(plan_date, str):
-                    try:
-                        plan_date = datetime.fromisoformat(plan_date.replace('Z', '+00:00'))
-                    except:
-                        continue
-                if week_start <= plan_date <= week_end:
-                    meals_planned += len(plan_data.get('meals', []))
-        
-        return success_response({
-            'totalRecipes': total_recipes,
-            'savedRecipes': saved_recipes,
-            'fridgeItems': total_fridge_items,
-            'expiringItems': expiring_count,
-            'mealsPlanned': meals_planned
-        })
+        return success_response(stats)
         
     except Exception as e:
         return error_response(f'Failed to get dashboard stats: {str(e)}', 500)
 
 
 @dashboard_bp.route('/quick-actions', methods=['GET'])
+@public_endpoint
 def get_quick_actions():
     """Get quick action buttons configuration"""
     try:
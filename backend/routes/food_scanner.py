@@ -6,17 +6,20 @@ from flask import Blueprint, request
 from utils.firebase_connector import get_db
 from utils.auth import require_current_user
 from utils.response_handler import success_response, error_response
+from routes.jobs import queue_job_response, run_job_response, wants_async_job
+from services.image_preprocessing import PHOTO, preprocess_image
+from utils.uploads import UploadTooLarge, read_image_upload
+from services.scan_cache import analysis_key, applied_key, cached_analysis, get_scan_cache
+from services.vision_client import VisionServiceError, get_vision_client
+from services.nutrition_aggregates import add_meal_log
 import logging
 import json
+import time
 from datetime import datetime
-from ollama import chat
 
 logger = logging.getLogger(__name__)
 food_scanner_bp = Blueprint('food_scanner', __name__)
 
-# Ollama configuration
-OLLAMA_MODEL = "qwen3-vl:235b-instruct-cloud"
-
 
 def analyze_food_with_ollama(image_base64: str) -> dict:
     """
@@ -75,15 +78,7 @@ Respond ONLY with valid JSON in this exact format:
 
 Do not include any text before or after the JSON. Only output valid JSON."""
 
-        response = chat(
-            model=OLLAMA_MODEL,
-            messages=[{
-                "role": "user",
-                "content": prompt,
-                "images": [image_base64]
-            }]
-        )
-        response_text = response.message.content
+        response_text = get_vision_client().chat(prompt, images=[image_base64])
         
         logger.info(f"Ollama food analysis response: {response_text[:500]}...")
         
@@ -111,22 +106,120 @@ Do not include any text before or after the JSON. Only output valid JSON."""
                 "message": "Could not analyze the food. Please try with a clearer image."
             }
             
+    except VisionServiceError:
+        raise
     except Exception as e:
         logger.error(f"Error analyzing food: {e}")
         raise
 
 
+def process_food_scan(db, user_id: str, image_base64: str, auto_log: bool = False,
+                      date_str: str = None, meal_type: str = None, preprocessing: dict = None,
+                      content_hash: str = None) -> dict:
+    """
+    Analyze a food image and optionally log it as a meal.
+    
+    Runs either inline in the request or on the background job queue.
+    With a ``content_hash``, the analysis of an identical image is served
+    from the scan cache instead of calling the model again, and an image
+    this user has already auto-logged returns the stored meal_id
+    (``duplicate: true``) instead of logging the meal a second time, as
+    long as that meal has not been deleted since.
+    
+    Returns:
+        Response payload for /api/food/scan
+    """
+    # Analyze the food with Ollama (or reuse the analysis of an identical image)
+    scan_cache = get_scan_cache() if content_hash else None
+    analysis_result, analysis_cached = cached_analysis(
+        scan_cache,
+        analysis_key('food', get_vision_client().model, content_hash) if scan_cache else None,
+        lambda: analyze_food_with_ollama(image_base64),
+        cacheable=lambda result: 'nutrition' in result
+    )
+    
+    if not analysis_result.get('is_food', False):
+        return {
+            'is_food': False,
+            'message': analysis_result.get('message', 'This image does not appear to contain food.'),
+            'nutrition': None,
+            'logged': False
+        }
+    
+    # Prepare response data
+    response_data = {
+        'is_food': True,
+        'meal_name': analysis_result.get('meal_name', 'Unknown Meal'),
+        'food_items': analysis_result.get('food_items', []),
+        'portion_size': analysis_result.get('portion_size', 'medium'),
+        'nutrition': analysis_result.get('nutrition', {}),
+        'meal_type_suggestion': analysis_result.get('meal_type_suggestion', 'other'),
+        'health_notes': analysis_result.get('health_notes', ''),
+        'logged': False,
+        'meal_id': None,
+        'analysis_cached': analysis_cached,
+        'preprocessing': preprocessing
+    }
+    
+    # Auto-log the meal if requested
+    if auto_log:
+        date_str = date_str or datetime.now().strftime('%Y-%m-%d')
+        meal_type = meal_type or analysis_result.get('meal_type_suggestion', 'other')
+        
+        user_ref = db.collection('User').document(user_id)
+        
+        meal_data = {
+            'user': user_ref,
+            'mealName': response_data['meal_name'],
+            'date': date_str,
+            'mealType': meal_type,
+            'nutrition': response_data['nutrition'],
+            'foodItems': response_data['food_items'],
+            'portionSize': response_data['portion_size'],
+            'healthNotes': response_data['health_notes'],
+            'source': 'food_scanner',
+            'createdAt': datetime.utcnow()
+        }
+        
+        if scan_cache is None:
+            meal_id = add_meal_log(db, user_id, meal_data)
+        else:
+            marker = applied_key('food', user_id, content_hash)
+            with scan_cache.locked(marker):
+                previous = scan_cache.get(marker)
+                # The marker outlives the meal if the user deleted it; log it again then
+                if previous is not None and not db.collection('NutritionLog').document(previous['meal_id']).get(
+                    field_paths=['date']
+                ).exists:
+                    previous = None
+                if previous is not None:
+                    logger.info(f"♻️ Food scan {content_hash[:12]} already logged for user {user_id}, skipping")
+                    response_data.update({'logged': True, 'meal_id': previous['meal_id'], 'duplicate': True})
+                    return response_data
+                meal_id = add_meal_log(db, user_id, meal_data)
+                scan_cache.set(marker, {'meal_id': meal_id})
+        
+        response_data['logged'] = True
+        response_data['meal_id'] = meal_id
+        
+        logger.info(f"✅ Meal logged successfully: {meal_id}")
+    
+    return response_data
+
+
 @food_scanner_bp.route('/scan', methods=['POST'])
 def scan_food():
     """
     Scan a food image and extract nutrition facts.
     
-    Expected request body:
+    Accepts multipart/form-data with an "image" file part (other fields as
+    form fields), a raw image/* body (fields as query params), or JSON:
     {
         "image": "base64_encoded_image_string",
         "date": "2026-01-05" (optional, defaults to today),
         "meal_type": "breakfast|lunch|dinner|snack" (optional),
-        "auto_log": true (optional, if true automatically logs the meal)
+        "auto_log": true (optional, if true automatically logs the meal),
+        "async": false (optional, or ?async=1 - return a job id to poll at /api/jobs/<id>)
     }
     
     Returns:
@@ -146,73 +239,47 @@ def scan_food():
         user_id = require_current_user()
         db = get_db()
         
-        data = request.get_json()
+        # Multipart, raw image/* or legacy base64 JSON - size-capped before buffering
+        try:
+            image, data = read_image_upload()
+        except UploadTooLarge as e:
+            return error_response(str(e), 413)
         
-        if not data or 'image' not in data:
+        if image is None:
             return error_response('No image provided', 400)
         
-        image_base64 = data['image']
-        
-        # Remove data URL prefix if present
-        if 'base64,' in image_base64:
-            image_base64 = image_base64.split('base64,')[1]
-        
         logger.info(f"🍽️ Scanning food image for user: {user_id}")
         
-        # Analyze the food with Ollama
-        analysis_result = analyze_food_with_ollama(image_base64)
-        
-        if not analysis_result.get('is_food', False):
-            return success_response({
-                'is_food': False,
-                'message': analysis_result.get('message', 'This image does not appear to contain food.'),
-                'nutrition': None,
-                'logged': False
-            })
+        # Decode once and downscale before the model sees it
+        stage_start = time.perf_counter()
+        try:
+            prepared = preprocess_image(image, mode=PHOTO)
+        except ValueError as e:
+            return error_response(str(e), 400)
+        finally:
+            if not isinstance(image, str):
+                image.close()
+        preprocessing = prepared.stats()
+        preprocessing['duration_ms'] = round((time.perf_counter() - stage_start) * 1000, 1)
+        logger.info(f"🖼️ Food image {prepared.original_bytes} -> {prepared.processed_bytes} bytes")
         
-        # Prepare response data
-        response_data = {
-            'is_food': True,
-            'meal_name': analysis_result.get('meal_name', 'Unknown Meal'),
-            'food_items': analysis_result.get('food_items', []),
-            'portion_size': analysis_result.get('portion_size', 'medium'),
-            'nutrition': analysis_result.get('nutrition', {}),
-            'meal_type_suggestion': analysis_result.get('meal_type_suggestion', 'other'),
-            'health_notes': analysis_result.get('health_notes', ''),
-            'logged': False,
-            'meal_id': None
+        scan_args = (db, user_id, prepared.base64)
+        scan_options = {
+            'auto_log': data.get('auto_log', False),
+            'date_str': data.get('date'),
+            'meal_type': data.get('meal_type'),
+            'preprocessing': preprocessing,
+            'content_hash': prepared.content_hash
         }
         
-        # Auto-log the meal if requested
-        auto_log = data.get('auto_log', False)
-        if auto_log:
-            date_str = data.get('date', datetime.now().strftime('%Y-%m-%d'))
-            meal_type = data.get('meal_type', analysis_result.get('meal_type_suggestion', 'other'))
-            
-            user_ref = db.collection('User').document(user_id)
-            
-            meal_data = {
-                'user': user_ref,
-                'mealName': response_data['meal_name'],
-                'date': date_str,
-                'mealType': meal_type,
-                'nutrition': response_data['nutrition'],
-                'foodItems': response_data['food_items'],
-                'portionSize': response_data['portion_size'],
-                'healthNotes': response_data['health_notes'],
-                'source': 'food_scanner',
-                'createdAt': datetime.utcnow()
-            }
-            
-            _, new_log_ref = db.collection('NutritionLog').add(meal_data)
-            
-            response_data['logged'] = True
-            response_data['meal_id'] = new_log_ref.id
-            
-            logger.info(f"✅ Meal logged successfully: {new_log_ref.id}")
+        if wants_async_job(data):
+            return queue_job_response('food_scan', user_id, process_food_scan, *scan_args, **scan_options)
         
-        return success_response(response_data)
+        # Synchronous mode for older clients, still bounded by the job queue's worker pool
+        return run_job_response('food_scan', user_id, process_food_scan, *scan_args, **scan_options)
         
+    except VisionServiceError as e:
+        return error_response(str(e), 503)
     except Exception as e:
         logger.error(f"Error scanning food: {e}")
         return error_response(str(e), 500)
@@ -269,13 +336,13 @@ def log_scanned_food():
             'createdAt': datetime.utcnow()
         }
         
-        _, new_log_ref = db.collection('NutritionLog').add(meal_data)
+        meal_id = add_meal_log(db, user_id, meal_data)
         
-        logger.info(f"✅ Scanned food logged for user {user_id}: {new_log_ref.id}")
+        logger.info(f"✅ Scanned food logged for user {user_id}: {meal_id}")
         
         return success_response({
             'message': 'Meal logged successfully',
-            'meal_id': new_log_ref.id,
+            'meal_id': meal_id,
             'meal_name': data['meal_name'],
             'date': date_str,
             'nutrition': data['nutrition']
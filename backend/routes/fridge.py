@@ -1,8 +1,11 @@
 from flask import Blueprint, request
-from google.cloud.firestore_v1.base_query import FieldFilter
 from utils.firebase_connector import get_db
 from utils.auth import require_current_user
 from utils.response_handler import success_response, error_response
+from services.ai_service import get_ai_generator
+from services.fridge_service import load_fridge_items, invalidate_fridge, consume_fridge_items
+from services.dashboard_stats import fridge_item_change, recipe_change, stats_writes
+from utils.firestore_batch import commit_batched
 import logging
 from datetime import datetime
 
@@ -18,9 +21,6 @@ def get_fridge_items():
         
         logger.info(f"📋 Getting fridge items for user: {user_id}")
 
-        # Start with a base query for the user's items using simple userId field
-        query = db.collection('FridgeItem').where(filter=FieldFilter('userId', '==', user_id))
-
         # Get query parameters
         search = request.args.get('search', '')
         freshness = request.args.get('freshness', 'all')
@@ -29,13 +29,8 @@ def get_fridge_items():
             # For search, we'll filter client-side since Firestore has limitations
             pass
 
-        docs = query.stream()
-        
         items = []
-        for doc in docs:
-            item = doc.to_dict()
-            item['id'] = doc.id
-            
+        for item in load_fridge_items(db, user_id):
             # Normalize field names for frontend compatibility
             if 'ingredientName' in item:
                 item['name'] = item['ingredientName']
@@ -127,7 +122,12 @@ def add_fridge_item():
             'expirationDate': data.get('expirationDate')  # Should be in 'YYYY-MM-DD' format
         }
         
-        _, new_item_ref = db.collection('FridgeItem').add(new_item)
+        new_item_ref = db.collection('FridgeItem').document()
+        commit_batched(db, [
+            ('set', new_item_ref, new_item),
+            *stats_writes(db, user_id, fridge_item_change(new_item))
+        ])
+        invalidate_fridge(user_id)
         
         created_item = new_item_ref.get().to_dict()
         created_item['id'] = new_item_ref.id
@@ -171,7 +171,15 @@ def update_fridge_item(item_id):
         
         if update_data:
             update_data['updatedAt'] = datetime.utcnow()
-            item_ref.update(update_data)
+            # Moves the item between expiry days when expirationDate changes
+            commit_batched(db, [
+                ('update', item_ref, update_data),
+                *stats_writes(
+                    db, user_id,
+                    fridge_item_change(item_data, -1), fridge_item_change({**item_data, **update_data})
+                )
+            ])
+            invalidate_fridge(user_id)
         
         updated_item = item_ref.get().to_dict()
         updated_item['id'] = item_ref.id
@@ -203,7 +211,11 @@ def delete_fridge_item(item_id):
         if item_data.get('userId') != user_id:
             return error_response('Item not found', 404)
         
-        item_ref.delete()
+        commit_batched(db, [
+            ('delete', item_ref, None),
+            *stats_writes(db, user_id, fridge_item_change(item_data, -1))
+        ])
+        invalidate_fridge(user_id)
         
         return success_response({'message': 'Item removed from fridge'})
         
@@ -216,6 +228,10 @@ def consume_ingredients():
     """
     Remove or reduce ingredients from fridge when user cooks a recipe
     
+    Quantities are converted to each item's unit (g/kg, ml/L, cups, pieces...)
+    and subtracted; items without a quantity, with an incompatible unit, or
+    that run out are removed.
+    
     Request body:
     {
         "ingredients": [
@@ -236,36 +252,12 @@ def consume_ingredients():
         
         logger.info(f"🍳 Consuming ingredients for user {user_id}: {ingredients_to_consume}")
         
-        # Get all fridge items for the user
-        query = db.collection('FridgeItem').where(filter=FieldFilter('userId', '==', user_id))
-        docs = list(query.stream())
-        
-        consumed = []
-        not_found = []
+        # Match against the cached fridge, then apply every change in one transaction
+        consumed, not_found = consume_fridge_items(db, user_id, ingredients_to_consume)
         
-        for ingredient in ingredients_to_consume:
-            ingredient_name = ingredient.get('name', '').lower()
-            
-            # Find matching fridge item
-            found = False
-            for doc in docs:
-                item = doc.to_dict()
-                fridge_item_name = item.get('ingredientName', '').lower()
-                
-                # Check if names match (partial match)
-                if ingredient_name in fridge_item_name or fridge_item_name in ingredient_name:
-                    # Delete the item from fridge
-                    doc.reference.delete()
-                    consumed.append({
-                        'name': item.get('ingredientName'),
-                        'id': doc.id
-                    })
-                    found = True
-                    logger.info(f"✅ Consumed: {item.get('ingredientName')}")
-                    break
-            
-            if not found:
-                not_found.append(ingredient_name)
+        for item in consumed:
+            action = 'Removed' if item['removed'] else f"Used {item['quantity_used']} {item['unit']} of"
+            logger.info(f"✅ {action}: {item['name']}")
         
         return success_response({
             'consumed': consumed,
@@ -291,16 +283,10 @@ def suggest_recipes_from_fridge():
         logger.info(f"🔍 Suggesting recipes for user: {user_id}")
         
         # Get all fridge items for the user
-        query = db.collection('FridgeItem').where(filter=FieldFilter('userId', '==', user_id))
-        docs = query.stream()
-        
-        fridge_items = []
+        fridge_items = load_fridge_items(db, user_id)
         ingredients_list = []
         
-        for doc in docs:
-            item = doc.to_dict()
-            item['id'] = doc.id
-            fridge_items.append(item)
+        for item in fridge_items:
             ingredient_name = item.get('ingredientName', '')
             if ingredient_name:
                 ingredients_list.append(ingredient_name)
@@ -319,14 +305,9 @@ def suggest_recipes_from_fridge():
         difficulty = data.get('difficulty', 'medium')
         servings = data.get('servings', 4)
         
-        # Import AI services
-        from services.ai_service import AIRecipeGenerator
-        
-        # Initialize AI service
-        try:
-            ai_generator = AIRecipeGenerator()
-        except Exception as e:
-            logger.error(f"Failed to initialize AI service: {e}")
+        # Shared AI service
+        ai_generator = get_ai_generator()
+        if not ai_generator:
             return error_response('AI service not available. Check GEMINI_API_KEY configuration.', 503)
         
         # Build user query
@@ -370,12 +351,17 @@ def suggest_recipes_from_fridge():
         
         # Add metadata
         generated_recipe['createdAt'] = datetime.utcnow()
+        generated_recipe['userId'] = user_id
         generated_recipe['generatedByAI'] = True
         generated_recipe['basedOnFridge'] = True
         generated_recipe['fridgeIngredients'] = ingredients_list
         
         # Save to database
-        _, recipe_ref = db.collection('Recipe').add(generated_recipe)
+        recipe_ref = db.collection('Recipe').document()
+        commit_batched(db, [
+            ('set', recipe_ref, generated_recipe),
+            *stats_writes(db, user_id, recipe_change(generated_recipe))
+        ])
         generated_recipe['id'] = recipe_ref.id
         
         logger.info(f"Generated recipe from fridge for user {user_id}: {recipe_ref.id}")
@@ -3,6 +3,11 @@ from google.cloud.firestore_v1.base_query import FieldFilter
 from utils.firebase_connector import get_db
 from utils.auth import require_current_user
 from utils.response_handler import success_response, error_response
+from services.grocery_service import (
+    add_items, create_list, delete_item, delete_list, ensure_item_storage, get_active_list,
+    items_collection, load_items, new_item, read_active_pointer, resolve_item, set_item_purchased
+)
+from services.grocery_aggregation import build_grocery_items
 import logging
 from datetime import datetime
 
@@ -10,12 +15,12 @@ logger = logging.getLogger(__name__)
 grocery_bp = Blueprint('grocery', __name__)
 
 
-def _serialize_grocery_list(list_data, list_id):
+def _serialize_grocery_list(list_data, list_id, items):
     """Serialize grocery list data for JSON response"""
     result = {
         'id': list_id,
         'name': list_data.get('name', ''),
-        'items': list_data.get('items', []),
+        'items': items,
         'createdAt': list_data.get('createdAt').isoformat() if list_data.get('createdAt') else None,
         'updatedAt': list_data.get('updatedAt').isoformat() if list_data.get('updatedAt') else None,
         'linkedMealPlan': list_data.get('linkedMealPlan'),
@@ -26,24 +31,13 @@ def _serialize_grocery_list(list_data, list_id):
 
 
 def _get_active_grocery_list(db, user_id):
-    """Helper to get the most recent grocery list for a user (avoids composite index)"""
-    query = db.collection('GroceryList').where(
-        filter=FieldFilter('userId', '==', user_id)
-    )
+    """Helper to get the user's active grocery list (pointer on the User document)"""
+    doc = get_active_list(db, user_id)
     
-    docs = list(query.stream())
-    
-    if not docs:
+    if doc is None:
         return None, None
     
-    # Sort in Python to avoid composite index requirement
-    docs_sorted = sorted(
-        docs, 
-        key=lambda d: d.to_dict().get('createdAt', datetime.min),
-        reverse=True
-    )
-    
-    return docs_sorted[0], docs_sorted[0].to_dict()
+    return doc, doc.to_dict()
 
 
 @grocery_bp.route('/items', methods=['GET'])
@@ -56,7 +50,7 @@ def get_grocery_items():
         doc, list_data = _get_active_grocery_list(db, user_id)
         
         if doc and list_data:
-            items = list_data.get('items', [])
+            items = load_items(db, doc.reference)
             return success_response({
                 'items': items,
                 'listId': doc.id,
@@ -81,40 +75,28 @@ def add_grocery_item():
         if not data or 'name' not in data:
             return error_response('Item name is required', 400)
         
-        new_item = {
-            'name': data['name'],
-            'quantity': data.get('quantity', '1'),
-            'unit': data.get('unit', 'pcs'),
-            'category': data.get('category', 'Other'),
-            'purchased': False,
-            'addedAt': datetime.utcnow().isoformat()
-        }
+        item = new_item(data)
         
         doc, list_data = _get_active_grocery_list(db, user_id)
         
         if doc and list_data:
-            items = list_data.get('items', [])
-            items.append(new_item)
-            doc.reference.update({
-                'items': items,
-                'updatedAt': datetime.utcnow()
-            })
+            # One new item document - the rest of the list is not rewritten
+            added = add_items(db, doc.reference, [item])[0]
             list_id = doc.id
         else:
             # Create new list
             new_list_data = {
                 'userId': user_id,
                 'name': f"Grocery List {datetime.now().strftime('%Y-%m-%d')}",
-                'items': [new_item],
                 'createdAt': datetime.utcnow(),
                 'updatedAt': datetime.utcnow()
             }
-            _, new_ref = db.collection('GroceryList').add(new_list_data)
-            list_id = new_ref.id
+            list_id, created = create_list(db, new_list_data, [item])
+            added = created[0]
         
         return success_response({
             'message': 'Item added successfully',
-            'item': new_item,
+            'item': added,
             'listId': list_id
         }, 201)
         
@@ -123,9 +105,9 @@ def add_grocery_item():
         return error_response('Failed to add grocery item', 500)
 
 
-@grocery_bp.route('/items/<int:item_index>', methods=['DELETE'])
-def delete_grocery_item(item_index):
-    """Delete a grocery item by index"""
+@grocery_bp.route('/items/<item_key>', methods=['DELETE'])
+def delete_grocery_item(item_key):
+    """Delete a grocery item by id (or by index, for older app versions)"""
     try:
         user_id = require_current_user()
         db = get_db()
@@ -135,18 +117,12 @@ def delete_grocery_item(item_index):
         if not doc:
             return error_response('No grocery list found', 404)
         
-        items = list_data.get('items', [])
+        item_ref = resolve_item(db, doc.reference, item_key)
+        removed_item = delete_item(db, doc.reference, item_ref) if item_ref else None
         
-        if item_index < 0 or item_index >= len(items):
+        if removed_item is None:
             return error_response('Item not found', 404)
         
-        removed_item = items.pop(item_index)
-        
-        doc.reference.update({
-            'items': items,
-            'updatedAt': datetime.utcnow()
-        })
-        
         return success_response({
             'message': 'Item deleted successfully',
             'removed': removed_item
@@ -157,33 +133,33 @@ def delete_grocery_item(item_index):
         return error_response('Failed to delete grocery item', 500)
 
 
-@grocery_bp.route('/toggle-purchased/<int:item_index>', methods=['POST'])
-def toggle_item_purchased(item_index):
-    """Toggle the purchased status of an item"""
+@grocery_bp.route('/toggle-purchased/<item_key>', methods=['POST'])
+def toggle_item_purchased(item_key):
+    """
+    Toggle the purchased status of an item (by id, or by index for older app versions)
+    
+    Optional body {"purchased": true|false} sets the flag instead of flipping it,
+    which keeps retries idempotent.
+    """
     try:
         user_id = require_current_user()
         db = get_db()
+        data = request.get_json(silent=True) or {}
         
         doc, list_data = _get_active_grocery_list(db, user_id)
         
         if not doc:
             return error_response('No grocery list found', 404)
         
-        items = list_data.get('items', [])
+        item_ref = resolve_item(db, doc.reference, item_key)
+        item = set_item_purchased(db, doc.reference, item_ref, data.get('purchased')) if item_ref else None
         
-        if item_index < 0 or item_index >= len(items):
+        if item is None:
             return error_response('Item not found', 404)
         
-        items[item_index]['purchased'] = not items[item_index].get('purchased', False)
-        
-        doc.reference.update({
-            'items': items,
-            'updatedAt': datetime.utcnow()
-        })
-        
         return success_response({
             'message': 'Item toggled successfully',
-            'item': items[item_index]
+            'item': item
         })
         
     except Exception as e:
@@ -205,83 +181,17 @@ def create_from_meal_plan():
         if not start_date or not end_date:
             return error_response('start_date and end_date are required', 400)
         
-        # Get meal plans - query by userId only to avoid composite index
-        query = db.collection('MealPlan').where(
-            filter=FieldFilter('userId', '==', user_id)
-        )
-        
-        docs = query.stream()
-        
-        # Aggregate ingredients - filter by date in Python
-        items_dict = {}
-        for doc in docs:
-            plan = doc.to_dict()
-            plan_date = plan.get('planDate', '')
-            
-            # Filter by date range in Python to avoid composite index
-            if not (start_date <= plan_date <= end_date):
-                continue
-                
-            servings = plan.get('servings', 1)
-            
-            ingredients = plan.get('ingredients', [])
-            recipe_ref = plan.get('recipe')
-            if recipe_ref and hasattr(recipe_ref, 'get'):
-                recipe_doc = recipe_ref.get()
-                if recipe_doc.exists:
-                    ingredients = recipe_doc.to_dict().get('ingredients', [])
-            
-            for ing in ingredients:
-                name = ing.get('name', '')
-                if not name:
-                    continue
-                
-                quantity = float(ing.get('quantity', 1)) * servings
-                unit = ing.get('unit', 'pcs')
-                category = ing.get('category', 'Other')
-                
-                key = f"{name.lower()}_{unit}"
-                if key in items_dict:
-                    items_dict[key]['quantity'] = str(float(items_dict[key]['quantity']) + quantity)
-                else:
-                    items_dict[key] = {
-                        'name': name,
-                        'quantity': str(quantity),
-                        'unit': unit,
-                        'category': category,
-                        'purchased': False,
-                        'addedAt': datetime.utcnow().isoformat()
-                    }
-        
-        items_list = list(items_dict.values())
-        
-        # Check fridge inventory
-        fridge_query = db.collection('Fridge').where(filter=FieldFilter('userId', '==', user_id))
-        fridge_docs = fridge_query.stream()
-        
-        fridge_items = {}
-        for fdoc in fridge_docs:
-            fitem = fdoc.to_dict()
-            fridge_items[fitem.get('name', '').lower()] = float(fitem.get('quantity', 0))
-        
-        # Subtract fridge quantities
         final_items = []
-        for item in items_list:
-            name_lower = item['name'].lower()
-            if name_lower in fridge_items:
-                needed = float(item['quantity']) - fridge_items[name_lower]
-                if needed > 0:
-                    item['quantity'] = str(needed)
-                    item['inFridge'] = fridge_items[name_lower]
-                    final_items.append(item)
-            else:
-                final_items.append(item)
-        
-        # Create new grocery list
+        for item in build_grocery_items(db, user_id, start_date, end_date):
+            grocery_item = new_item({**item, 'quantity': str(item['quantity'])})
+            if 'inFridge' in item:
+                grocery_item['inFridge'] = item['inFridge']
+            final_items.append(grocery_item)
+        
+        # Create new grocery list (items are written as their own documents)
         list_data = {
             'userId': user_id,
             'name': f"Meal Plan {start_date} to {end_date}",
-            'items': final_items,
             'linkedMealPlan': True,
             'startDate': start_date,
             'endDate': end_date,
@@ -289,13 +199,13 @@ def create_from_meal_plan():
             'updatedAt': datetime.utcnow()
         }
         
-        _, new_ref = db.collection('GroceryList').add(list_data)
+        list_id, created_items = create_list(db, list_data, final_items)
         
         return success_response({
             'message': 'Grocery list created from meal plan',
-            'listId': new_ref.id,
-            'items': final_items,
-            'totalItems': len(final_items)
+            'listId': list_id,
+            'items': created_items,
+            'totalItems': len(created_items)
         }, 201)
         
     except Exception as e:
@@ -318,8 +228,9 @@ def get_grocery_lists():
         
         lists = []
         for doc in docs:
+            ensure_item_storage(db, doc)
             list_data = doc.to_dict()
-            serialized = _serialize_grocery_list(list_data, doc.id)
+            serialized = _serialize_grocery_list(list_data, doc.id, load_items(db, doc.reference))
             lists.append(serialized)
         
         return success_response({'grocery_lists': lists})
@@ -347,7 +258,8 @@ def delete_grocery_list(list_id):
         if list_data.get('userId') != user_id:
             return error_response('Not authorized', 403)
         
-        list_ref.delete()
+        was_active = read_active_pointer(db, user_id) == list_id
+        delete_list(db, list_ref, user_id, was_active=was_active)
         
         return success_response({'message': 'Grocery list deleted successfully'})
         
@@ -363,13 +275,9 @@ def get_grocery_stats():
         user_id = require_current_user()
         db = get_db()
         
-        query = db.collection('GroceryList').where(
-            filter=FieldFilter('userId', '==', user_id)
-        ).order_by('createdAt', direction='DESCENDING').limit(1)
-        
-        docs = list(query.stream())
+        doc, _ = _get_active_grocery_list(db, user_id)
         
-        if not docs:
+        if not doc:
             return success_response({
                 'totalItems': 0,
                 'purchasedItems': 0,
@@ -377,20 +285,19 @@ def get_grocery_stats():
                 'categories': {}
             })
         
-        list_data = docs[0].to_dict()
-        items = list_data.get('items', [])
-        
-        total = len(items)
-        purchased = sum(1 for item in items if item.get('purchased', False))
-        
-        # Group by category
+        # One projected read gives the totals and the category breakdown from the same snapshot
+        total = 0
+        purchased = 0
         categories = {}
-        for item in items:
+        for item_doc in items_collection(doc.reference).select(['category', 'purchased']).stream():
+            item = item_doc.to_dict()
             cat = item.get('category', 'Other')
             if cat not in categories:
                 categories[cat] = {'total': 0, 'purchased': 0}
+            total += 1
             categories[cat]['total'] += 1
             if item.get('purchased', False):
+                purchased += 1
                 categories[cat]['purchased'] += 1
         
         return success_response({
@@ -0,0 +1,90 @@
+"""
+Background Job Routes
+Poll the status of work queued by other endpoints (e.g. async vision scans)
+"""
+from flask import Blueprint, request
+from config import config
+from utils.auth import require_current_user
+from utils.response_handler import success_response, error_response
+from services.job_queue import JobQueueFull, get_job_queue
+import logging
+
+logger = logging.getLogger(__name__)
+jobs_bp = Blueprint('jobs', __name__)
+
+
+def wants_async_job(data=None):
+    """True when the client asked for a job id instead of waiting (?async=1 or "async": true)"""
+    flag = request.args.get('async', '')
+    if flag.lower() in ('1', 'true', 'yes'):
+        return True
+    return bool(data and data.get('async') is True)
+
+
+def queue_job_response(kind, user_id, func, *args, **kwargs):
+    """Submit ``func`` to the job queue and return a 202 response with the job id"""
+    try:
+        job_id = get_job_queue().submit(kind, user_id, func, *args, **kwargs)
+    except JobQueueFull as e:
+        logger.warning(f"Rejected {kind} job for user {user_id}: {e}")
+        return error_response('Too many scans in progress. Please try again shortly.', 503)
+
+    logger.info(f"🕒 Queued {kind} job {job_id} for user {user_id}")
+    return success_response({
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f'/api/jobs/{job_id}'
+    }, 202)
+
+
+def run_job_response(kind, user_id, func, *args, **kwargs):
+    """
+    Run ``func`` on the job queue's worker pool, wait, and return its result as a 200 response
+
+    Synchronous scans share the pool's worker and pending limits with queued
+    ones, so they cannot hold more request threads on model calls than the
+    queue admits; beyond that the client gets a 503 at once. Exceptions
+    raised by ``func`` propagate to the caller's error handling.
+    """
+    try:
+        result = get_job_queue().run(kind, user_id, func, *args, **kwargs)
+    except JobQueueFull as e:
+        logger.warning(f"Rejected {kind} for user {user_id}: {e}")
+        return error_response('Too many scans in progress. Please try again shortly.', 503)
+    return success_response(result)
+
+
+@jobs_bp.route('/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Get a job's status and, once finished, its result
+
+    Query params:
+        wait: Optional seconds to long-poll for completion (capped by JOB_MAX_WAIT)
+
+    Returns:
+    {
+        "job_id": "...",
+        "status": "queued|running|succeeded|failed",
+        "result": {...},  // when succeeded - same payload as the synchronous endpoint
+        "error": "..."    // when failed
+    }
+    """
+    try:
+        user_id = require_current_user()
+        queue = get_job_queue()
+
+        wait = request.args.get('wait', default=0, type=float) or 0
+        if wait > 0:
+            job = queue.wait(job_id, min(wait, config.JOB_MAX_WAIT), user_id=user_id)
+        else:
+            job = queue.get(job_id, user_id=user_id)
+
+        if job is None:
+            return error_response('Job not found', 404)
+
+        return success_response(job)
+
+    except Exception as e:
+        logger.error(f"Error getting job {job_id}: {e}")
+        return error_response(str(e), 500)
@@ -1,17 +1,35 @@
 from flask import Blueprint, request, jsonify
-from google.cloud.firestore_v1.base_query import FieldFilter
 from utils.firebase_connector import get_db
 from utils.auth import require_current_user
 from utils.response_handler import success_response, error_response
+from services.ai_service import get_ai_generator
+from services.fridge_service import get_fridge_ingredient_names
+from services.grocery_aggregation import build_grocery_items, group_by_category
+from services.dashboard_stats import meal_plan_change, stats_writes
+from utils.firestore_batch import commit_batched
+from utils.queries import get_documents, is_document_reference, meal_plans_in_range
 import logging
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 meal_plans_bp = Blueprint('meal_plans', __name__)
 
+MEAL_SUGGESTION_FORMAT = """{
+    "name": "Meal Name",
+    "description": "Brief description",
+    "calories": 400,
+    "prepTime": 20,
+    "ingredients": ["ingredient1", "ingredient2"],
+    "difficulty": "easy"
+}"""
+
 
-def _serialize_meal_plan(plan_data, plan_id, db):
-    """Serialize meal plan data for JSON response"""
+def _serialize_meal_plan(plan_data, plan_id, recipes):
+    """Serialize meal plan data for JSON response
+    
+    ``recipes`` maps recipe document paths to snapshots prefetched by
+    _serialize_meal_plans, so serialization never hits Firestore itself.
+    """
     result = {
         'id': plan_id,
         'planDate': plan_data.get('planDate'),
@@ -24,10 +42,9 @@ def _serialize_meal_plan(plan_data, plan_id, db):
     # Handle recipe - could be a reference or inline data
     recipe_ref = plan_data.get('recipe')
     if recipe_ref:
-        if hasattr(recipe_ref, 'get'):
-            # It's a DocumentReference
-            recipe_doc = recipe_ref.get()
-            if recipe_doc.exists:
+        if is_document_reference(recipe_ref):
+            recipe_doc = recipes.get(recipe_ref.path)
+            if recipe_doc:
                 recipe_data = recipe_doc.to_dict()
                 result['recipe'] = {
                     'id': recipe_doc.id,
@@ -50,6 +67,13 @@ def _serialize_meal_plan(plan_data, plan_id, db):
     return result
 
 
+def _serialize_meal_plans(db, plans):
+    """Serialize (plan_data, plan_id) pairs, resolving all recipes in one batched read"""
+    plans = list(plans)
+    recipes = get_documents(db, (plan_data.get('recipe') for plan_data, _ in plans))
+    return [_serialize_meal_plan(plan_data, plan_id, recipes) for plan_data, plan_id in plans]
+
+
 @meal_plans_bp.route('/', methods=['POST'])
 def create_meal_plan():
     """Create and save a meal plan"""
@@ -85,10 +109,14 @@ def create_meal_plan():
             meal_plan_data['calories'] = data.get('calories', 0)
             meal_plan_data['ingredients'] = data.get('ingredients', [])
         
-        _, new_plan_ref = db.collection('MealPlan').add(meal_plan_data)
+        new_plan_ref = db.collection('MealPlan').document()
+        commit_batched(db, [
+            ('set', new_plan_ref, meal_plan_data),
+            *stats_writes(db, user_id, meal_plan_change(meal_plan_data))
+        ])
         
         created_plan = new_plan_ref.get().to_dict()
-        serialized = _serialize_meal_plan(created_plan, new_plan_ref.id, db)
+        serialized = _serialize_meal_plans(db, [(created_plan, new_plan_ref.id)])[0]
         
         return success_response({
             'message': 'Meal plan created successfully',
@@ -110,21 +138,9 @@ def get_meal_plans():
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         
-        query = db.collection('MealPlan').where(filter=FieldFilter('userId', '==', user_id))
-        
-        # Apply date filters if provided
-        if start_date:
-            query = query.where(filter=FieldFilter('planDate', '>=', start_date))
-        if end_date:
-            query = query.where(filter=FieldFilter('planDate', '<=', end_date))
+        docs = meal_plans_in_range(db, user_id, start_date, end_date).stream()
         
-        docs = query.stream()
-        
-        meal_plans = []
-        for doc in docs:
-            plan = doc.to_dict()
-            serialized = _serialize_meal_plan(plan, doc.id, db)
-            meal_plans.append(serialized)
+        meal_plans = _serialize_meal_plans(db, ((doc.to_dict(), doc.id) for doc in docs))
         
         # Sort by date and meal type
         meal_type_order = {'breakfast': 0, 'lunch': 1, 'dinner': 2, 'snack': 3}
@@ -155,13 +171,7 @@ def get_week_meal_plans():
         start_str = start_date.strftime('%Y-%m-%d')
         end_str = end_date.strftime('%Y-%m-%d')
         
-        # Query only by userId to avoid composite index requirement
-        # Then filter dates in Python
-        query = db.collection('MealPlan').where(
-            filter=FieldFilter('userId', '==', user_id)
-        )
-        
-        docs = query.stream()
+        docs = meal_plans_in_range(db, user_id, start_str, end_str).stream()
         
         # Organize by date
         week_plans = {}
@@ -174,17 +184,11 @@ def get_week_meal_plans():
                 'snack': []
             }
         
-        for doc in docs:
-            plan = doc.to_dict()
-            plan_date = plan.get('planDate', '')
-            
-            # Filter by date range in Python to avoid composite index
-            if plan_date and start_str <= plan_date <= end_str:
-                serialized = _serialize_meal_plan(plan, doc.id, db)
-                date = serialized['planDate']
-                meal_type = serialized['mealType']
-                if date in week_plans and meal_type in week_plans[date]:
-                    week_plans[date][meal_type].append(serialized)
+        for serialized in _serialize_meal_plans(db, ((doc.to_dict(), doc.id) for doc in docs)):
+            date = serialized['planDate']
+            meal_type = serialized['mealType']
+            if date in week_plans and meal_type in week_plans[date]:
+                week_plans[date][meal_type].append(serialized)
         
         return success_response({
             'week_plans': week_plans,
@@ -211,86 +215,8 @@ def generate_grocery_from_plans():
         if not start_date or not end_date:
             return error_response('start_date and end_date are required', 400)
         
-        # Query only by userId to avoid composite index requirement
-        query = db.collection('MealPlan').where(
-            filter=FieldFilter('userId', '==', user_id)
-        )
-        
-        docs = query.stream()
-        
-        # Aggregate ingredients - filter by date in Python
-        grocery_items = {}
-        for doc in docs:
-            plan = doc.to_dict()
-            plan_date = plan.get('planDate', '')
-            
-            # Filter by date range in Python
-            if not (start_date <= plan_date <= end_date):
-                continue
-                
-            servings = plan.get('servings', 1)
-            
-            # Get ingredients from recipe or inline
-            ingredients = []
-            recipe_ref = plan.get('recipe')
-            if recipe_ref and hasattr(recipe_ref, 'get'):
-                recipe_doc = recipe_ref.get()
-                if recipe_doc.exists:
-                    ingredients = recipe_doc.to_dict().get('ingredients', [])
-            else:
-                ingredients = plan.get('ingredients', [])
-            
-            for ing in ingredients:
-                name = ing.get('name', ing.get('ingredient', {}).get('name', ''))
-                if not name:
-                    continue
-                    
-                quantity = ing.get('quantity', 1) * servings
-                unit = ing.get('unit', 'pcs')
-                category = ing.get('category', 'Other')
-                
-                key = f"{name.lower()}_{unit}"
-                if key in grocery_items:
-                    grocery_items[key]['quantity'] += quantity
-                else:
-                    grocery_items[key] = {
-                        'name': name,
-                        'quantity': quantity,
-                        'unit': unit,
-                        'category': category,
-                        'purchased': False
-                    }
-        
-        # Check fridge for items we already have
-        fridge_query = db.collection('Fridge').where(
-            filter=FieldFilter('userId', '==', user_id)
-        )
-        fridge_docs = fridge_query.stream()
-        
-        fridge_items = {}
-        for doc in fridge_docs:
-            item = doc.to_dict()
-            name = item.get('name', '').lower()
-            fridge_items[name] = item.get('quantity', 0)
-        
-        # Subtract fridge items
-        final_grocery = []
-        for key, item in grocery_items.items():
-            name_lower = item['name'].lower()
-            if name_lower in fridge_items:
-                item['quantity'] -= fridge_items[name_lower]
-                item['inFridge'] = fridge_items[name_lower]
-            
-            if item['quantity'] > 0:
-                final_grocery.append(item)
-        
-        # Group by category
-        grouped = {}
-        for item in final_grocery:
-            cat = item['category']
-            if cat not in grouped:
-                grouped[cat] = []
-            grouped[cat].append(item)
+        final_grocery = build_grocery_items(db, user_id, start_date, end_date)
+        grouped = group_by_category(final_grocery)
         
         return success_response({
             'grocery_items': final_grocery,
@@ -320,7 +246,10 @@ def delete_meal_plan(plan_id):
         if plan_data.get('userId') != user_id:
             return error_response('Not authorized', 403)
 
-        plan_ref.delete()
+        commit_batched(db, [
+            ('delete', plan_ref, None),
+            *stats_writes(db, user_id, meal_plan_change(plan_data, -1))
+        ])
         
         return success_response({'message': 'Meal plan deleted successfully'})
         
@@ -350,21 +279,15 @@ def ai_suggest_meals():
         })
         
         # Get fridge items
-        fridge_query = db.collection('FridgeItem').where(filter=FieldFilter('userId', '==', user_id)).limit(30)
-        fridge_docs = fridge_query.stream()
-        fridge_items = [doc.to_dict().get('ingredientName', '') for doc in fridge_docs if doc.to_dict().get('ingredientName')]
+        fridge_items = get_fridge_ingredient_names(db, user_id)[:30]
         
         # Get dietary preferences
         preferences = data.get('preferences', user_data.get('dietaryPreferences', []))
         meal_type = data.get('mealType', 'dinner')
         
-        # Use AI to generate suggestions
-        from services.ai_service import AIRecipeGenerator
-        
-        try:
-            ai_generator = AIRecipeGenerator()
-        except Exception as e:
-            logger.error(f"Failed to initialize AI service: {e}")
+        # Use the shared AI generator to build suggestions
+        ai_generator = get_ai_generator()
+        if not ai_generator:
             # Fallback to simple suggestions if AI unavailable
             suggestions = _generate_meal_suggestions(
                 fridge_items=fridge_items,
@@ -393,39 +316,20 @@ def ai_suggest_meals():
         
         prompt_parts.append(f"Target nutrition: ~{nutrition_goals.get('calories', 2000)//3} calories per meal")
         
-        prompt_parts.append("\nReturn ONLY valid JSON array with 3 meal suggestions:")
-        prompt_parts.append("""[
-  {
-    "name": "Meal Name",
-    "description": "Brief description",
-    "calories": 400,
-    "prepTime": 20,
-    "ingredients": ["ingredient1", "ingredient2"],
-    "difficulty": "easy"
-  }
-]""")
-        
         context_prompt = "\n".join(prompt_parts)
         
         try:
-            import json
-            response = ai_generator.model.generate_content(
+            suggestions = ai_generator.generate_json_list(
                 context_prompt,
-                generation_config={
-                    'temperature': 0.8,
-                    'max_output_tokens': 1024,
-                }
+                3,
+                MEAL_SUGGESTION_FORMAT,
+                {'name': str, 'ingredients': list},
+                temperature=0.8,
+                max_output_tokens=1024,
+                unique_field='name'
             )
-            
-            # Parse response
-            response_text = response.text.strip()
-            if response_text.startswith('```'):
-                response_text = response_text.split('\n', 1)[1] if '\n' in response_text else response_text[3:]
-                if response_text.endswith('```'):
-                    response_text = response_text[:-3]
-                response_text = response_text.strip()
-            
-            suggestions = json.loads(response_text)
+            if not suggestions:
+                raise ValueError("AI returned no usable meal suggestions")
             
             # Add fridge match info
             fridge_lower = [item.lower() for item in fridge_items]
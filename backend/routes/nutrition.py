@@ -1,7 +1,10 @@
 from flask import Blueprint, request, jsonify
-from google.cloud.firestore_v1.base_query import FieldFilter
 from utils.firebase_connector import get_db
-from utils.auth import require_current_user
+from utils.auth import require_current_user, invalidate_user_cache
+from services.nutrition_aggregates import (
+    add_meal_log, get_daily_aggregates, load_daily_range, remove_meal_log, set_water_intake
+)
+from services.nutrition_trends import TREND_RANGES, compute_trend, rolling_window
 import logging
 from datetime import datetime, timedelta
 
@@ -57,6 +60,7 @@ def set_nutrition_goals():
             return jsonify({'error': 'User not found'}), 404
         
         user_ref.update({'nutritionGoals': data})
+        invalidate_user_cache(user_id)
         
         return jsonify({
             'message': 'Nutrition goals updated successfully',
@@ -75,48 +79,8 @@ def get_daily_nutrition(date_str):
         db = get_db()
         user_ref = db.collection('User').document(user_id)
         
-        # Query meals for the specific date
-        query = db.collection('NutritionLog').where(
-            filter=FieldFilter('user', '==', user_ref)
-        ).where(
-            filter=FieldFilter('date', '==', date_str)
-        )
-        
-        docs = query.stream()
-        
-        meals = []
-        total_nutrition = {
-            'calories': 0,
-            'protein': 0,
-            'carbs': 0,
-            'fat': 0,
-            'fiber': 0
-        }
-        
-        for doc in docs:
-            meal = doc.to_dict()
-            meal['id'] = doc.id
-            # Convert user reference to id string
-            if 'user' in meal and hasattr(meal['user'], 'id'):
-                meal['user'] = meal['user'].id
-            if 'recipe' in meal and meal['recipe'] and hasattr(meal['recipe'], 'id'):
-                meal['recipe'] = meal['recipe'].id
-            meals.append(meal)
-            
-            # Aggregate nutrition
-            nutrition = meal.get('nutrition', {})
-            for key in total_nutrition:
-                total_nutrition[key] += nutrition.get(key, 0)
-        
-        # Get water intake for the date
-        water_query = db.collection('WaterIntake').where(
-            filter=FieldFilter('user', '==', user_ref)
-        ).where(
-            filter=FieldFilter('date', '==', date_str)
-        ).limit(1)
-        
-        water_docs = list(water_query.stream())
-        water_intake = water_docs[0].to_dict().get('amount', 0) if water_docs else 0
+        # One document read: totals, meals and water are kept up to date on write
+        day = get_daily_aggregates(db, user_id, [date_str])[date_str]
         
         # Get user goals
         user_doc = user_ref.get()
@@ -134,9 +98,9 @@ def get_daily_nutrition(date_str):
         
         return jsonify({
             'date': date_str,
-            'meals': meals,
-            'total_nutrition': total_nutrition,
-            'water_intake': water_intake,
+            'meals': day['meals'],
+            'total_nutrition': day['totals'],
+            'water_intake': day['water_intake'],
             'goals': goals
         }), 200
         
@@ -172,11 +136,11 @@ def log_meal():
         if 'recipe' in data and data['recipe']:
             meal_data['recipe'] = db.collection('Recipe').document(data['recipe'])
         
-        _, new_log_ref = db.collection('NutritionLog').add(meal_data)
+        meal_id = add_meal_log(db, user_id, meal_data)
         
         # Return cleaned response
         response_meal = {
-            'id': new_log_ref.id,
+            'id': meal_id,
             'mealName': data['mealName'],
             'date': data['date'],
             'mealType': data.get('mealType', 'other'),
@@ -199,18 +163,15 @@ def delete_meal_log(meal_id):
         user_id = require_current_user()
         db = get_db()
         
-        meal_ref = db.collection('NutritionLog').document(meal_id)
-        meal_doc = meal_ref.get()
+        # Deletes the log and subtracts it from the daily aggregate atomically
+        status = remove_meal_log(db, user_id, meal_id)
         
-        if not meal_doc.exists:
+        if status == 'not_found':
             return jsonify({'error': 'Meal log not found'}), 404
         
-        meal_data = meal_doc.to_dict()
-        if meal_data['user'].id != user_id:
+        if status == 'forbidden':
             return jsonify({'error': 'Not authorized to delete this meal log'}), 403
         
-        meal_ref.delete()
-        
         return jsonify({'message': 'Meal log deleted successfully'}), 200
         
     except Exception as e:
@@ -228,104 +189,96 @@ def log_water_intake():
         if not data or 'amount' not in data or 'date' not in data:
             return jsonify({'error': 'amount and date are required'}), 400
         
-        user_ref = db.collection('User').document(user_id)
         date_str = data['date']
         amount = data['amount']
         
-        # Find or create water log for the date
-        query = db.collection('WaterIntake').where(
-            filter=FieldFilter('user', '==', user_ref)
-        ).where(
-            filter=FieldFilter('date', '==', date_str)
-        ).limit(1)
-        docs = list(query.stream())
-        
-        if docs:
-            # Update existing - set the exact amount
-            water_ref = docs[0].reference
-            water_ref.update({
-                'amount': amount,
-                'updatedAt': datetime.utcnow()
-            })
-            
-            return jsonify({
-                'message': 'Water intake updated',
-                'water_intake': {
-                    'id': water_ref.id,
-                    'date': date_str,
-                    'amount': amount
-                }
-            }), 200
-        else:
-            # Create new
-            water_data = {
-                'user': user_ref,
+        # Updates (or creates) the day's WaterIntake log and aggregate together
+        water_id, created = set_water_intake(db, user_id, date_str, amount)
+        
+        return jsonify({
+            'message': 'Water intake logged' if created else 'Water intake updated',
+            'water_intake': {
+                'id': water_id,
                 'date': date_str,
-                'amount': amount,
-                'createdAt': datetime.utcnow()
+                'amount': amount
             }
-            
-            _, new_ref = db.collection('WaterIntake').add(water_data)
-            
-            return jsonify({
-                'message': 'Water intake logged',
-                'water_intake': {
-                    'id': new_ref.id,
-                    'date': date_str,
-                    'amount': amount
-                }
-            }), 201
+        }), 201 if created else 200
         
     except Exception as e:
         logger.error(f"Error logging water intake: {e}")
         return jsonify({'error': 'Failed to log water intake'}), 500
 
 
+def _load_trend(db, user_id: str, range_days: int, end_date=None) -> dict:
+    """Trend statistics for the ``range_days`` days ending at ``end_date`` (default today)."""
+    end_date = end_date or datetime.now().date()
+    start_date = end_date - timedelta(days=range_days - 1)
+    
+    user_doc = db.collection('User').document(user_id).get()
+    goals = user_doc.to_dict().get('nutritionGoals') if user_doc.exists else None
+    
+    # One range query over the daily aggregates instead of a read per day
+    days = load_daily_range(db, user_id, start_date, end_date)
+    trend = compute_trend(days, goals, window=rolling_window(range_days))
+    trend['range'] = range_days
+    trend['start'] = start_date.strftime('%Y-%m-%d')
+    trend['end'] = end_date.strftime('%Y-%m-%d')
+    return trend
+
+
+@nutrition_bp.route('/trend', methods=['GET'])
+def get_nutrition_trend():
+    """
+    Get nutrition trend data for a date range
+    
+    Query params:
+        range: 7, 30, 90 or 365 days (default 30)
+        end: last day, YYYY-MM-DD (default today)
+    """
+    try:
+        user_id = require_current_user()
+        db = get_db()
+        
+        try:
+            range_days = int(request.args.get('range', 30))
+        except ValueError:
+            range_days = None
+        if range_days not in TREND_RANGES:
+            return jsonify({'error': f"range must be one of {', '.join(map(str, TREND_RANGES))}"}), 400
+        
+        end_date = None
+        if request.args.get('end'):
+            try:
+                end_date = datetime.strptime(request.args['end'], '%Y-%m-%d').date()
+            except ValueError:
+                return jsonify({'error': 'end must be a date in YYYY-MM-DD format'}), 400
+        
+        return jsonify(_load_trend(db, user_id, range_days, end_date)), 200
+        
+    except Exception as e:
+        logger.error(f"Error getting nutrition trend: {e}")
+        return jsonify({'error': 'Failed to get nutrition trend'}), 500
+
+
 @nutrition_bp.route('/weekly-trend', methods=['GET'])
 def get_weekly_trend():
     """Get weekly nutrition trend data"""
     try:
         user_id = require_current_user()
         db = get_db()
-        today = datetime.now()
-        
-        # Get data for the last 7 days
-        trend_data = []
-        for i in range(6, -1, -1):  # Start from 6 days ago to today
-            date = today - timedelta(days=i)
-            date_str = date.strftime('%Y-%m-%d')
-            
-            # Try to get nutrition data for this day
-            daily_ref = db.collection('users').document(user_id).collection('nutrition').document(date_str)
-            daily_data = daily_ref.get()
-            
-            if daily_data.exists:
-                data = daily_data.to_dict()
-                totals = data.get('totals', data.get('total_nutrition', {}))
-                trend_data.append({
-                    'date': date_str,
-                    'day': date.strftime('%a'),
-                    'calories': totals.get('calories', 0),
-                    'protein': totals.get('protein', 0),
-                    'carbs': totals.get('carbs', 0),
-                    'fat': totals.get('fat', 0)
-                })
-            else:
-                # No data for this day
-                trend_data.append({
-                    'date': date_str,
-                    'day': date.strftime('%a'),
-                    'calories': 0,
-                    'protein': 0,
-                    'carbs': 0,
-                    'fat': 0
-                })
+        
+        trend = _load_trend(db, user_id, 7)
+        trend_data = [
+            {key: day[key] for key in ('date', 'day', 'calories', 'protein', 'carbs', 'fat')}
+            for day in trend['days']
+        ]
         
         return jsonify({
             'trend': trend_data,
+            'summary': trend['summary'],
             'period': 'weekly'
         }), 200
         
     except Exception as e:
         logger.error(f"Error getting weekly trend: {e}")
-        return jsonify({'error': 'Failed to get weekly trend'}), 500
\ No newline at end of file
+        return jsonify({'error': 'Failed to get weekly trend'}), 500
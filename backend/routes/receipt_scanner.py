@@ -2,24 +2,23 @@
 Receipt Scanner Route
 Handles receipt image processing using Ollama Vision model to extract food items
 """
-from flask import Blueprint, request
+from flask import Blueprint
 from utils.firebase_connector import get_db
 from utils.auth import require_current_user
-from utils.response_handler import success_response, error_response
+from utils.response_handler import error_response
+from routes.jobs import queue_job_response, run_job_response, wants_async_job
+from services.image_preprocessing import RECEIPT, preprocess_image
+from utils.uploads import UploadTooLarge, read_image_upload
+from services.fridge_service import apply_receipt_items
+from services.scan_cache import analysis_key, applied_key, cached_analysis, get_scan_cache
+from services.vision_client import VisionServiceError, get_vision_client
 import logging
-import base64
-import requests
 import json
-from datetime import datetime, timedelta
-from ollama import chat
+import time
 
 logger = logging.getLogger(__name__)
 receipt_scanner_bp = Blueprint('receipt_scanner', __name__)
 
-# Ollama configuration
-OLLAMA_BASE_URL = "http://localhost:11434"
-OLLAMA_MODEL = "qwen3-vl:235b-instruct-cloud"  # Using Qwen2.5 VL model for vision tasks
-
 def analyze_receipt_with_ollama(image_base64: str) -> dict:
     """
     Analyze a receipt image using Ollama's vision model.
@@ -73,8 +72,7 @@ Respond ONLY with valid JSON in this exact format:
 }
 
 Do not include any text before or after the JSON. Only output valid JSON."""
-        response=chat(model="qwen3-vl:235b-instruct-cloud", messages=[{"role": "user", "content": prompt,"images": [image_base64]}])
-        response_text=response.message.content
+        response_text = get_vision_client().chat(prompt, images=[image_base64])
         
         logger.info(f"Ollama response: {response_text[:500]}...")
         
@@ -97,25 +95,132 @@ Do not include any text before or after the JSON. Only output valid JSON."""
                 "message": "Could not parse the receipt. Please try with a clearer image."
             }
             
-    except requests.exceptions.ConnectionError:
-        logger.error("Could not connect to Ollama. Make sure Ollama is running.")
-        raise Exception("AI service is not available. Please ensure Ollama is running.")
-    except requests.exceptions.Timeout:
-        logger.error("Ollama request timed out")
-        raise Exception("Request timed out. Please try with a smaller image.")
+    except VisionServiceError:
+        raise
     except Exception as e:
         logger.error(f"Error analyzing receipt: {e}")
         raise
 
 
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+def process_receipt_scan(db, user_id: str, image_base64: str, preprocessing: dict = None,
+                         content_hash: str = None) -> dict:
+    """
+    Analyze a receipt image and add its food items to the user's fridge.
+    
+    Runs either inline in the request or on the background job queue.
+    When ``content_hash`` is given, the model's analysis is cached by image
+    content, and a receipt this user has already applied is answered from
+    the stored response (``duplicate: true``) without touching the fridge
+    again - so retries and double taps cannot stack quantities twice.
+    
+    Returns:
+        Response payload for /api/receipt/scan
+    """
+    scan_cache = get_scan_cache() if content_hash else None
+    if scan_cache is None:
+        return _scan_receipt(db, user_id, image_base64, preprocessing)
+    
+    marker = applied_key('receipt', user_id, content_hash)
+    with scan_cache.locked(marker):
+        previous = scan_cache.get(marker)
+        if previous is not None:
+            logger.info(f"♻️ Receipt {content_hash[:12]} already applied for user {user_id}, skipping")
+            previous.update({
+                'message': 'This receipt was already scanned - your fridge has not been changed.',
+                'duplicate': True,
+                'analysis_cached': True,
+                'timings_ms': {},
+                'preprocessing': preprocessing
+            })
+            return previous
+        
+        result = _scan_receipt(db, user_id, image_base64, preprocessing, scan_cache, content_hash)
+        if result.get('total_processed'):
+            scan_cache.set(marker, result)
+        return result
+
+
+def _scan_receipt(db, user_id: str, image_base64: str, preprocessing: dict = None,
+                  scan_cache=None, content_hash: str = None) -> dict:
+    # LLM - Analyze the receipt with Ollama (or reuse the analysis of an identical image)
+    timings = {}
+    stage_start = time.perf_counter()
+    analysis_result, analysis_cached = cached_analysis(
+        scan_cache,
+        analysis_key('receipt', get_vision_client().model, content_hash) if scan_cache else None,
+        lambda: analyze_receipt_with_ollama(image_base64),
+        cacheable=lambda result: 'items' in result
+    )
+    timings['llm'] = _elapsed_ms(stage_start)
+    
+    if not analysis_result.get('is_receipt', False):
+        return {
+            'is_receipt': False,
+            'message': analysis_result.get('message', 'This image does not appear to be a receipt.'),
+            'items': [],
+            'items_added': 0
+        }
+    
+    # Get the extracted items
+    items = analysis_result.get('items', [])
+    
+    if not items:
+        return {
+            'is_receipt': True,
+            'message': 'No food items found on this receipt.',
+            'items': [],
+            'items_added': 0
+        }
+    
+    # RECONCILE + COMMIT - Match lines to the fridge and commit, re-reading stacked items in a transaction
+    reconciled = apply_receipt_items(db, user_id, items)
+    timings.update(reconciled['timings'])
+    
+    items_added = reconciled['items_added']
+    items_updated = reconciled['items_updated']
+    added_items = reconciled['items']
+    total_processed = items_added + items_updated
+    logger.info(
+        f"✅ Successfully processed {total_processed} items ({items_added} new, {items_updated} stacked) "
+        f"from receipt for user {user_id} in {len(reconciled['writes'])} writes - timings (ms): {timings}"
+    )
+    
+    # Build appropriate message
+    if items_updated > 0 and items_added > 0:
+        message = f'Added {items_added} new items and updated {items_updated} existing items.'
+    elif items_updated > 0:
+        message = f'Updated {items_updated} existing items with new quantities.'
+    else:
+        message = f'Successfully added {items_added} new food items from receipt.'
+    
+    return {
+        'is_receipt': True,
+        'message': message,
+        'items': added_items,
+        'items_added': items_added,
+        'items_updated': items_updated,
+        'total_processed': total_processed,
+        'duplicate': False,
+        'analysis_cached': analysis_cached,
+        'timings_ms': timings,
+        'preprocessing': preprocessing
+    }
+
+
 @receipt_scanner_bp.route('/scan', methods=['POST'])
 def scan_receipt():
     """
     Scan a receipt image and extract food items.
     
-    Expected request body:
+    Accepts multipart/form-data with an "image" file part, a raw image/*
+    body, or the legacy JSON body:
     {
-        "image": "base64_encoded_image_string"
+        "image": "base64_encoded_image_string",
+        "async": false  (optional, or ?async=1 - return a job id to poll at /api/jobs/<id>)
     }
     
     Returns:
@@ -124,7 +229,8 @@ def scan_receipt():
         "data": {
             "is_receipt": true,
             "items": [...],
-            "items_added": 5
+            "items_added": 5,
+            "duplicate": false  (true when this exact image was already applied)
         }
     }
     """
@@ -132,163 +238,39 @@ def scan_receipt():
         user_id = require_current_user()
         db = get_db()
         
-        data = request.get_json()
+        # Multipart, raw image/* or legacy base64 JSON - size-capped before buffering
+        try:
+            image, data = read_image_upload()
+        except UploadTooLarge as e:
+            return error_response(str(e), 413)
         
-        if not data or 'image' not in data:
+        if image is None:
             return error_response('No image provided', 400)
         
-        image_base64 = data['image']
-        
-        # Remove data URL prefix if present
-        if 'base64,' in image_base64:
-            image_base64 = image_base64.split('base64,')[1]
-        
         logger.info(f"📸 Scanning receipt for user: {user_id}")
         
-        # Analyze the receipt with Ollama
-        analysis_result = analyze_receipt_with_ollama(image_base64)
-        
-        if not analysis_result.get('is_receipt', False):
-            return success_response({
-                'is_receipt': False,
-                'message': analysis_result.get('message', 'This image does not appear to be a receipt.'),
-                'items': [],
-                'items_added': 0
-            })
-        
-        # Get the extracted items
-        items = analysis_result.get('items', [])
-        
-        if not items:
-            return success_response({
-                'is_receipt': True,
-                'message': 'No food items found on this receipt.',
-                'items': [],
-                'items_added': 0
-            })
-        
-        # Add items to the fridge in Firebase
-        items_added = 0
-        items_updated = 0
-        added_items = []
-        
-        # Get existing fridge items for this user to check for duplicates
-        existing_items_query = db.collection('FridgeItem').where('userId', '==', user_id).stream()
-        existing_items = {}
-        for doc in existing_items_query:
-            item_data = doc.to_dict()
-            # Use lowercase name as key for case-insensitive matching
-            item_name = item_data.get('ingredientName', '').lower().strip()
-            if item_name:
-                existing_items[item_name] = {
-                    'id': doc.id,
-                    'data': item_data
-                }
-        
-        for item in items:
-            try:
-                # Determine expiration based on category
-                category = item.get('category', 'Other')
-                if category in ['Meat', 'Dairy']:
-                    expiry_days = 5
-                elif category in ['Fruits', 'Vegetables']:
-                    expiry_days = 7
-                else:
-                    expiry_days = 14
-                
-                expiry_date = (datetime.now() + timedelta(days=expiry_days)).strftime('%Y-%m-%d')
-                
-                item_name = item.get('name', 'Unknown')
-                item_name_lower = item_name.lower().strip()
-                new_quantity = float(item.get('quantity', 1))
-                new_unit = item.get('unit', 'pieces')
-                
-                # Check if item already exists in fridge
-                if item_name_lower in existing_items:
-                    # Update existing item - add quantities
-                    existing = existing_items[item_name_lower]
-                    existing_data = existing['data']
-                    existing_quantity = float(existing_data.get('quantity', 0))
-                    existing_unit = existing_data.get('unit', 'pieces')
-                    
-                    # If units match, simply add quantities
-                    # If units don't match, we'll still add but keep separate tracking
-                    if existing_unit.lower() == new_unit.lower():
-                        updated_quantity = existing_quantity + new_quantity
-                    else:
-                        # Units don't match - add the new quantity anyway
-                        # Could implement unit conversion later
-                        updated_quantity = existing_quantity + new_quantity
-                        new_unit = existing_unit  # Keep the original unit
-                    
-                    # Update the existing item in Firebase
-                    db.collection('FridgeItem').document(existing['id']).update({
-                        'quantity': updated_quantity,
-                        'notes': f"Updated from receipt scan (was {existing_quantity} {existing_unit})"
-                    })
-                    
-                    updated_item = existing_data.copy()
-                    updated_item['id'] = existing['id']
-                    updated_item['quantity'] = updated_quantity
-                    updated_item['ingredientName'] = existing_data.get('ingredientName', item_name)
-                    added_items.append(updated_item)
-                    items_updated += 1
-                    
-                    logger.info(f"📦 Stacked item in fridge: {item_name} (+{new_quantity} = {updated_quantity})")
-                    
-                else:
-                    # Create new item
-                    new_item = {
-                        'userId': user_id,
-                        'ingredientName': item_name,
-                        'quantity': new_quantity,
-                        'unit': new_unit,
-                        'category': category,
-                        'location': 'Main fridge',
-                        'notes': 'Added from receipt scan',
-                        'addedAt': datetime.utcnow(),
-                        'expirationDate': expiry_date
-                    }
-                    
-                    _, new_item_ref = db.collection('FridgeItem').add(new_item)
-                    
-                    created_item = new_item.copy()
-                    created_item['id'] = new_item_ref.id
-                    added_items.append(created_item)
-                    items_added += 1
-                    
-                    # Add to existing items dict to handle duplicates within same receipt
-                    existing_items[item_name_lower] = {
-                        'id': new_item_ref.id,
-                        'data': new_item
-                    }
-                    
-                    logger.info(f"✅ Added new item to fridge: {item_name}")
-                
-            except Exception as e:
-                logger.error(f"Failed to add item {item.get('name')}: {e}")
-                continue
-        
-        total_processed = items_added + items_updated
-        logger.info(f"✅ Successfully processed {total_processed} items ({items_added} new, {items_updated} stacked) from receipt for user {user_id}")
+        # PREPROCESS - Decode once, downscale and grayscale before the model sees it
+        stage_start = time.perf_counter()
+        try:
+            prepared = preprocess_image(image, mode=RECEIPT)
+        except ValueError as e:
+            return error_response(str(e), 400)
+        finally:
+            if not isinstance(image, str):
+                image.close()
+        preprocessing = prepared.stats()
+        preprocessing['duration_ms'] = _elapsed_ms(stage_start)
+        logger.info(f"🖼️ Receipt image {prepared.original_bytes} -> {prepared.processed_bytes} bytes")
         
-        # Build appropriate message
-        if items_updated > 0 and items_added > 0:
-            message = f'Added {items_added} new items and updated {items_updated} existing items.'
-        elif items_updated > 0:
-            message = f'Updated {items_updated} existing items with new quantities.'
-        else:
-            message = f'Successfully added {items_added} new food items from receipt.'
+        scan_args = (db, user_id, prepared.base64, preprocessing, prepared.content_hash)
+        if wants_async_job(data):
+            return queue_job_response('receipt_scan', user_id, process_receipt_scan, *scan_args)
         
-        return success_response({
-            'is_receipt': True,
-            'message': message,
-            'items': added_items,
-            'items_added': items_added,
-            'items_updated': items_updated,
-            'total_processed': total_processed
-        })
+        # Synchronous mode for older clients, still bounded by the job queue's worker pool
+        return run_job_response('receipt_scan', user_id, process_receipt_scan, *scan_args)
         
+    except VisionServiceError as e:
+        return error_response(str(e), 503)
     except Exception as e:
         logger.error(f"Error scanning receipt: {e}")
         return error_response(str(e), 500)
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from google.cloud.firestore_v1.base_query import FieldFilter
 from utils.firebase_connector import get_db
+from utils.auth import invalidate_user_cache
 import logging
 from datetime import datetime
 import hashlib
@@ -50,6 +51,7 @@ def register():
         
         user_ref = users_ref.document()
         user_ref.set(user_data)
+        invalidate_user_cache(user_ref.id)
         
         return jsonify({
             'success': True,
@@ -2,6 +2,6 @@
 Services Package
 Business logic and AI services
 """
-from .ai_service import AIRecipeGenerator
+from .ai_service import AIRecipeGenerator, get_ai_generator, ai_generator_status
 
-__all__ = ['AIRecipeGenerator']
+__all__ = ['AIRecipeGenerator', 'get_ai_generator', 'ai_generator_status']
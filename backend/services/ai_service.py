@@ -5,11 +5,93 @@ Free tier: 60 requests per minute
 import os
 import json
 import logging
-from typing import Dict, Any, Optional
+import math
+import threading
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 from google import generativeai as genai
 
+from config import config
+from services.llm_json import parse_json_list, strip_code_fences, validate_items
+
 logger = logging.getLogger(__name__)
 
+# Process-wide pool for concurrent generation; its size caps the number of
+# in-flight Gemini calls across all requests (rate-limit guard).
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, config.AI_MAX_CONCURRENCY),
+                thread_name_prefix='ai-generate'
+            )
+        return _executor
+
+
+RECIPE_JSON_FORMAT = """{
+    "title": "Creative Recipe Name",
+    "description": "Brief appetizing description (1-2 sentences)",
+    "ingredients": [
+        {
+            "name": "ingredient name",
+            "quantity": "amount",
+            "unit": "measurement unit"
+        }
+    ],
+    "instructions": [
+        "Step 1: Detailed instruction",
+        "Step 2: Detailed instruction",
+        "..."
+    ],
+    "prepTimeMinutes": 15,
+    "cookTimeMinutes": 30,
+    "servingSize": 4,
+    "difficulty": "easy",
+    "cuisine": "cuisine type",
+    "dietaryPreferences": ["tag1", "tag2"],
+    "nutrition": {
+        "calories": 400,
+        "protein": 25,
+        "carbs": 45,
+        "fat": 15,
+        "fiber": 6
+    }
+}"""
+
+# Minimal schema a generated recipe must satisfy to be returned to clients
+RECIPE_REQUIRED_FIELDS = {'title': str, 'ingredients': list, 'instructions': list}
+
+# Output budget per recipe and hard cap for multi-recipe calls
+_TOKENS_PER_RECIPE = 2048
+_MAX_OUTPUT_TOKENS = 8192
+
+
+def _recipe_prompt(context_prompt: str) -> str:
+    """Append the structured output instructions to a recipe prompt"""
+    return f"""{context_prompt}
+
+Return the recipe in this EXACT JSON format (valid JSON only, no markdown):
+{RECIPE_JSON_FORMAT}
+
+Generate ONLY valid JSON, no additional text or markdown formatting."""
+
+
+def _recipe_generation_config(temperature: float):
+    return genai.types.GenerationConfig(
+        temperature=temperature,
+        top_p=0.95,
+        top_k=40,
+        max_output_tokens=2048,
+    )
+
+
 class AIRecipeGenerator:
     """Generate recipes using Google Gemini AI"""
     
@@ -21,13 +103,14 @@ class AIRecipeGenerator:
             raise ValueError("GEMINI_API_KEY not found in environment variables")
         
         genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-2.5-flash-lite')  # Using stable available model
+        self.model = genai.GenerativeModel(config.GEMINI_MODEL)
         logger.info("Gemini AI initialized successfully")
     
     def generate_recipe(
         self,
         context_prompt: str,
-        temperature: float = 0.9
+        temperature: float = 0.9,
+        timeout: Optional[float] = None
     ) -> Dict[str, Any]:
         """
         Generate a recipe using Gemini with RAG context
@@ -35,70 +118,22 @@ class AIRecipeGenerator:
         Args:
             context_prompt: The enhanced prompt with RAG context
             temperature: Creativity level (0.0-1.0, higher = more creative)
+            timeout: Optional per-call request timeout in seconds
         
         Returns:
             Generated recipe as dictionary
         """
         try:
-            # Add structured output format to prompt
-            full_prompt = f"""{context_prompt}
-
-Return the recipe in this EXACT JSON format (valid JSON only, no markdown):
-{{
-    "title": "Creative Recipe Name",
-    "description": "Brief appetizing description (1-2 sentences)",
-    "ingredients": [
-        {{
-            "name": "ingredient name",
-            "quantity": "amount",
-            "unit": "measurement unit"
-        }}
-    ],
-    "instructions": [
-        "Step 1: Detailed instruction",
-        "Step 2: Detailed instruction",
-        "..."
-    ],
-    "prepTimeMinutes": 15,
-    "cookTimeMinutes": 30,
-    "servingSize": 4,
-    "difficulty": "easy",
-    "cuisine": "cuisine type",
-    "dietaryPreferences": ["tag1", "tag2"],
-    "nutrition": {{
-        "calories": 400,
-        "protein": 25,
-        "carbs": 45,
-        "fat": 15,
-        "fiber": 6
-    }}
-}}
-
-Generate ONLY valid JSON, no additional text or markdown formatting."""
-
             # Generate with Gemini
             logger.info("Generating recipe with Gemini AI...")
             response = self.model.generate_content(
-                full_prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=temperature,
-                    top_p=0.95,
-                    top_k=40,
-                    max_output_tokens=2048,
-                )
+                _recipe_prompt(context_prompt),
+                generation_config=_recipe_generation_config(temperature),
+                request_options={'timeout': timeout} if timeout else None
             )
             
-            # Parse response
-            recipe_text = response.text.strip()
-            
-            # Remove markdown code blocks if present
-            if recipe_text.startswith('```'):
-                # Remove ```json or ``` at start
-                recipe_text = recipe_text.split('\n', 1)[1] if '\n' in recipe_text else recipe_text[3:]
-                # Remove ``` at end
-                if recipe_text.endswith('```'):
-                    recipe_text = recipe_text[:-3]
-                recipe_text = recipe_text.strip()
+            # Parse response, removing markdown code blocks if present
+            recipe_text = strip_code_fences(response.text)
             
             # Parse JSON
             recipe_data = json.loads(recipe_text)
@@ -115,6 +150,175 @@ Generate ONLY valid JSON, no additional text or markdown formatting."""
             logger.error(f"Error generating recipe: {e}")
             raise
     
+    def stream_recipe(
+        self,
+        context_prompt: str,
+        temperature: float = 0.9,
+        timeout: Optional[float] = None
+    ) -> Iterator[str]:
+        """
+        Generate a recipe with a streaming Gemini call
+        
+        Args:
+            context_prompt: The enhanced prompt with RAG context
+            temperature: Creativity level (0.0-1.0, higher = more creative)
+            timeout: Optional per-call request timeout in seconds
+        
+        Yields:
+            Raw text chunks of the recipe JSON as the model produces them
+        """
+        logger.info("Streaming recipe with Gemini AI...")
+        response = self.model.generate_content(
+            _recipe_prompt(context_prompt),
+            generation_config=_recipe_generation_config(temperature),
+            request_options={'timeout': timeout} if timeout else None,
+            stream=True
+        )
+        
+        for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without text parts (e.g. safety or finish metadata)
+                continue
+            if text:
+                yield text
+    
+    def generate_json_list(
+        self,
+        prompt: str,
+        count: int,
+        item_format: str,
+        required_fields: Dict[str, type],
+        temperature: float = 0.9,
+        max_output_tokens: int = 2048,
+        timeout: Optional[float] = None,
+        unique_field: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Ask for a JSON array of ``count`` items in a single model call
+        
+        Malformed entries are recovered individually where possible and
+        entries failing the ``required_fields`` schema are dropped, so the
+        result may hold fewer than ``count`` items.
+        
+        Args:
+            prompt: Task description
+            count: Number of items to request
+            item_format: JSON template describing a single item
+            required_fields: Field name -> expected type for validation
+            temperature: Creativity level
+            max_output_tokens: Output token budget for the whole array
+            timeout: Optional request timeout in seconds
+            unique_field: Field used to drop duplicate items
+        
+        Returns:
+            Valid items (at most ``count``)
+        """
+        full_prompt = f"""{prompt}
+
+Return a JSON array of exactly {count} distinct items. Each item must use this EXACT JSON format:
+{item_format}
+
+Generate ONLY a valid JSON array, no additional text or markdown formatting."""
+
+        logger.info(f"Generating {count} items with Gemini AI in one call...")
+        response = self.model.generate_content(
+            full_prompt,
+            generation_config=genai.types.GenerationConfig(
+                temperature=temperature,
+                top_p=0.95,
+                top_k=40,
+                max_output_tokens=max_output_tokens,
+            ),
+            request_options={'timeout': timeout} if timeout else None
+        )
+        
+        candidates = parse_json_list(response.text)
+        items = validate_items(candidates, required_fields, limit=count, unique_field=unique_field)
+        
+        if len(items) < len(candidates):
+            logger.warning(f"Dropped {len(candidates) - len(items)} malformed or duplicate items")
+        logger.info(f"Successfully generated {len(items)}/{count} items")
+        return items
+    
+    def generate_recipes(
+        self,
+        n: int,
+        context_prompt: str,
+        temperature: float = 0.9,
+        timeout: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Generate ``n`` distinct recipes with a single Gemini call
+        
+        Args:
+            n: Number of recipes to request
+            context_prompt: Shared requirements for all recipes
+            temperature: Creativity level (0.0-1.0, higher = more creative)
+            timeout: Optional request timeout in seconds
+        
+        Returns:
+            Valid, distinct recipes (may be fewer than ``n``)
+        """
+        return self.generate_json_list(
+            context_prompt,
+            n,
+            RECIPE_JSON_FORMAT,
+            RECIPE_REQUIRED_FIELDS,
+            temperature=temperature,
+            max_output_tokens=min(_TOKENS_PER_RECIPE * n, _MAX_OUTPUT_TOKENS),
+            timeout=timeout,
+            unique_field='title'
+        )
+    
+    def generate_recipes_concurrently(
+        self,
+        prompts: List[str],
+        temperature: float = 0.9,
+        timeout: Optional[float] = None
+    ) -> Tuple[Dict[int, Dict[str, Any]], Dict[int, str]]:
+        """
+        Generate one recipe per prompt concurrently on the shared worker pool
+        
+        Args:
+            prompts: Prompts to generate, one recipe each
+            temperature: Creativity level passed to every call
+            timeout: Per-call timeout in seconds (defaults to AI_CALL_TIMEOUT)
+        
+        Returns:
+            Tuple of (recipes by prompt index, error messages by prompt index).
+            Failed or timed-out calls only appear in the errors mapping.
+        """
+        timeout = timeout or config.AI_CALL_TIMEOUT
+        executor = _get_executor()
+        futures = {
+            executor.submit(self.generate_recipe, prompt, temperature, timeout): index
+            for index, prompt in enumerate(prompts)
+        }
+        
+        # Calls beyond the pool size queue behind earlier ones, so allow one
+        # timeout per "wave" of concurrent calls before giving up.
+        waves = math.ceil(len(prompts) / max(1, config.AI_MAX_CONCURRENCY))
+        done, not_done = wait(futures, timeout=timeout * waves)
+        
+        recipes: Dict[int, Dict[str, Any]] = {}
+        errors: Dict[int, str] = {}
+        for future in done:
+            index = futures[future]
+            try:
+                recipes[index] = future.result()
+            except Exception as e:
+                logger.warning(f"Recipe generation {index + 1} failed: {e}")
+                errors[index] = str(e)
+        
+        for future in not_done:
+            future.cancel()
+            errors[futures[future]] = f"Timed out after {timeout}s"
+            logger.warning(f"Recipe generation {futures[future] + 1} timed out")
+        
+        return recipes, errors
+    
     def generate_simple_recipe(
         self,
         ingredients: list,
@@ -164,3 +368,74 @@ Return as JSON with this structure:
 }"""
         
         return self.generate_recipe(prompt, temperature=0.8)
+
+
+# Shared generator registry: one client per process, rebuilt when the API key changes
+_generator: Optional[AIRecipeGenerator] = None
+_generator_key: Optional[str] = None
+_generator_lock = threading.Lock()
+_generator_state: Dict[str, Any] = {
+    'status': 'uninitialized',
+    'error': None,
+    'initialized_at': None,
+    'last_attempt': None,
+}
+_INIT_RETRY_SECONDS = 30
+
+
+def get_ai_generator() -> Optional[AIRecipeGenerator]:
+    """
+    Return the process-wide AIRecipeGenerator, creating it on first use
+    
+    The generator is rebuilt whenever GEMINI_API_KEY changes. Failed
+    initialisation is retried at most every 30 seconds for the same key.
+    
+    Returns:
+        Shared generator, or None when AI generation is unavailable
+    """
+    global _generator, _generator_key
+    
+    api_key = os.getenv('GEMINI_API_KEY')
+    with _generator_lock:
+        if _generator is not None and _generator_key == api_key:
+            return _generator
+        
+        last_attempt = _generator_state['last_attempt']
+        if (
+            _generator is None
+            and _generator_key == api_key
+            and last_attempt is not None
+            and time.monotonic() - last_attempt < _INIT_RETRY_SECONDS
+        ):
+            return None
+        
+        _generator_key = api_key
+        _generator_state['last_attempt'] = time.monotonic()
+        try:
+            _generator = AIRecipeGenerator(api_key)
+        except Exception as e:
+            _generator = None
+            _generator_state.update(status='unavailable', error=str(e))
+            logger.error(f"Failed to initialize AI generator: {e}")
+            return None
+        
+        _generator_state.update(
+            status='operational',
+            error=None,
+            initialized_at=datetime.utcnow().isoformat() + 'Z'
+        )
+        return _generator
+
+
+def warm_up_ai_generator() -> bool:
+    """Build the shared generator at startup so the first request skips client setup."""
+    return get_ai_generator() is not None
+
+
+def ai_generator_status() -> Dict[str, Any]:
+    """Health state of the shared generator."""
+    with _generator_lock:
+        state = dict(_generator_state)
+    state.pop('last_attempt', None)
+    state['model'] = config.GEMINI_MODEL
+    return state
@@ -0,0 +1,242 @@
+"""
+Dashboard Statistics
+Per-user counters in users/{uid}/stats/dashboard, kept current by the fridge,
+recipe and meal plan write paths so the dashboard is a single document read
+"""
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from firebase_admin import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from utils.firestore_batch import WriteOp
+from utils.queries import count_documents, meal_plans_in_range
+
+logger = logging.getLogger(__name__)
+
+# Bumped when the document layout changes; older documents are reconciled on read
+STATS_VERSION = 1
+
+# Fridge items expiring today or within this many days count as "expiring"
+EXPIRING_WITHIN_DAYS = 3
+
+# Counter fields (plain numbers) and per-day maps ({'YYYY-MM-DD': count})
+_COUNTERS = ('totalRecipes', 'savedRecipes', 'fridgeItems')
+_DAY_MAPS = ('fridgeExpiry', 'mealPlanDays')
+
+# A change is a sparse dict of counter deltas and per-day map deltas, e.g.
+# {'fridgeItems': 1, 'fridgeExpiry': {'2026-01-05': 1}}
+StatsChange = Dict[str, Any]
+
+
+def stats_ref(db, user_id: str):
+    return db.collection('users').document(user_id).collection('stats').document('dashboard')
+
+
+def expiry_day(value: Any) -> Optional[str]:
+    """'YYYY-MM-DD' for an expirationDate stored as a date string, ISO timestamp or datetime."""
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, str) and value:
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).strftime('%Y-%m-%d')
+        except ValueError:
+            return None
+    return None
+
+
+def fridge_item_change(item: Optional[Dict[str, Any]], sign: int = 1) -> StatsChange:
+    """Counters touched by adding (sign=1) or removing (sign=-1) a FridgeItem."""
+    if item is None:
+        return {}
+    change: StatsChange = {'fridgeItems': sign}
+    day = expiry_day(item.get('expirationDate'))
+    if day:
+        change['fridgeExpiry'] = {day: sign}
+    return change
+
+
+def recipe_change(recipe: Optional[Dict[str, Any]], sign: int = 1) -> StatsChange:
+    """Counters touched by saving (sign=1) or removing (sign=-1) a Recipe."""
+    if recipe is None:
+        return {}
+    change: StatsChange = {'totalRecipes': sign}
+    if recipe.get('isFavorite'):
+        change['savedRecipes'] = sign
+    return change
+
+
+def meal_plan_change(plan: Optional[Dict[str, Any]], sign: int = 1) -> StatsChange:
+    """Counters touched by creating (sign=1) or deleting (sign=-1) a MealPlan."""
+    day = (plan or {}).get('planDate')
+    return {'mealPlanDays': {day: sign}} if day else {}
+
+
+def combine_changes(*changes: StatsChange) -> StatsChange:
+    """Sum several changes; entries that cancel out are dropped."""
+    combined: StatsChange = {}
+    for change in changes:
+        for key, value in (change or {}).items():
+            if key in _DAY_MAPS:
+                days = combined.setdefault(key, {})
+                for day, delta in value.items():
+                    days[day] = days.get(day, 0) + delta
+            else:
+                combined[key] = combined.get(key, 0) + value
+
+    for key in _DAY_MAPS:
+        days = {day: delta for day, delta in combined.get(key, {}).items() if delta}
+        if days:
+            combined[key] = days
+        else:
+            combined.pop(key, None)
+    return {key: value for key, value in combined.items() if value}
+
+
+def _increments(change: StatsChange) -> Dict[str, Any]:
+    payload = {}
+    for key, value in change.items():
+        if key in _DAY_MAPS:
+            payload[key] = {day: firestore.Increment(delta) for day, delta in value.items()}
+        else:
+            payload[key] = firestore.Increment(value)
+    return payload
+
+
+def stats_writes(db, user_id: str, *changes: StatsChange) -> List[WriteOp]:
+    """
+    Merge write applying ``changes`` to the user's stats document
+
+    Returns an empty list when nothing changes, so callers can append the
+    result to their own commit_batched operations unconditionally.
+    """
+    change = combine_changes(*changes)
+    if not change:
+        return []
+    return [('merge', stats_ref(db, user_id), _increments(change))]
+
+
+def write_stats(writer, db, user_id: str, *changes: StatsChange) -> None:
+    """Same as stats_writes, applied to an open WriteBatch or Transaction."""
+    for _, ref, payload in stats_writes(db, user_id, *changes):
+        writer.set(ref, payload, merge=True)
+
+
+def compute_stats(
+    counts: Dict[str, int],
+    fridge_items: Iterable[Dict[str, Any]],
+    plans: Iterable[Dict[str, Any]],
+    since: str
+) -> Dict[str, Any]:
+    """
+    Full stats document from counter values and the dated documents
+
+    ``fridge_items`` and ``plans`` only feed the per-day maps; entries
+    before ``since`` ('YYYY-MM-DD') are dropped, as the dashboard only looks
+    forward from the start of the current week.
+    """
+    change = combine_changes(
+        *({'fridgeExpiry': fridge_item_change(item).get('fridgeExpiry', {})} for item in fridge_items),
+        *(meal_plan_change(plan) for plan in plans)
+    )
+    data = {key: int(counts.get(key) or 0) for key in _COUNTERS}
+    for key in _DAY_MAPS:
+        data[key] = {day: count for day, count in change.get(key, {}).items() if day >= since}
+    data['version'] = STATS_VERSION
+    data['reconciledAt'] = datetime.now(timezone.utc)
+    return data
+
+
+def _week_start(today: date) -> date:
+    return today - timedelta(days=today.weekday())
+
+
+def _sum_days(days: Dict[str, Any], start: date, count: int) -> int:
+    total = 0
+    for offset in range(count):
+        total += int(days.get((start + timedelta(days=offset)).strftime('%Y-%m-%d')) or 0)
+    return max(total, 0)
+
+
+def dashboard_view(data: Optional[Dict[str, Any]], today: Optional[date] = None) -> Dict[str, int]:
+    """Dashboard response fields from a stats document, relative to ``today``."""
+    data = data or {}
+    today = today or date.today()
+    return {
+        'totalRecipes': max(int(data.get('totalRecipes') or 0), 0),
+        'savedRecipes': max(int(data.get('savedRecipes') or 0), 0),
+        'fridgeItems': max(int(data.get('fridgeItems') or 0), 0),
+        'expiringItems': _sum_days(data.get('fridgeExpiry') or {}, today, EXPIRING_WITHIN_DAYS + 1),
+        'mealsPlanned': _sum_days(data.get('mealPlanDays') or {}, _week_start(today), 7),
+    }
+
+
+def reconcile_stats(db, user_id: str, today: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Recompute the stats document from FridgeItem, Recipe and MealPlan
+
+    Counters come from count() aggregation queries, so only fridge items
+    expiring from this week on and meal plans from this week on are downloaded.
+    Runs in a transaction, so an increment committed while the counts are
+    being taken is not lost when the document is replaced. Repairs any
+    drift from failed hook writes and prunes past per-day entries.
+    """
+    since = _week_start(today or date.today()).strftime('%Y-%m-%d')
+    ref = stats_ref(db, user_id)
+    fridge_query = db.collection('FridgeItem').where(filter=FieldFilter('userId', '==', user_id))
+    recipe_query = db.collection('Recipe').where(filter=FieldFilter('userId', '==', user_id))
+    favorite_query = recipe_query.where(filter=FieldFilter('isFavorite', '==', True))
+    # expirationDate is stored as 'YYYY-MM-DD', so this range skips items that expired before the week
+    expiry_query = fridge_query.where(
+        filter=FieldFilter('expirationDate', '>=', since)
+    ).select(['expirationDate'])
+    plan_query = meal_plans_in_range(db, user_id, start_date=since).select(['planDate'])
+
+    @firestore.transactional
+    def apply(transaction):
+        # Reading the document makes a concurrent hook write retry this transaction
+        ref.get(transaction=transaction)
+        counts = {
+            'fridgeItems': count_documents(fridge_query, transaction),
+            'totalRecipes': count_documents(recipe_query, transaction),
+            'savedRecipes': count_documents(favorite_query, transaction),
+        }
+        fridge_items = [doc.to_dict() for doc in transaction.get(expiry_query)]
+        plans = [doc.to_dict() for doc in transaction.get(plan_query)]
+        data = compute_stats(counts, fridge_items, plans, since)
+        transaction.set(ref, data)
+        return data
+
+    data = apply(db.transaction())
+    logger.info(
+        f"📊 Reconciled dashboard stats for user {user_id}: "
+        f"{data['fridgeItems']} fridge items, {data['totalRecipes']} recipes"
+    )
+    return data
+
+
+def _needs_reconcile(data: Optional[Dict[str, Any]], max_age: float) -> bool:
+    if not data or data.get('version') != STATS_VERSION:
+        return True
+    reconciled_at = data.get('reconciledAt')
+    if not isinstance(reconciled_at, datetime):
+        return True
+    if reconciled_at.tzinfo is None:
+        reconciled_at = reconciled_at.replace(tzinfo=timezone.utc)
+    return (datetime.now(timezone.utc) - reconciled_at).total_seconds() > max_age
+
+
+def get_dashboard_stats(db, user_id: str, max_age: float, today: Optional[date] = None) -> Dict[str, int]:
+    """
+    Dashboard counters for a user with one document read
+
+    The document is (re)built from scratch when missing, from an older
+    layout, or last reconciled more than ``max_age`` seconds ago.
+    """
+    snapshot = stats_ref(db, user_id).get()
+    data = snapshot.to_dict() if snapshot.exists else None
+    if _needs_reconcile(data, max_age):
+        data = reconcile_stats(db, user_id, today)
+    return dashboard_view(data, today)
+
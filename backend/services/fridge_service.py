@@ -0,0 +1,415 @@
+"""
+Fridge Inventory Service
+Per-user read-through cache of FridgeItem documents shared by all routes
+"""
+import copy
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from firebase_admin import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from config import config
+from services.dashboard_stats import fridge_item_change, stats_writes, write_stats
+from services.ingredient_matcher import IngredientIndex, normalize_ingredient
+from services.units import convert, parse_quantity
+from utils.cache import TTLCache
+from utils.firestore_batch import MAX_BATCH_SIZE, commit_batched
+
+logger = logging.getLogger(__name__)
+
+# user_id -> list of fridge item dicts (each including its document 'id')
+_fridge_cache = TTLCache(maxsize=config.FRIDGE_CACHE_MAX_SIZE, ttl=config.FRIDGE_CACHE_TTL)
+
+# Quantities at or below this are treated as used up
+_EPSILON = 1e-6
+
+# user_id -> [reads in flight, writes seen since they started]; a snapshot read
+# before a write is never cached after it. Entries live only while a read is
+# in flight, so the dict is bounded by concurrency, not by users ever seen.
+_inflight: Dict[str, List[int]] = {}
+_inflight_lock = threading.Lock()
+
+
+def load_fridge_items(db, user_id: str) -> List[Dict[str, Any]]:
+    """
+    Return the user's fridge items, reading Firestore only on a cache miss
+
+    Args:
+        db: Firestore client
+        user_id: Owner of the fridge
+
+    Returns:
+        List of FridgeItem dicts with the document id under 'id'. The list
+        is a copy, so callers may mutate it freely.
+    """
+    cached = _fridge_cache.get(user_id)
+    if cached is not None:
+        return copy.deepcopy(cached)
+
+    with _inflight_lock:
+        entry = _inflight.setdefault(user_id, [0, 0])
+        entry[0] += 1
+        version = entry[1]
+
+    clean = False
+    try:
+        query = db.collection('FridgeItem').where(filter=FieldFilter('userId', '==', user_id))
+        items = []
+        for doc in query.stream():
+            item = doc.to_dict()
+            item['id'] = doc.id
+            items.append(item)
+        clean = True
+    finally:
+        with _inflight_lock:
+            entry[0] -= 1
+            if not entry[0]:
+                del _inflight[user_id]
+            # Skip caching if a write landed while we were reading
+            if clean and entry[1] == version:
+                _fridge_cache.set(user_id, copy.deepcopy(items))
+
+    return items
+
+
+def get_fridge_ingredient_names(db, user_id: str) -> List[str]:
+    """Return the non-empty ingredient names in the user's fridge."""
+    return [item['ingredientName'] for item in load_fridge_items(db, user_id) if item.get('ingredientName')]
+
+
+def invalidate_fridge(user_id: str) -> None:
+    """Drop the cached snapshot after any write to the user's fridge."""
+    with _inflight_lock:
+        entry = _inflight.get(user_id)
+        if entry:
+            entry[1] += 1
+        _fridge_cache.pop(user_id)
+
+
+def get_fridge_cache_stats() -> Dict[str, Any]:
+    return _fridge_cache.stats()
+
+
+def _amount_in_item_unit(ingredient: Any, item: Dict[str, Any]) -> Optional[float]:
+    """Requested amount expressed in the fridge item's unit (None = whole item)."""
+    if not isinstance(ingredient, dict):
+        return None
+    quantity = parse_quantity(ingredient.get('quantity', ingredient.get('amount')))
+    if quantity is None or quantity <= 0:
+        return None
+    # A missing unit means "in whatever unit the fridge item uses"
+    unit = ingredient.get('unit') or item.get('unit')
+    return convert(quantity, unit, item.get('unit'))
+
+
+def plan_consumption(items: List[Dict[str, Any]], ingredients: List[Any]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    """
+    Match recipe ingredients to fridge items and total the amount taken from each
+
+    Ingredients without a quantity, or whose unit cannot be converted to the
+    item's unit (e.g. "2 pieces" of an item stored in grams), use up the
+    whole item. An item stays matchable until the planned amount covers its
+    stock, so "200 g flour" and "100 g flour" both draw from one bag.
+
+    Returns:
+        ``(plan, not_found)`` where plan maps item id to
+        ``{'item': ..., 'amount': float or None, 'ingredients': [names]}``
+    """
+    index = IngredientIndex(items)
+    plan: Dict[str, Dict[str, Any]] = {}
+    not_found = []
+
+    for ingredient in ingredients:
+        name = ingredient.get('name', '') if isinstance(ingredient, dict) else str(ingredient)
+        match = index.match(name)
+        if match is None:
+            not_found.append(name.lower())
+            continue
+
+        item = match.item
+        entry = plan.setdefault(item['id'], {'item': item, 'amount': 0.0, 'ingredients': []})
+        entry['ingredients'].append(name)
+
+        amount = _amount_in_item_unit(ingredient, item)
+        if amount is None or entry['amount'] is None:
+            entry['amount'] = None
+            index.remove(match.position)
+            continue
+
+        entry['amount'] += amount
+        stock = parse_quantity(item.get('quantity'))
+        if stock is None or entry['amount'] >= stock - _EPSILON:
+            index.remove(match.position)
+
+    return plan, not_found
+
+
+def consume_fridge_items(db, user_id: str, ingredients: List[Any]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Decrement (or remove) the fridge items used by a recipe in one transaction
+
+    Matching runs against the cached snapshot; the transaction re-reads the
+    matched documents so concurrent edits from another device are applied
+    on top of the latest quantities instead of being overwritten.
+
+    Returns:
+        ``(consumed, not_found)``; each consumed entry reports the amount
+        used, the remaining quantity and whether the item was removed
+    """
+    plan, not_found = plan_consumption(load_fridge_items(db, user_id), ingredients)
+    if not plan:
+        return [], not_found
+
+    refs = [db.collection('FridgeItem').document(item_id) for item_id in plan]
+
+    @firestore.transactional
+    def apply(transaction):
+        # All reads must happen before the first write
+        snapshots = {snapshot.id: snapshot for snapshot in db.get_all(refs, transaction=transaction)}
+        now = datetime.utcnow()
+        results, missing, removed = [], [], []
+
+        for item_id, entry in plan.items():
+            snapshot = snapshots.get(item_id)
+            data = snapshot.to_dict() if snapshot is not None and snapshot.exists else None
+            if not data or data.get('userId') != user_id:
+                # Deleted (or reassigned) since the snapshot was cached
+                missing.extend(name.lower() for name in entry['ingredients'])
+                continue
+
+            stock = parse_quantity(data.get('quantity'))
+            amount = entry['amount']
+            result = {
+                'id': item_id,
+                'name': data.get('ingredientName'),
+                'unit': data.get('unit'),
+                'ingredients': entry['ingredients'],
+            }
+
+            if amount is None or stock is None or stock - amount <= _EPSILON:
+                transaction.delete(snapshot.reference)
+                removed.append(fridge_item_change(data, -1))
+                result.update({'quantity_used': stock, 'remaining': 0, 'removed': True})
+            else:
+                remaining = round(stock - amount, 4)
+                transaction.update(snapshot.reference, {'quantity': remaining, 'updatedAt': now})
+                result.update({'quantity_used': round(amount, 4), 'remaining': remaining, 'removed': False})
+            results.append(result)
+
+        write_stats(transaction, db, user_id, *removed)
+        return results, missing
+
+    try:
+        consumed, missing = apply(db.transaction())
+    finally:
+        invalidate_fridge(user_id)
+
+    return consumed, not_found + missing
+
+
+def _receipt_expiry_days(category: str) -> int:
+    if category in ['Meat', 'Dairy']:
+        return 5
+    if category in ['Fruits', 'Vegetables']:
+        return 7
+    return 14
+
+
+def reconcile_receipt_items(
+    fridge_items: List[Dict[str, Any]],
+    receipt_items: List[Dict[str, Any]],
+    user_id: str,
+    new_id: Callable[[], str],
+    now: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    Compute the fridge writes for a scanned receipt without touching Firestore
+
+    Receipt lines are matched to existing items by normalised name ("Tomato"
+    stacks onto "tomatoes"); quantities are converted to the existing item's
+    unit where possible, otherwise added as-is in the existing unit. Several
+    lines for the same item collapse into a single write.
+
+    Args:
+        fridge_items: Current fridge snapshot (dicts with 'id')
+        receipt_items: Items extracted from the receipt
+        user_id: Owner of the fridge
+        new_id: Returns a fresh document id for new items
+        now: Timestamp to use (defaults to utcnow)
+
+    Returns:
+        Dict with 'writes' (``(op, item_id, data)`` with op 'set' or
+        'update'), 'items' (per-line response entries), 'items_added'
+        and 'items_updated'
+    """
+    now = now or datetime.utcnow()
+    existing = {}
+    for item in fridge_items:
+        key = normalize_ingredient(item.get('ingredientName'))
+        if key and key not in existing:
+            existing[key] = item
+
+    creates: Dict[str, Dict[str, Any]] = {}
+    updates: Dict[str, Dict[str, Any]] = {}
+    response_items = []
+    items_added = 0
+    items_updated = 0
+
+    for line in receipt_items:
+        try:
+            item_name = line.get('name', 'Unknown')
+            key = normalize_ingredient(item_name)
+            category = line.get('category', 'Other')
+            quantity = parse_quantity(line.get('quantity', 1))
+            quantity = 1.0 if quantity is None else quantity
+            unit = line.get('unit', 'pieces')
+
+            if key in existing:
+                # Stack onto the existing item - add quantities
+                current = existing[key]
+                item_id = current['id']
+                current_unit = current.get('unit', 'pieces')
+                current_quantity = parse_quantity(current.get('quantity')) or 0.0
+                converted = convert(quantity, unit, current_unit)
+                updated_quantity = current_quantity + (quantity if converted is None else converted)
+
+                if item_id in creates:
+                    creates[item_id]['quantity'] = updated_quantity
+                else:
+                    update = updates.setdefault(item_id, {
+                        'notes': f"Updated from receipt scan (was {current_quantity} {current_unit})"
+                    })
+                    update['quantity'] = updated_quantity
+                    update['updatedAt'] = now
+                current['quantity'] = updated_quantity
+
+                response_item = {k: v for k, v in current.items()}
+                response_item['ingredientName'] = current.get('ingredientName', item_name)
+                response_items.append(response_item)
+                items_updated += 1
+            else:
+                item_id = new_id()
+                new_item = {
+                    'userId': user_id,
+                    'ingredientName': item_name,
+                    'quantity': quantity,
+                    'unit': unit,
+                    'category': category,
+                    'location': 'Main fridge',
+                    'notes': 'Added from receipt scan',
+                    'addedAt': now,
+                    'expirationDate': (now + timedelta(days=_receipt_expiry_days(category))).strftime('%Y-%m-%d')
+                }
+                creates[item_id] = new_item
+
+                # Later lines for the same item stack onto this one
+                existing[key] = dict(new_item, id=item_id)
+                response_items.append(dict(new_item, id=item_id))
+                items_added += 1
+
+        except Exception as e:
+            logger.error(f"Failed to add item {line.get('name') if isinstance(line, dict) else line}: {e}")
+            continue
+
+    writes = [('set', item_id, data) for item_id, data in creates.items()]
+    writes += [('update', item_id, data) for item_id, data in updates.items()]
+
+    return {
+        'writes': writes,
+        'items': response_items,
+        'items_added': items_added,
+        'items_updated': items_updated,
+    }
+
+
+def apply_receipt_items(db, user_id: str, receipt_items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Add a receipt's lines to the fridge, re-reading stacked items in a transaction
+
+    Matching starts from the cached snapshot, but every item a line stacks
+    onto is re-read inside the transaction and the quantities recomputed
+    from the stored value, so a consume, edit or other receipt committed
+    meanwhile (from any worker or device) is added to rather than
+    overwritten. Items deleted meanwhile are recreated as new items. The
+    dashboard counters are updated in the same transaction.
+
+    A commit holds at most MAX_BATCH_SIZE writes. When a receipt needs
+    more, the transaction writes only the stacked items, and the new items
+    (whose fresh ids cannot conflict) follow with their stats write in
+    chunked batches. A receipt stacking onto more than MAX_BATCH_SIZE
+    existing items is rejected with ValueError.
+
+    Returns:
+        reconcile_receipt_items' result for the committed writes, plus
+        'timings' ({'reconcile': ms, 'commit': ms}); commit includes the
+        transactional re-reads
+    """
+    collection = db.collection('FridgeItem')
+    cached = load_fridge_items(db, user_id)
+    reconcile_seconds = 0.0
+    deferred: List[Tuple[str, Dict[str, Any]]] = []
+
+    @firestore.transactional
+    def apply(transaction):
+        nonlocal reconcile_seconds
+        fresh: Dict[str, Any] = {}
+        while True:
+            items = []
+            for item in cached:
+                if item['id'] not in fresh:
+                    items.append(item)
+                    continue
+                snapshot = fresh[item['id']]
+                data = snapshot.to_dict() if snapshot.exists else None
+                if data and data.get('userId') == user_id:
+                    items.append(dict(data, id=item['id']))
+
+            start = time.perf_counter()
+            result = reconcile_receipt_items(
+                copy.deepcopy(items), receipt_items, user_id, new_id=lambda: collection.document().id
+            )
+            reconcile_seconds += time.perf_counter() - start
+            unread = [item_id for op, item_id, _ in result['writes'] if op == 'update' and item_id not in fresh]
+            if not unread:
+                break
+            # All reads must happen before the first write
+            refs = [collection.document(item_id) for item_id in unread]
+            fresh.update({snapshot.id: snapshot for snapshot in db.get_all(refs, transaction=transaction)})
+
+        creates = [(item_id, data) for op, item_id, data in result['writes'] if op == 'set']
+        updates = [(item_id, data) for op, item_id, data in result['writes'] if op == 'update']
+        if len(updates) > MAX_BATCH_SIZE:
+            raise ValueError(f"Receipt stacks onto {len(updates)} items; at most {MAX_BATCH_SIZE} are supported")
+        # The stats write only accompanies new items
+        deferred[:] = creates if len(updates) + len(creates) + 1 > MAX_BATCH_SIZE else []
+        if deferred:
+            creates = []
+
+        for item_id, data in updates:
+            transaction.update(collection.document(item_id), data)
+        for item_id, data in creates:
+            transaction.set(collection.document(item_id), data)
+        write_stats(transaction, db, user_id, *(fridge_item_change(data) for _, data in creates))
+        return result
+
+    start = time.perf_counter()
+    try:
+        result = apply(db.transaction())
+        if deferred:
+            logger.info(f"📦 Receipt for user {user_id} adds {len(deferred)} items; committing them in batches")
+            commit_batched(db, [
+                ('set', collection.document(item_id), data) for item_id, data in deferred
+            ] + stats_writes(db, user_id, *(fridge_item_change(data) for _, data in deferred)))
+    finally:
+        invalidate_fridge(user_id)
+
+    reconcile_ms = round(reconcile_seconds * 1000, 1)
+    result['timings'] = {
+        'reconcile': reconcile_ms,
+        'commit': round((time.perf_counter() - start) * 1000 - reconcile_ms, 1)
+    }
+    return result
@@ -0,0 +1,186 @@
+"""
+Meal Plan Grocery Aggregation
+Turn a date range of meal plans into a shopping list, net of what is already in the fridge
+"""
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from services.fridge_service import load_fridge_items
+from services.ingredient_matcher import IngredientIndex, normalize_ingredient
+from services.units import normalize_unit, parse_quantity, unit_dimension
+from utils.queries import get_documents, is_document_reference, meal_plans_in_range
+
+# Quantities at or below this are treated as fully covered by the fridge
+_EPSILON = 1e-6
+
+# Only these MealPlan fields are needed to build the list
+_PLAN_FIELDS = ['recipe', 'servings', 'ingredients']
+
+# (canonical name, dimension or normalised unit) -> aggregated entry
+AggregateKey = Tuple[str, str]
+
+
+def _ingredient_fields(ingredient: Any) -> Optional[Tuple[str, float, str, str]]:
+    """``(name, quantity, unit, category)`` of a recipe/plan ingredient, or None if unnamed."""
+    if isinstance(ingredient, str):
+        ingredient = {'name': ingredient}
+    if not isinstance(ingredient, dict):
+        return None
+    name = ingredient.get('name') or (ingredient.get('ingredient') or {}).get('name') or ''
+    if not name.strip():
+        return None
+    quantity = parse_quantity(ingredient.get('quantity', ingredient.get('amount')))
+    unit = ingredient.get('unit') or 'pcs'
+    return name.strip(), 1.0 if quantity is None else quantity, unit, ingredient.get('category') or 'Other'
+
+
+def _measure(unit: str) -> Tuple[str, float]:
+    """``(key, factor_to_base)`` for a unit; unknown units only add up with themselves."""
+    dimension = unit_dimension(unit)
+    if dimension:
+        return dimension
+    return f"unit:{normalize_unit(unit)}", 1.0
+
+
+def plan_ingredients(plan: Dict[str, Any], recipes: Mapping[str, Any]) -> List[Any]:
+    """
+    Ingredients of one meal plan
+
+    ``recipes`` maps recipe document paths to snapshots prefetched with
+    get_documents. Inline recipe dicts and plan-level ingredient lists are
+    used as-is.
+    """
+    recipe = plan.get('recipe')
+    if is_document_reference(recipe):
+        snapshot = recipes.get(recipe.path)
+        if snapshot is not None:
+            return (snapshot.to_dict() or {}).get('ingredients') or []
+    elif isinstance(recipe, dict) and recipe.get('ingredients'):
+        return recipe['ingredients']
+    return plan.get('ingredients') or []
+
+
+def aggregate_ingredients(plans: Iterable[Dict[str, Any]], recipes: Mapping[str, Any]) -> Dict[AggregateKey, Dict[str, Any]]:
+    """
+    Sum the ingredients of many meal plans, scaled by each plan's servings
+
+    Names are canonicalised ("Tomatoes" and "tomato" are one line) and
+    quantities in convertible units are summed in the dimension's base unit
+    (grams, millilitres, pieces), so 500 g + 1 kg is 1.5 kg. The line is
+    shown in the largest unit any contribution used.
+
+    Returns:
+        Entries keyed by ``(canonical name, measure)`` with 'name', 'base'
+        (total in base units), 'unit', 'factor' and 'category'
+    """
+    entries: Dict[AggregateKey, Dict[str, Any]] = {}
+    for plan in plans:
+        servings = parse_quantity(plan.get('servings'))
+        servings = 1.0 if servings is None or servings <= 0 else servings
+        for ingredient in plan_ingredients(plan, recipes):
+            fields = _ingredient_fields(ingredient)
+            if fields is None:
+                continue
+            name, quantity, unit, category = fields
+            measure, factor = _measure(unit)
+            key = (normalize_ingredient(name), measure)
+            entry = entries.get(key)
+            if entry is None:
+                entry = entries[key] = {'name': name, 'base': 0.0, 'unit': unit, 'factor': factor, 'category': category}
+            elif factor > entry['factor']:
+                entry['unit'], entry['factor'] = unit, factor
+            entry['base'] += quantity * servings * factor
+    return entries
+
+
+def _fridge_stock(fridge_items: Iterable[Dict[str, Any]]) -> Tuple[Dict[AggregateKey, float], IngredientIndex]:
+    """Fridge quantities summed per ``(canonical name, measure)`` in base units, plus a name index."""
+    stock: Dict[AggregateKey, float] = {}
+    names = {}
+    for item in fridge_items:
+        quantity = parse_quantity(item.get('quantity'))
+        name = normalize_ingredient(item.get('ingredientName'))
+        if quantity is None or quantity <= 0 or not name:
+            continue
+        measure, factor = _measure(item.get('unit') or 'pcs')
+        stock[(name, measure)] = stock.get((name, measure), 0.0) + quantity * factor
+        names.setdefault(name, {'ingredientName': name})
+    return stock, IngredientIndex(names.values())
+
+
+def subtract_fridge_stock(entries: Dict[AggregateKey, Dict[str, Any]], fridge_items: Iterable[Dict[str, Any]]) -> None:
+    """
+    Reduce each entry by the matching FridgeItem stock, in place
+
+    An exact canonical name wins; otherwise the closest fridge name from
+    the ingredient matcher is used ("chicken" is covered by "chicken
+    breast"). Stock in an incompatible unit (pieces vs grams) is left
+    alone, and stock used for one line is not counted again for another.
+    Covered amounts are recorded in base units under 'in_fridge'.
+    """
+    stock, index = _fridge_stock(fridge_items)
+    for (name, measure), entry in entries.items():
+        available = stock.get((name, measure), 0.0)
+        if available <= 0:
+            match = index.match(name)
+            if match is None:
+                continue
+            name = match.item['ingredientName']
+            available = stock.get((name, measure), 0.0)
+        if available <= 0:
+            continue
+        covered = min(available, entry['base'])
+        stock[(name, measure)] = available - covered
+        entry['base'] -= covered
+        entry['in_fridge'] = entry.get('in_fridge', 0.0) + covered
+
+
+def _display_quantity(value: float) -> float:
+    value = round(value, 2)
+    return int(value) if value == int(value) else value
+
+
+def shopping_items(entries: Dict[AggregateKey, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Entries still needed after the fridge, as grocery items in display units
+
+    Returns:
+        Items with 'name', 'quantity' (number), 'unit', 'category',
+        'purchased' and, when the fridge covered part of it, 'inFridge'
+    """
+    items = []
+    for entry in entries.values():
+        if entry['base'] <= _EPSILON:
+            continue
+        item = {
+            'name': entry['name'],
+            'quantity': _display_quantity(entry['base'] / entry['factor']),
+            'unit': entry['unit'],
+            'category': entry['category'],
+            'purchased': False,
+        }
+        if entry.get('in_fridge'):
+            item['inFridge'] = _display_quantity(entry['in_fridge'] / entry['factor'])
+        items.append(item)
+    return items
+
+
+def group_by_category(items: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    grouped: Dict[str, List[Dict[str, Any]]] = {}
+    for item in items:
+        grouped.setdefault(item['category'], []).append(item)
+    return grouped
+
+
+def build_grocery_items(db, user_id: str, start_date: str, end_date: str) -> List[Dict[str, Any]]:
+    """
+    Shopping list for the user's meal plans in [start_date, end_date]
+
+    Reads are one projected range query for the plans, one batched get_all
+    for their recipes and the cached fridge snapshot, however many plans
+    the range holds.
+    """
+    plans = [doc.to_dict() for doc in meal_plans_in_range(db, user_id, start_date, end_date).select(_PLAN_FIELDS).stream()]
+    recipes = get_documents(db, (plan.get('recipe') for plan in plans))
+    entries = aggregate_ingredients(plans, recipes)
+    subtract_fridge_stock(entries, load_fridge_items(db, user_id))
+    return shopping_items(entries)
@@ -0,0 +1,258 @@
+"""
+Grocery List Item Storage
+Items live in GroceryList/{list_id}/items/{item_id} so edits touch one small document
+"""
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from firebase_admin import firestore
+
+from utils.firestore_batch import commit_batched
+from utils.queries import latest_grocery_list_query
+
+logger = logging.getLogger(__name__)
+
+# Internal ordering field; never returned to clients
+_POSITION = 'position'
+
+# User document field pointing at the list the grocery screens operate on
+ACTIVE_LIST_FIELD = 'activeGroceryListId'
+
+
+def items_collection(list_ref):
+    return list_ref.collection('items')
+
+
+def new_item(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Grocery item fields for a request body (defaults as used by the app)."""
+    return {
+        'name': data['name'],
+        'quantity': data.get('quantity', '1'),
+        'unit': data.get('unit', 'pcs'),
+        'category': data.get('category', 'Other'),
+        'purchased': bool(data.get('purchased', False)),
+        'addedAt': datetime.utcnow().isoformat()
+    }
+
+
+def _next_positions(count: int) -> List[int]:
+    """Increasing sort keys for new items; later additions always sort last."""
+    base = time.time_ns()
+    return [base + offset for offset in range(count)]
+
+
+def _serialize_item(snapshot_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    item = {key: value for key, value in data.items() if key != _POSITION}
+    item['id'] = snapshot_id
+    return item
+
+
+def migrate_legacy_items(db, list_ref) -> int:
+    """
+    Move a list's legacy ``items`` array into the items subcollection
+
+    Runs in a transaction, so two requests racing to migrate the same list
+    cannot both copy the items. Array order is kept via the position field.
+    A list that is already migrated is left untouched.
+
+    Returns:
+        Number of items migrated
+    """
+    @firestore.transactional
+    def apply(transaction):
+        snapshot = list_ref.get(transaction=transaction)
+        legacy = (snapshot.to_dict() or {}).get('items') if snapshot.exists else None
+        if not isinstance(legacy, list):
+            return 0
+        collection = items_collection(list_ref)
+        for position, item in enumerate(legacy):
+            if isinstance(item, dict):
+                transaction.set(collection.document(), {**item, _POSITION: position})
+        transaction.update(list_ref, {'items': firestore.DELETE_FIELD})
+        return len(legacy)
+
+    migrated = apply(db.transaction())
+    if migrated:
+        logger.info(f"🛒 Migrated {migrated} grocery items of list {list_ref.id} to the items subcollection")
+    return migrated
+
+
+def ensure_item_storage(db, list_snapshot) -> None:
+    """Migrate a fetched list on first access if it still stores an items array."""
+    if isinstance((list_snapshot.to_dict() or {}).get('items'), list):
+        migrate_legacy_items(db, list_snapshot.reference)
+
+
+def load_items(db, list_ref) -> List[Dict[str, Any]]:
+    """All items of a list in display order, each with its document 'id'."""
+    query = items_collection(list_ref).order_by(_POSITION)
+    return [_serialize_item(doc.id, doc.to_dict()) for doc in query.stream()]
+
+
+def resolve_item(db, list_ref, item_key: str):
+    """
+    Reference to an item addressed by id, or by its index in display order
+
+    Numeric keys are kept for app versions that still address items by
+    array index; they cost one read of the list's item ids.
+
+    Returns:
+        DocumentReference, or None if the index is out of range
+    """
+    if item_key.isdigit():
+        index = int(item_key)
+        refs = [doc.reference for doc in items_collection(list_ref).order_by(_POSITION).select([]).stream()]
+        return refs[index] if index < len(refs) else None
+    return items_collection(list_ref).document(item_key)
+
+
+def add_items(db, list_ref, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Append items to a list with one write per item (plus the list's updatedAt)
+
+    Returns:
+        The stored items with their new ids
+    """
+    collection = items_collection(list_ref)
+    writes, added = [], []
+    for position, item in zip(_next_positions(len(items)), items):
+        item_ref = collection.document()
+        writes.append(('set', item_ref, {**item, _POSITION: position}))
+        added.append(_serialize_item(item_ref.id, item))
+    writes.append(('update', list_ref, {'updatedAt': datetime.utcnow()}))
+    commit_batched(db, writes)
+    return added
+
+
+def _active_pointer_op(db, user_id: str, list_id: Optional[str]):
+    value = list_id if list_id else firestore.DELETE_FIELD
+    return ('merge', db.collection('User').document(user_id), {ACTIVE_LIST_FIELD: value})
+
+
+def set_active_list(db, user_id: str, list_id: Optional[str]) -> None:
+    """Point (or, with None, un-point) the user's active grocery list."""
+    commit_batched(db, [_active_pointer_op(db, user_id, list_id)])
+
+
+def read_active_pointer(db, user_id: str) -> Optional[str]:
+    """
+    The user's activeGroceryListId, read fresh from Firestore
+
+    Deliberately not taken from the per-process user cache: another worker
+    may have created a newer list, and the old one would still resolve.
+    """
+    snapshot = db.collection('User').document(user_id).get(field_paths=[ACTIVE_LIST_FIELD])
+    return (snapshot.to_dict() or {}).get(ACTIVE_LIST_FIELD) if snapshot.exists else None
+
+
+def get_active_list(db, user_id: str):
+    """
+    Resolve the user's active grocery list with two point reads
+
+    The activeGroceryListId pointer is read (projected to that field) and
+    followed. Users without a pointer, or whose pointer names a deleted
+    list, fall back to the newest list by createdAt (indexed, limit 1) and
+    get the pointer repaired. Legacy item arrays are migrated.
+
+    Returns:
+        The list's DocumentSnapshot, or None if the user has no lists
+    """
+    pointer = read_active_pointer(db, user_id)
+    if pointer:
+        snapshot = db.collection('GroceryList').document(pointer).get()
+        if snapshot.exists and (snapshot.to_dict() or {}).get('userId') == user_id:
+            ensure_item_storage(db, snapshot)
+            return snapshot
+
+    docs = list(latest_grocery_list_query(db, user_id).stream())
+    snapshot = docs[0] if docs else None
+    latest_id = snapshot.id if snapshot else None
+    if latest_id != pointer:
+        set_active_list(db, user_id, latest_id)
+    if snapshot is not None:
+        ensure_item_storage(db, snapshot)
+    return snapshot
+
+
+def create_list(db, list_data: Dict[str, Any], items: List[Dict[str, Any]],
+                activate: bool = True) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Create a GroceryList document and its items in batched writes
+
+    With ``activate`` the owner's activeGroceryListId is pointed at the new
+    list in the same first batch.
+
+    Returns:
+        ``(list_id, items_with_ids)``
+    """
+    list_ref = db.collection('GroceryList').document()
+    collection = items_collection(list_ref)
+    writes = [('set', list_ref, list_data)]
+    if activate:
+        writes.append(_active_pointer_op(db, list_data['userId'], list_ref.id))
+    created = []
+    for position, item in zip(_next_positions(len(items)), items):
+        item_ref = collection.document()
+        writes.append(('set', item_ref, {**item, _POSITION: position}))
+        created.append(_serialize_item(item_ref.id, item))
+    commit_batched(db, writes)
+    return list_ref.id, created
+
+
+def set_item_purchased(db, list_ref, item_ref, purchased: Optional[bool] = None) -> Optional[Dict[str, Any]]:
+    """
+    Toggle (or set) one item's purchased flag in a transaction
+
+    Only the item document is rewritten, so two shoppers ticking off
+    different items never overwrite each other.
+
+    Returns:
+        The updated item, or None if it does not exist
+    """
+    @firestore.transactional
+    def apply(transaction):
+        snapshot = item_ref.get(transaction=transaction)
+        if not snapshot.exists:
+            return None
+        data = snapshot.to_dict()
+        data['purchased'] = (not data.get('purchased', False)) if purchased is None else bool(purchased)
+        now = datetime.utcnow()
+        transaction.update(item_ref, {'purchased': data['purchased'], 'updatedAt': now.isoformat()})
+        transaction.update(list_ref, {'updatedAt': now})
+        data['updatedAt'] = now.isoformat()
+        return _serialize_item(snapshot.id, data)
+
+    return apply(db.transaction())
+
+
+def delete_item(db, list_ref, item_ref) -> Optional[Dict[str, Any]]:
+    """
+    Delete one item document
+
+    Returns:
+        The removed item, or None if it did not exist
+    """
+    snapshot = item_ref.get()
+    if not snapshot.exists:
+        return None
+    commit_batched(db, [
+        ('delete', item_ref, None),
+        ('update', list_ref, {'updatedAt': datetime.utcnow()}),
+    ])
+    return _serialize_item(snapshot.id, snapshot.to_dict())
+
+
+def delete_list(db, list_ref, user_id: str, was_active: bool = False) -> None:
+    """
+    Delete a list and its items subcollection (Firestore does not cascade deletes)
+
+    Deleting the active list clears the pointer; the next lookup falls back
+    to the newest remaining list.
+    """
+    writes = [('delete', item_ref, None) for item_ref in items_collection(list_ref).list_documents()]
+    writes.append(('delete', list_ref, None))
+    if was_active:
+        writes.append(_active_pointer_op(db, user_id, None))
+    commit_batched(db, writes)
@@ -0,0 +1,151 @@
+"""
+Image Preprocessing
+Shrink uploaded photos before they are sent to the vision model
+"""
+import base64
+import binascii
+import hashlib
+import io
+import logging
+from typing import Any, BinaryIO, Dict, NamedTuple, Optional, Union
+
+try:
+    from PIL import Image, ImageOps, UnidentifiedImageError
+except ImportError:  # Pillow is optional; images are then forwarded untouched
+    Image = None
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Receipts are text: grayscale keeps them legible at a fraction of the size
+RECEIPT = 'receipt'
+PHOTO = 'photo'
+
+
+_HASH_CHUNK_BYTES = 1024 * 1024
+
+
+class PreparedImage(NamedTuple):
+    base64: str
+    original_bytes: int
+    processed_bytes: int
+    content_hash: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+    processed: bool = False
+
+    def stats(self) -> Dict[str, Any]:
+        saved = self.original_bytes - self.processed_bytes
+        return {
+            'processed': self.processed,
+            'original_bytes': self.original_bytes,
+            'processed_bytes': self.processed_bytes,
+            'saved_bytes': saved,
+            'saved_percent': round(100.0 * saved / self.original_bytes, 1) if self.original_bytes else 0.0,
+            'width': self.width,
+            'height': self.height,
+            'content_hash': self.content_hash,
+        }
+
+
+def _sha256(source: BinaryIO) -> str:
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: source.read(_HASH_CHUNK_BYTES), b''):
+        digest.update(chunk)
+    source.seek(0)
+    return digest.hexdigest()
+
+
+def decode_base64_image(image_base64: str) -> bytes:
+    """
+    Decode a base64 image, accepting an optional data URL prefix
+
+    Raises:
+        ValueError: If the string is not valid base64
+    """
+    _, _, payload = image_base64.rpartition('base64,')
+    try:
+        return base64.b64decode(payload, validate=False)
+    except (binascii.Error, ValueError) as e:
+        raise ValueError(f"Invalid base64 image data: {e}")
+
+
+def preprocess_image(
+    image: Union[bytes, str, BinaryIO],
+    mode: str = PHOTO,
+    max_edge: Optional[int] = None,
+    quality: Optional[int] = None
+) -> PreparedImage:
+    """
+    Decode an image once, downscale it and re-encode it as JPEG
+
+    The longest edge is capped at ``max_edge`` (VISION_MAX_EDGE), EXIF
+    rotation is applied, and receipts are converted to grayscale. If the
+    re-encoded image would be larger than the upload, the original is kept.
+    Without Pillow, or for formats Pillow cannot read, the image is passed
+    through unchanged.
+
+    Args:
+        image: Raw bytes, a seekable binary file object, or a base64 string
+            (data URL prefix allowed)
+        mode: RECEIPT or PHOTO
+        max_edge: Longest edge in pixels (defaults to config)
+        quality: JPEG quality 1-95 (defaults to config)
+
+    Returns:
+        PreparedImage with the base64 payload for the model and size stats
+    """
+    if isinstance(image, str):
+        source = io.BytesIO(decode_base64_image(image))
+    elif isinstance(image, (bytes, bytearray)):
+        source = io.BytesIO(image)
+    else:
+        # Seekable upload stream (e.g. a spooled temp file) - read in place
+        source = image
+    source.seek(0, io.SEEK_END)
+    original_bytes = source.tell()
+    source.seek(0)
+    # Identifies re-submitted uploads (retries, double taps) for the scan cache
+    content_hash = _sha256(source)
+
+    max_edge = max_edge or config.VISION_MAX_EDGE
+    quality = quality or config.VISION_JPEG_QUALITY
+
+    def passthrough() -> PreparedImage:
+        source.seek(0)
+        return PreparedImage(
+            base64.b64encode(source.read()).decode('ascii'), original_bytes, original_bytes, content_hash
+        )
+
+    if Image is None or not config.VISION_PREPROCESS_ENABLED:
+        return passthrough()
+
+    try:
+        with Image.open(source) as opened:
+            picture = ImageOps.exif_transpose(opened)
+            original_size = picture.size
+            if max(picture.size) > max_edge:
+                picture.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+            picture = picture.convert('L' if mode == RECEIPT else 'RGB')
+
+            buffer = io.BytesIO()
+            picture.save(buffer, format='JPEG', quality=quality, optimize=True)
+    except (UnidentifiedImageError, OSError) as e:
+        logger.warning(f"Could not preprocess image, sending original: {e}")
+        return passthrough()
+
+    encoded = buffer.getvalue()
+    if len(encoded) >= original_bytes and picture.size == original_size:
+        return passthrough()
+
+    return PreparedImage(
+        base64=base64.b64encode(encoded).decode('ascii'),
+        original_bytes=original_bytes,
+        processed_bytes=len(encoded),
+        content_hash=content_hash,
+        width=picture.size[0],
+        height=picture.size[1],
+        processed=True
+    )
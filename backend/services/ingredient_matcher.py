@@ -0,0 +1,88 @@
+"""
+Ingredient Matching
+Normalise ingredient names and resolve recipe ingredients against fridge items
+"""
+import re
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+_NON_WORD = re.compile(r'[^a-z0-9\s]+')
+
+# Words whose trailing "s" is not a plural marker
+_INVARIANT = {'asparagus', 'couscous', 'hummus', 'molasses', 'swiss', 'watercress', 'grass', 'bass', 'citrus'}
+
+
+def singularize(word: str) -> str:
+    """Fold common English plural endings ("tomatoes" -> "tomato")."""
+    if len(word) <= 3 or word in _INVARIANT:
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith('oes') or word.endswith(('ches', 'shes', 'xes', 'sses')):
+        return word[:-2]
+    if word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+
+def tokenize(name: Optional[str]) -> Tuple[str, ...]:
+    """Lowercase, strip punctuation and singularise each word of ``name``."""
+    text = _NON_WORD.sub(' ', str(name or '').lower())
+    return tuple(singularize(token) for token in text.split())
+
+
+def normalize_ingredient(name: Optional[str]) -> str:
+    """Canonical form of an ingredient name, e.g. "Cherry-Tomatoes" -> "cherry tomato"."""
+    return ' '.join(tokenize(name))
+
+
+class IngredientMatch(NamedTuple):
+    position: int
+    item: Dict[str, Any]
+    score: float
+
+
+class IngredientIndex:
+    """Inverted token index over a list of fridge items.
+
+    A query matches an item when all tokens of one name appear in the other
+    (so "chicken" matches "chicken breast" and vice versa, but "pea" no longer
+    matches "peanut"). Candidates are scored by token Jaccard similarity;
+    ties go to the earlier item, which keeps results deterministic.
+    Only items sharing at least one token with the query are examined.
+    """
+
+    def __init__(self, items: Iterable[Dict[str, Any]], name_key: str = 'ingredientName'):
+        self.items: List[Dict[str, Any]] = list(items)
+        self._tokens = [frozenset(tokenize(item.get(name_key))) for item in self.items]
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        for position, tokens in enumerate(self._tokens):
+            for token in tokens:
+                self._postings[token].append(position)
+        self._removed = set()
+
+    def match(self, name: Optional[str]) -> Optional[IngredientMatch]:
+        """Return the best remaining item for ``name`` or None."""
+        query = frozenset(tokenize(name))
+        if not query:
+            return None
+
+        candidates = set()
+        for token in query:
+            candidates.update(self._postings.get(token, ()))
+
+        best = None
+        for position in candidates:
+            if position in self._removed:
+                continue
+            tokens = self._tokens[position]
+            if not (query <= tokens or tokens <= query):
+                continue
+            score = len(query & tokens) / len(query | tokens)
+            if best is None or (score, -position) > (best.score, -best.position):
+                best = IngredientMatch(position, self.items[position], score)
+        return best
+
+    def remove(self, position: int) -> None:
+        """Exclude an item from future matches (e.g. once it is used up)."""
+        self._removed.add(position)
@@ -0,0 +1,298 @@
+"""
+Background Job Queue
+Run slow work (vision model scans) off the request thread with a bounded
+in-process worker pool and a SQLite job table - no external broker needed
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+FINISHED_STATES = (SUCCEEDED, FAILED)
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _process_start_time(pid: int) -> Optional[str]:
+    """Kernel start time of ``pid`` from /proc (None where unavailable, e.g. macOS)."""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # The command name may contain spaces and parentheses; starttime is the 20th field after it
+    return stat.rsplit(')', 1)[1].split()[19]
+
+
+def _owner_token() -> str:
+    """
+    Identity of this process for the jobs table: "<pid>:<start time>"
+
+    A pid alone is not enough, since pids are reused once a process exits.
+    Where the start time cannot be read, a random suffix at least tells this
+    process apart from an earlier one that had the same pid.
+    """
+    pid = os.getpid()
+    return f"{pid}:{_process_start_time(pid) or uuid.uuid4().hex}"
+
+
+def _owner_alive(owner: Optional[str]) -> bool:
+    """True if the process behind an owner token may still be running."""
+    pid, _, started = (owner or '').partition(':')
+    if not pid.isdigit() or not _process_alive(int(pid)):
+        return False
+    current = _process_start_time(int(pid))
+    return current is None or current == started
+
+
+class JobQueueFull(Exception):
+    """Raised when the number of queued/running jobs hits the configured cap"""
+    pass
+
+
+class JobQueue:
+    """Bounded worker pool whose job status lives in a SQLite table.
+
+    ``submit`` records the job and hands the callable to a thread pool of
+    ``max_workers``; at most ``max_pending`` jobs may be queued or running
+    at once. ``run`` uses the same pool and limits for callers that wait
+    for the result. Results are stored as JSON so any process sharing the
+    file can answer status polls. Jobs left unfinished by a process that no
+    longer exists are marked failed on start-up, and finished jobs are
+    purged after ``result_ttl`` seconds.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        max_workers: int = 2,
+        max_pending: int = 20,
+        result_ttl: float = 3600.0,
+        timer: Callable[[], float] = time.time
+    ):
+        self.path = Path(path)
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self._timer = timer
+        self._lock = threading.Lock()
+        self._finished = threading.Condition(self._lock)
+        self._pending = 0
+        self._pid = os.getpid()
+        self._owner = _owner_token()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job-worker')
+
+        if str(path) != ':memory:':
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, timeout=10)
+        with self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                ' id TEXT PRIMARY KEY,'
+                ' kind TEXT NOT NULL,'
+                ' user_id TEXT,'
+                ' owner TEXT,'
+                ' status TEXT NOT NULL,'
+                ' result TEXT,'
+                ' error TEXT,'
+                ' created_at REAL NOT NULL,'
+                ' started_at REAL,'
+                ' finished_at REAL)'
+            )
+            columns = {row[1] for row in self._conn.execute('PRAGMA table_info(jobs)')}
+            if 'owner' not in columns:
+                # Tables from before owner tokens; their pid-only rows count as interrupted
+                self._conn.execute('ALTER TABLE jobs ADD COLUMN owner TEXT')
+        self.recover_stale()
+
+    def recover_stale(self) -> int:
+        """Fail unfinished jobs whose worker process has exited (e.g. a restart)."""
+        with self._lock, self._conn:
+            owners = [row[0] for row in self._conn.execute(
+                'SELECT DISTINCT owner FROM jobs WHERE status IN (?, ?)', (QUEUED, RUNNING)
+            )]
+            # Another token with our pid can only belong to an earlier process (e.g. pid 1 in a container)
+            dead = [
+                owner for owner in owners
+                if owner != self._owner and (
+                    not _owner_alive(owner) or owner.partition(':')[0] == str(self._pid)
+                )
+            ]
+            recovered = 0
+            for owner in dead:
+                cursor = self._conn.execute(
+                    'UPDATE jobs SET status = ?, error = ?, finished_at = ?'
+                    ' WHERE status IN (?, ?) AND owner IS ?',
+                    (FAILED, 'Interrupted by a server restart', self._timer(), QUEUED, RUNNING, owner)
+                )
+                recovered += cursor.rowcount
+        if recovered:
+            logger.warning(f"Marked {recovered} interrupted jobs as failed")
+        return recovered
+
+    def submit(self, kind: str, user_id: Optional[str], func: Callable[..., Any], *args, **kwargs) -> str:
+        """
+        Queue ``func(*args, **kwargs)`` and return the new job id
+
+        Raises:
+            JobQueueFull: If ``max_pending`` jobs are already queued or running
+        """
+        job_id, _ = self._submit(kind, user_id, func, args, kwargs)
+        return job_id
+
+    def run(self, kind: str, user_id: Optional[str], func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run ``func(*args, **kwargs)`` on the worker pool and wait for its result
+
+        For synchronous requests: they count against the same worker and
+        ``max_pending`` limits as queued jobs, so waiting callers cannot pile
+        up more concurrent model calls than the pool allows.
+
+        Raises:
+            JobQueueFull: If ``max_pending`` jobs are already queued or running
+            Exception: Whatever ``func`` raised
+        """
+        _, future = self._submit(kind, user_id, func, args, kwargs)
+        return future.result()
+
+    def _submit(self, kind: str, user_id: Optional[str], func: Callable[..., Any], args: tuple, kwargs: dict):
+        job_id = uuid.uuid4().hex
+        now = self._timer()
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise JobQueueFull(f"Too many jobs in progress ({self._pending})")
+            self._pending += 1
+            with self._conn:
+                self._conn.execute(
+                    'DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at <= ?',
+                    (now - self.result_ttl,)
+                )
+                self._conn.execute(
+                    'INSERT INTO jobs (id, kind, user_id, owner, status, created_at)'
+                    ' VALUES (?, ?, ?, ?, ?, ?)',
+                    (job_id, kind, user_id, self._owner, QUEUED, now)
+                )
+
+        try:
+            future = self._executor.submit(self._run, job_id, func, args, kwargs)
+        except RuntimeError:
+            self._finish(job_id, FAILED, error='Job queue is shutting down')
+            raise
+        return job_id, future
+
+    def _run(self, job_id: str, func: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE jobs SET status = ?, started_at = ? WHERE id = ?',
+                (RUNNING, self._timer(), job_id)
+            )
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            self._finish(job_id, FAILED, error=str(e))
+            # Kept on the future for run(); queued jobs are only read back from the table
+            raise
+        self._finish(job_id, SUCCEEDED, result=result)
+        return result
+
+    def _finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        payload = json.dumps(result, default=str) if result is not None else None
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    'UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?',
+                    (status, payload, error, self._timer(), job_id)
+                )
+            self._pending -= 1
+            self._finished.notify_all()
+
+    def get(self, job_id: str, user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Return the job's status dict, or None if unknown (or owned by another user)."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT id, kind, user_id, status, result, error, created_at, started_at, finished_at'
+                ' FROM jobs WHERE id = ?',
+                (job_id,)
+            ).fetchone()
+        if row is None or (user_id is not None and row[2] != user_id):
+            return None
+
+        job = {
+            'job_id': row[0],
+            'kind': row[1],
+            'status': row[3],
+            'created_at': row[6],
+            'started_at': row[7],
+            'finished_at': row[8],
+        }
+        if row[3] == SUCCEEDED:
+            job['result'] = json.loads(row[4]) if row[4] else None
+        elif row[3] == FAILED:
+            job['error'] = row[5]
+        return job
+
+    def wait(self, job_id: str, timeout: float, user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Long-poll: block up to ``timeout`` seconds for the job to finish."""
+        deadline = time.monotonic() + max(0.0, timeout)
+        while True:
+            job = self.get(job_id, user_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job['status'] in FINISHED_STATES or remaining <= 0:
+                return job
+            # Re-check the table periodically so jobs run by other processes are seen too
+            with self._finished:
+                self._finished.wait(min(remaining, 0.5))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+            return {
+                'pending': self._pending,
+                'max_pending': self.max_pending,
+                'jobs': counts,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+
+_job_queue: Optional[JobQueue] = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Return the process-wide job queue, creating it on first use."""
+    global _job_queue
+
+    from config import config
+
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(
+                config.JOB_QUEUE_PATH,
+                max_workers=config.JOB_WORKERS,
+                max_pending=config.JOB_MAX_PENDING,
+                result_ttl=config.JOB_RESULT_TTL
+            )
+        return _job_queue
@@ -0,0 +1,113 @@
+"""
+LLM JSON Parsing Helpers
+Clean up and recover JSON payloads returned by generative models
+"""
+import json
+from typing import Any, Dict, List, Optional
+
+_decoder = json.JSONDecoder()
+
+
+def strip_code_fences(text: str) -> str:
+    """Remove a surrounding ```json ... ``` markdown fence if present."""
+    text = text.strip()
+    if text.startswith('```'):
+        # Remove ```json or ``` at start
+        text = text.split('\n', 1)[1] if '\n' in text else text[3:]
+        # Remove ``` at end
+        if text.endswith('```'):
+            text = text[:-3]
+        text = text.strip()
+    return text
+
+
+def extract_json_objects(text: str) -> List[Dict[str, Any]]:
+    """
+    Recover every decodable JSON object from a (possibly malformed) array
+
+    Used when the model returns an array where one entry is truncated or
+    broken: each ``{`` is tried as the start of an object, malformed
+    entries are skipped and decoding resumes at the next candidate.
+
+    Args:
+        text: Raw model output
+
+    Returns:
+        Decoded objects in document order
+    """
+    objects = []
+    pos = text.find('{')
+    while pos != -1:
+        try:
+            value, end = _decoder.raw_decode(text, pos)
+        except json.JSONDecodeError:
+            pos = text.find('{', pos + 1)
+            continue
+        if isinstance(value, dict):
+            objects.append(value)
+        pos = text.find('{', end)
+    return objects
+
+
+def parse_json_list(text: str) -> List[Any]:
+    """
+    Parse a model response expected to hold a JSON array
+
+    Accepts a bare array, an object wrapping a single array (e.g.
+    ``{"recipes": [...]}``) or a single object, and falls back to
+    per-item recovery when the payload as a whole is invalid JSON.
+    """
+    text = strip_code_fences(text)
+    try:
+        parsed = json.loads(text)
+    except json.JSONDecodeError:
+        return extract_json_objects(text)
+
+    if isinstance(parsed, list):
+        return parsed
+    if isinstance(parsed, dict):
+        lists = [value for value in parsed.values() if isinstance(value, list)]
+        if len(lists) == 1 and all(isinstance(item, dict) for item in lists[0]):
+            return lists[0]
+        return [parsed]
+    return []
+
+
+def validate_items(
+    items: List[Any],
+    required_fields: Dict[str, type],
+    limit: Optional[int] = None,
+    unique_field: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Keep only items that match a minimal schema
+
+    Args:
+        items: Candidate items
+        required_fields: Field name -> expected type; values must be non-empty
+        limit: Maximum number of items to keep
+        unique_field: Drop items whose value for this field (case-insensitive)
+            was already seen
+
+    Returns:
+        Valid items, in order
+    """
+    valid = []
+    seen = set()
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        if not all(
+            isinstance(item.get(field), expected) and item.get(field)
+            for field, expected in required_fields.items()
+        ):
+            continue
+        if unique_field:
+            marker = str(item.get(unique_field, '')).strip().lower()
+            if marker in seen:
+                continue
+            seen.add(marker)
+        valid.append(item)
+        if limit is not None and len(valid) >= limit:
+            break
+    return valid
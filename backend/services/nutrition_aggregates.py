@@ -0,0 +1,315 @@
+"""
+Daily Nutrition Aggregates
+Per-day totals kept in users/{uid}/nutrition/{date}, updated on every meal/water write
+"""
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from firebase_admin import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from utils.queries import daily_nutrition_in_range
+
+logger = logging.getLogger(__name__)
+
+NUTRIENTS = ('calories', 'protein', 'carbs', 'fat', 'fiber')
+
+# Bumped when the document layout changes; older (or write-created) days are rebuilt on read
+AGGREGATE_VERSION = 1
+
+# Marker document in the same subcollection (it has no 'date', so range queries skip it)
+_BACKFILL_DOC = '_backfill'
+
+# Users whose history has been backfilled, so the marker is read once per process
+_backfilled_users = set()
+_backfilled_lock = threading.Lock()
+
+
+def daily_ref(db, user_id: str, date_str: str):
+    """Reference to a user's aggregate document for one day (YYYY-MM-DD)."""
+    return db.collection('users').document(user_id).collection('nutrition').document(date_str)
+
+
+def nutrient_values(nutrition: Optional[Dict[str, Any]]) -> Dict[str, float]:
+    """Numeric macro values of a meal's nutrition map; missing or non-numeric values count as 0."""
+    values = {}
+    for key in NUTRIENTS:
+        try:
+            values[key] = float((nutrition or {}).get(key) or 0)
+        except (TypeError, ValueError):
+            values[key] = 0.0
+    return values
+
+
+def meal_summary(meal_id: str, meal_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a NutritionLog entry as embedded in the daily document (references become ids)."""
+    summary = dict(meal_data)
+    summary['id'] = meal_id
+    for key in ('user', 'recipe'):
+        if hasattr(summary.get(key), 'id'):
+            summary[key] = summary[key].id
+    return summary
+
+
+def meal_delta(meal_id: str, meal_data: Dict[str, Any], sign: int = 1) -> Dict[str, Any]:
+    """
+    Merge payload that adds (sign=1) or removes (sign=-1) one meal from a day
+
+    Totals and the meal count use Increment transforms, so concurrent writes
+    for the same day never overwrite each other and need no read first.
+    """
+    values = nutrient_values(meal_data.get('nutrition'))
+    return {
+        'date': meal_data['date'],
+        'totals': {key: firestore.Increment(sign * value) for key, value in values.items()},
+        'mealCount': firestore.Increment(sign),
+        'meals': {meal_id: meal_summary(meal_id, meal_data) if sign > 0 else firestore.DELETE_FIELD},
+        'updatedAt': datetime.utcnow()
+    }
+
+
+def summarize_day(date_str: str, meals: Iterable[Tuple[str, Dict[str, Any]]], water_intake: Any = 0) -> Dict[str, Any]:
+    """Full aggregate document computed from a day's NutritionLog entries."""
+    totals = dict.fromkeys(NUTRIENTS, 0.0)
+    embedded = {}
+    for meal_id, meal_data in meals:
+        for key, value in nutrient_values(meal_data.get('nutrition')).items():
+            totals[key] += value
+        embedded[meal_id] = meal_summary(meal_id, meal_data)
+    return {
+        'date': date_str,
+        'totals': totals,
+        'mealCount': len(embedded),
+        'meals': embedded,
+        'waterIntake': water_intake or 0,
+        'version': AGGREGATE_VERSION,
+        'updatedAt': datetime.utcnow()
+    }
+
+
+def daily_view(date_str: str, data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Normalise an aggregate document for API responses (rounded totals, meals oldest first)."""
+    data = data or {}
+    totals = data.get('totals') or {}
+    meals = sorted(
+        (data.get('meals') or {}).values(),
+        key=lambda meal: str(meal.get('createdAt') or '')
+    )
+    return {
+        'date': date_str,
+        'totals': {key: round(float(totals.get(key) or 0), 2) for key in NUTRIENTS},
+        'meal_count': int(data.get('mealCount') or 0),
+        'meals': meals,
+        'water_intake': data.get('waterIntake', 0),
+    }
+
+
+def add_meal_log(db, user_id: str, meal_data: Dict[str, Any]) -> str:
+    """
+    Create a NutritionLog entry and add it to the day's aggregate in one batch
+
+    Returns:
+        The new NutritionLog document id
+    """
+    meal_ref = db.collection('NutritionLog').document()
+    batch = db.batch()
+    batch.set(meal_ref, meal_data)
+    batch.set(daily_ref(db, user_id, meal_data['date']), meal_delta(meal_ref.id, meal_data), merge=True)
+    batch.commit()
+    return meal_ref.id
+
+
+def remove_meal_log(db, user_id: str, meal_id: str) -> str:
+    """
+    Delete a NutritionLog entry and subtract it from its day in one transaction
+
+    Returns:
+        'deleted', 'not_found' or 'forbidden'
+    """
+    meal_ref = db.collection('NutritionLog').document(meal_id)
+
+    @firestore.transactional
+    def apply(transaction):
+        snapshot = meal_ref.get(transaction=transaction)
+        if not snapshot.exists:
+            return 'not_found'
+        meal_data = snapshot.to_dict()
+        if meal_data['user'].id != user_id:
+            return 'forbidden'
+
+        transaction.delete(meal_ref)
+        if meal_data.get('date'):
+            transaction.set(
+                daily_ref(db, user_id, meal_data['date']),
+                meal_delta(meal_id, meal_data, sign=-1),
+                merge=True
+            )
+        return 'deleted'
+
+    return apply(db.transaction())
+
+
+def set_water_intake(db, user_id: str, date_str: str, amount: Any) -> Tuple[str, bool]:
+    """
+    Set the day's water intake (glasses) on the WaterIntake log and the aggregate
+
+    Returns:
+        ``(water_intake_id, created)``
+    """
+    user_ref = db.collection('User').document(user_id)
+    query = db.collection('WaterIntake').where(
+        filter=FieldFilter('user', '==', user_ref)
+    ).where(
+        filter=FieldFilter('date', '==', date_str)
+    ).limit(1)
+    docs = list(query.stream())
+    now = datetime.utcnow()
+
+    batch = db.batch()
+    if docs:
+        water_ref = docs[0].reference
+        batch.update(water_ref, {'amount': amount, 'updatedAt': now})
+    else:
+        water_ref = db.collection('WaterIntake').document()
+        batch.set(water_ref, {'user': user_ref, 'date': date_str, 'amount': amount, 'createdAt': now})
+    batch.set(
+        daily_ref(db, user_id, date_str),
+        {'date': date_str, 'waterIntake': amount, 'updatedAt': now},
+        merge=True
+    )
+    batch.commit()
+    return water_ref.id, not docs
+
+
+def rebuild_daily(db, user_id: str, date_str: str) -> Dict[str, Any]:
+    """
+    Recompute a day's aggregate from NutritionLog/WaterIntake and store it
+
+    Used for days written before aggregates existed. Runs in a transaction
+    so a meal logged meanwhile is applied on top of the rebuilt totals
+    rather than lost.
+    """
+    user_ref = db.collection('User').document(user_id)
+    day_ref = daily_ref(db, user_id, date_str)
+    meals_query = db.collection('NutritionLog').where(
+        filter=FieldFilter('user', '==', user_ref)
+    ).where(
+        filter=FieldFilter('date', '==', date_str)
+    )
+    water_query = db.collection('WaterIntake').where(
+        filter=FieldFilter('user', '==', user_ref)
+    ).where(
+        filter=FieldFilter('date', '==', date_str)
+    ).limit(1)
+
+    @firestore.transactional
+    def apply(transaction):
+        current = day_ref.get(transaction=transaction)
+        if current.exists and (current.to_dict() or {}).get('version') == AGGREGATE_VERSION:
+            return current.to_dict()
+        meals = [(doc.id, doc.to_dict()) for doc in transaction.get(meals_query)]
+        water_docs = list(transaction.get(water_query))
+        water_intake = water_docs[0].to_dict().get('amount', 0) if water_docs else 0
+        data = summarize_day(date_str, meals, water_intake)
+        transaction.set(day_ref, data)
+        return data
+
+    data = apply(db.transaction())
+    logger.info(f"📊 Rebuilt nutrition aggregate {date_str} for user {user_id} ({data.get('mealCount', 0)} meals)")
+    return data
+
+
+def get_daily_aggregates(db, user_id: str, date_strs: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Fetch the aggregates for several days in one round trip
+
+    Days that predate aggregates (or were only touched by increments so
+    far) are rebuilt once from the raw logs.
+
+    Returns:
+        ``{date: daily_view(...)}`` for every requested date
+    """
+    refs = [daily_ref(db, user_id, date_str) for date_str in date_strs]
+    snapshots = {snapshot.id: snapshot for snapshot in db.get_all(refs)}
+
+    days = {}
+    for date_str in date_strs:
+        snapshot = snapshots.get(date_str)
+        data = snapshot.to_dict() if snapshot is not None and snapshot.exists else None
+        if not data or data.get('version') != AGGREGATE_VERSION:
+            data = rebuild_daily(db, user_id, date_str)
+        days[date_str] = daily_view(date_str, data)
+    return days
+
+
+def backfill_user_aggregates(db, user_id: str) -> int:
+    """
+    Build aggregates for every day with meal or water logs but no current aggregate
+
+    Runs once per user (a marker document records completion), so range
+    reads can trust that a missing day really had nothing logged.
+
+    Returns:
+        Number of days rebuilt
+    """
+    with _backfilled_lock:
+        if user_id in _backfilled_users:
+            return 0
+
+    marker_ref = daily_ref(db, user_id, _BACKFILL_DOC)
+    marker = marker_ref.get()
+    if marker.exists and (marker.to_dict() or {}).get('version') == AGGREGATE_VERSION:
+        with _backfilled_lock:
+            _backfilled_users.add(user_id)
+        return 0
+
+    user_ref = db.collection('User').document(user_id)
+    logged_dates = set()
+    for collection in ('NutritionLog', 'WaterIntake'):
+        query = db.collection(collection).where(filter=FieldFilter('user', '==', user_ref)).select(['date'])
+        logged_dates.update(doc.get('date') for doc in query.stream())
+    logged_dates.discard(None)
+
+    current = {
+        doc.id
+        for doc in db.collection('users').document(user_id).collection('nutrition')
+        .where(filter=FieldFilter('version', '==', AGGREGATE_VERSION)).select(['date']).stream()
+    }
+    stale = sorted(logged_dates - current)
+    for date_str in stale:
+        rebuild_daily(db, user_id, date_str)
+
+    marker_ref.set({'version': AGGREGATE_VERSION, 'daysRebuilt': len(stale), 'completedAt': datetime.utcnow()})
+    with _backfilled_lock:
+        _backfilled_users.add(user_id)
+    logger.info(f"📊 Backfilled {len(stale)} nutrition day(s) for user {user_id}")
+    return len(stale)
+
+
+def load_daily_range(db, user_id: str, start: date, end: date) -> List[Dict[str, Any]]:
+    """
+    Every day in [start, end] (oldest first) from one range query over the aggregates
+
+    Days without a document had nothing logged and read as zeros; documents
+    not yet stamped with the current version are rebuilt from the logs.
+
+    Returns:
+        ``daily_view`` dicts, one per calendar day
+    """
+    backfill_user_aggregates(db, user_id)
+
+    start_str, end_str = start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')
+    found = {}
+    for doc in daily_nutrition_in_range(db, user_id, start_str, end_str).stream():
+        data = doc.to_dict()
+        if data.get('version') != AGGREGATE_VERSION:
+            data = rebuild_daily(db, user_id, doc.id)
+        found[doc.id] = data
+
+    days = []
+    for offset in range((end - start).days + 1):
+        date_str = (start + timedelta(days=offset)).strftime('%Y-%m-%d')
+        days.append(daily_view(date_str, found.get(date_str)))
+    return days
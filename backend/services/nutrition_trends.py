@@ -0,0 +1,138 @@
+"""
+Nutrition Trends
+Rolling averages, goal adherence and macro ratios over a range of daily aggregates
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from services.nutrition_aggregates import NUTRIENTS
+
+# Ranges (days) accepted by /api/nutrition/trend
+TREND_RANGES = (7, 30, 90, 365)
+
+DEFAULT_NUTRITION_GOALS = {
+    'calories': 2000,
+    'protein': 50,
+    'carbs': 250,
+    'fat': 70,
+    'fiber': 25,
+    'water': 8
+}
+
+# Calories, carbs and fat count as "on goal" within +/-10%; protein, fiber
+# and water count once the goal is reached
+ADHERENCE_TOLERANCE = 0.10
+_BAND_GOALS = ('calories', 'carbs', 'fat')
+_MINIMUM_GOALS = ('protein', 'fiber', 'water')
+
+# kcal per gram
+_MACRO_ENERGY = {'protein': 4.0, 'carbs': 4.0, 'fat': 9.0}
+
+
+def rolling_window(range_days: int) -> int:
+    """Smoothing window for a range: 3 days for a week, a week otherwise."""
+    return 3 if range_days <= 7 else 7
+
+
+def _rolling_mean(values: np.ndarray, logged: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean over the last ``window`` days, counting only days with logged meals."""
+    kernel = np.ones(window)
+    sums = np.convolve(np.where(logged, values, 0.0), kernel)[:len(values)]
+    counts = np.convolve(logged.astype(float), kernel)[:len(values)]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+def _clean(values: np.ndarray, digits: int = 1) -> List[Optional[float]]:
+    """NumPy floats to JSON-friendly rounded floats (NaN -> None)."""
+    return [None if np.isnan(value) else round(float(value), digits) for value in values]
+
+
+def compute_trend(days: List[Dict[str, Any]], goals: Optional[Dict[str, Any]] = None,
+                  window: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Vectorised trend statistics for consecutive ``daily_view`` days (oldest first)
+
+    Days without logged meals are kept in the series (as zeros) but left out
+    of averages, adherence rates and macro ratios so they do not drag them
+    toward zero.
+
+    Returns:
+        ``{'days': [...], 'summary': {...}}``
+    """
+    goals = {**DEFAULT_NUTRITION_GOALS, **(goals or {})}
+    window = window or rolling_window(len(days))
+
+    totals = np.array(
+        [[day['totals'][key] for key in NUTRIENTS] for day in days], dtype=float
+    ).reshape(-1, len(NUTRIENTS))
+    water = np.array([float(day.get('water_intake') or 0) for day in days])
+    logged = np.array([day.get('meal_count', 0) > 0 for day in days], dtype=bool)
+    columns = {key: totals[:, index] for index, key in enumerate(NUTRIENTS)}
+    columns['water'] = water
+
+    # Share of energy from each macro, per day
+    energy = {key: columns[key] * factor for key, factor in _MACRO_ENERGY.items()}
+    macro_energy = sum(energy.values())
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratios = {key: np.where(macro_energy > 0, value / macro_energy, np.nan) for key, value in energy.items()}
+
+    # Goal adherence per day
+    on_goal = {}
+    for key in _BAND_GOALS + _MINIMUM_GOALS:
+        goal = float(goals.get(key) or 0)
+        if goal <= 0:
+            continue
+        if key in _BAND_GOALS:
+            on_goal[key] = np.abs(columns[key] - goal) <= ADHERENCE_TOLERANCE * goal
+        else:
+            on_goal[key] = columns[key] >= goal
+    calorie_goal = float(goals.get('calories') or 0)
+    calorie_pct = columns['calories'] / calorie_goal * 100 if calorie_goal > 0 else np.full(len(days), np.nan)
+
+    rolling = {
+        key: _clean(_rolling_mean(columns[key], logged, window))
+        for key in ('calories', 'protein', 'carbs', 'fat')
+    }
+    calorie_pct = _clean(calorie_pct)
+    ratios = {key: _clean(values, digits=3) for key, values in ratios.items()}
+    days_logged = int(logged.sum())
+
+    series = []
+    for index, day in enumerate(days):
+        series.append({
+            'date': day['date'],
+            'day': datetime.strptime(day['date'], '%Y-%m-%d').strftime('%a'),
+            **{key: round(float(columns[key][index]), 1) for key in NUTRIENTS},
+            'water': round(float(water[index]), 1),
+            'meal_count': day.get('meal_count', 0),
+            'rolling': {key: values[index] for key, values in rolling.items()},
+            'calorie_goal_pct': calorie_pct[index],
+            'macro_ratio': {key: values[index] for key, values in ratios.items()},
+        })
+
+    if days_logged:
+        averages = {key: round(float(columns[key][logged].mean()), 1) for key in NUTRIENTS + ('water',)}
+        adherence = {key: round(float(hits[logged].mean()), 3) for key, hits in on_goal.items()}
+        total_energy = float(macro_energy[logged].sum())
+        macro_ratio = {
+            key: round(float(value[logged].sum()) / total_energy, 3) if total_energy > 0 else None
+            for key, value in energy.items()
+        }
+    else:
+        averages, adherence, macro_ratio = {}, {}, {}
+
+    return {
+        'days': series,
+        'summary': {
+            'days': len(days),
+            'days_logged': days_logged,
+            'rolling_window': window,
+            'averages': averages,
+            'adherence': adherence,
+            'macro_ratio': macro_ratio,
+            'goals': goals,
+        }
+    }
@@ -0,0 +1,133 @@
+"""
+AI Recipe Response Cache
+Serve previously generated recipes for near-identical generation requests
+"""
+import copy
+import hashlib
+import json
+import logging
+import math
+import random
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+from utils.disk_cache import DiskCache
+
+logger = logging.getLogger(__name__)
+
+# Cooking-time limits are bucketed so "40 min" and "45 min" share entries
+TIME_BUCKET_MINUTES = 15
+
+
+def _normalize_terms(values: Optional[Iterable[Any]]) -> list:
+    if not values:
+        return []
+    if isinstance(values, str):
+        values = [values]
+    return sorted({' '.join(str(value).lower().split()) for value in values if str(value).strip()})
+
+
+def _normalize_text(value: Optional[Any]) -> str:
+    return ' '.join(str(value or '').lower().split())
+
+
+def requirements_fingerprint(user_query: str, requirements: Dict[str, Any]) -> str:
+    """
+    Build a stable cache key for a recipe generation request
+
+    Ingredients, preferences and cuisines are lowercased, de-duplicated and
+    sorted; the maximum cooking time is rounded up to a 15-minute bucket.
+
+    Args:
+        user_query: Free-text request (whitespace/case-insensitive)
+        requirements: Requirements dict as built by the generation route
+
+    Returns:
+        Hex digest identifying the normalised request
+    """
+    max_time = requirements.get('max_cooking_time')
+    try:
+        time_bucket = math.ceil(float(max_time) / TIME_BUCKET_MINUTES) * TIME_BUCKET_MINUTES
+    except (TypeError, ValueError):
+        time_bucket = None
+
+    try:
+        servings = int(requirements.get('servings'))
+    except (TypeError, ValueError):
+        servings = None
+
+    normalized = {
+        'query': _normalize_text(user_query),
+        'ingredients': _normalize_terms(requirements.get('ingredients')),
+        'dietary_preferences': _normalize_terms(requirements.get('dietary_preferences')),
+        'preferred_cuisines': _normalize_terms(requirements.get('preferred_cuisines')),
+        'difficulty': _normalize_text(requirements.get('difficulty')),
+        'cooking_skill': _normalize_text(requirements.get('cooking_skill')),
+        'servings': servings,
+        'time_bucket': time_bucket,
+    }
+    encoded = json.dumps(normalized, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class RecipeCache:
+    """Pool of up to ``variants`` generated recipes per request fingerprint.
+
+    The variant count is the freshness-vs-variety knob: lookups miss until
+    the pool for a fingerprint holds ``variants`` recipes (so new requests
+    keep adding variety), after which a random pooled recipe is served.
+    ``variants=1`` maximises reuse.
+    """
+
+    def __init__(self, store: DiskCache, variants: int = 3, rng: Optional[random.Random] = None):
+        self.store = store
+        self.variants = max(1, variants)
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+
+    def get(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Return a cached recipe, or None when the pool is not full yet."""
+        pool = self.store.get(fingerprint)
+        if not pool or len(pool) < self.variants:
+            return None
+        return copy.deepcopy(self._rng.choice(pool))
+
+    def put(self, fingerprint: str, recipe: Dict[str, Any]) -> None:
+        """Add a freshly generated recipe to the fingerprint's pool."""
+        with self._lock:
+            pool = self.store.get(fingerprint) or []
+            pool.append(recipe)
+            self.store.set(fingerprint, pool[-self.variants:])
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.store.stats()
+        stats['variants'] = self.variants
+        return stats
+
+
+_recipe_cache: Optional[RecipeCache] = None
+_recipe_cache_lock = threading.Lock()
+
+
+def get_recipe_cache() -> Optional[RecipeCache]:
+    """Return the process-wide recipe cache (None when disabled or unavailable)."""
+    global _recipe_cache
+
+    from config import config
+
+    if not config.RECIPE_CACHE_ENABLED:
+        return None
+
+    with _recipe_cache_lock:
+        if _recipe_cache is None:
+            try:
+                store = DiskCache(
+                    config.RECIPE_CACHE_PATH,
+                    ttl=config.RECIPE_CACHE_TTL,
+                    max_entries=config.RECIPE_CACHE_MAX_ENTRIES
+                )
+            except Exception as e:
+                logger.error(f"Recipe cache unavailable: {e}")
+                return None
+            _recipe_cache = RecipeCache(store, variants=config.RECIPE_CACHE_VARIANTS)
+        return _recipe_cache
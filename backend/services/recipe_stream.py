@@ -0,0 +1,139 @@
+"""
+Incremental Recipe Parser
+Turn a streamed recipe JSON object into per-field events as soon as each field is complete
+"""
+import json
+from typing import Any, Dict, List
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\r\n'
+
+# Array fields whose elements are emitted one by one (field -> event name)
+STREAMED_ARRAYS = {
+    'ingredients': 'ingredient',
+    'instructions': 'instruction',
+}
+
+
+class IncrementalRecipeParser:
+    """Incremental parser for the top-level recipe JSON object.
+
+    Feed raw text chunks from a streaming model response. Every completed
+    top-level field produces a ``field`` event; elements of ``ingredients``
+    and ``instructions`` produce ``ingredient``/``instruction`` events as
+    each one closes, so clients can render a recipe while it is generated.
+    Leading prose or a markdown fence before the opening brace is ignored.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.pos = 0
+        self.state = 'start'
+        self.current_key = None
+        self.recipe: Dict[str, Any] = {}
+
+    @property
+    def done(self) -> bool:
+        return self.state == 'done'
+
+    def result(self) -> Dict[str, Any]:
+        """Fields parsed so far (the full recipe once ``done``)."""
+        return self.recipe
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Consume a text chunk and return the events it completed."""
+        self.buffer += chunk
+        events = []
+        while self._step(events):
+            pass
+        return events
+
+    def _skip(self, chars: str) -> bool:
+        """Advance past ``chars``; return False when the buffer is exhausted."""
+        while self.pos < len(self.buffer) and self.buffer[self.pos] in chars:
+            self.pos += 1
+        return self.pos < len(self.buffer)
+
+    def _decode_value(self):
+        """Decode the JSON value at ``pos``; None when it is not complete yet."""
+        try:
+            value, end = _decoder.raw_decode(self.buffer, self.pos)
+        except json.JSONDecodeError:
+            return None
+
+        # Strings, objects and arrays end with a closing delimiter, but a number
+        # or literal at the end of the buffer may still be growing ("15" -> "150")
+        if self.buffer[self.pos] not in '"{[':
+            rest = self.buffer[end:]
+            if not rest.strip(_WHITESPACE):
+                return None
+
+        self.pos = end
+        return (value,)
+
+    def _step(self, events: List[Dict[str, Any]]) -> bool:
+        if self.state == 'start':
+            brace = self.buffer.find('{', self.pos)
+            if brace == -1:
+                self.pos = len(self.buffer)
+                return False
+            self.pos = brace + 1
+            self.state = 'key'
+            return True
+
+        if self.state == 'key':
+            if not self._skip(_WHITESPACE + ','):
+                return False
+            if self.buffer[self.pos] == '}':
+                self.pos += 1
+                self.state = 'done'
+                return False
+            key_start = self.pos
+            decoded = self._decode_value()
+            if decoded is None:
+                return False
+            colon = self.buffer.find(':', self.pos)
+            if colon == -1:
+                # Rewind so the key is decoded again once the colon arrives
+                self.pos = key_start
+                return False
+            self.current_key = str(decoded[0])
+            self.pos = colon + 1
+            self.state = 'value'
+            return True
+
+        if self.state == 'value':
+            if not self._skip(_WHITESPACE):
+                return False
+            if self.current_key in STREAMED_ARRAYS and self.buffer[self.pos] == '[':
+                self.pos += 1
+                self.recipe[self.current_key] = []
+                self.state = 'array'
+                return True
+            decoded = self._decode_value()
+            if decoded is None:
+                return False
+            self.recipe[self.current_key] = decoded[0]
+            events.append({'event': 'field', 'data': {'name': self.current_key, 'value': decoded[0]}})
+            self.state = 'key'
+            return True
+
+        if self.state == 'array':
+            if not self._skip(_WHITESPACE + ','):
+                return False
+            if self.buffer[self.pos] == ']':
+                self.pos += 1
+                self.state = 'key'
+                return True
+            decoded = self._decode_value()
+            if decoded is None:
+                return False
+            items = self.recipe[self.current_key]
+            items.append(decoded[0])
+            events.append({
+                'event': STREAMED_ARRAYS[self.current_key],
+                'data': {'index': len(items) - 1, 'value': decoded[0]}
+            })
+            return True
+
+        return False
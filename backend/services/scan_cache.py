@@ -0,0 +1,131 @@
+"""
+Vision Scan Result Cache
+Serve repeated uploads of the same image without another vision model call
+"""
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from utils.cache import TTLCache
+from utils.disk_cache import DiskCache
+
+logger = logging.getLogger(__name__)
+
+
+def analysis_key(kind: str, model: str, content_hash: str) -> str:
+    """Cache key for a model's analysis of an image (shared across users)."""
+    return f"analysis:{kind}:{model}:{content_hash}"
+
+
+def applied_key(kind: str, user_id: str, content_hash: str) -> str:
+    """Cache key recording that a user's scan has already been applied (e.g. added to the fridge)."""
+    return f"applied:{kind}:{user_id}:{content_hash}"
+
+
+class ScanCache:
+    """Two-tier cache keyed by image content hash.
+
+    A small in-process TTLCache sits in front of a size-capped DiskCache,
+    so repeats are answered from memory and survive restarts. Values are
+    stored as JSON, and every read returns a fresh copy.
+
+    ``locked(key)`` serialises work on one key inside the process, so a
+    double-tapped upload waits for the first scan and then hits its result
+    instead of calling the model (and writing to Firestore) twice.
+    """
+
+    def __init__(self, store: DiskCache, memory_size: int = 256):
+        self.store = store
+        self._memory = TTLCache(maxsize=memory_size, ttl=store.ttl)
+        self._locks: Dict[str, list] = {}
+        self._locks_lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        payload = self._memory.get(key)
+        if payload is None:
+            value = self.store.get(key)
+            if value is None:
+                return None
+            payload = json.dumps(value, default=str)
+            self._memory.set(key, payload)
+        return json.loads(payload)
+
+    def set(self, key: str, value: Any) -> None:
+        payload = json.dumps(value, default=str)
+        self._memory.set(key, payload)
+        self.store.set(key, json.loads(payload))
+
+    @contextmanager
+    def locked(self, key: str) -> Iterator[None]:
+        with self._locks_lock:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._locks_lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[key]
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.store.stats()
+        stats['memory'] = self._memory.stats()
+        return stats
+
+
+def cached_analysis(
+    scan_cache: Optional[ScanCache],
+    key: str,
+    analyze: Callable[[], Dict[str, Any]],
+    cacheable: Callable[[Dict[str, Any]], bool]
+) -> Tuple[Dict[str, Any], bool]:
+    """
+    Return the cached analysis for ``key`` or run ``analyze`` and store it
+
+    Only results accepted by ``cacheable`` are stored, so transient failures
+    (e.g. an unparseable model reply) are retried on the next upload.
+
+    Returns:
+        ``(analysis, cache_hit)``
+    """
+    if scan_cache is not None:
+        cached = scan_cache.get(key)
+        if cached is not None:
+            return cached, True
+
+    result = analyze()
+    if scan_cache is not None and cacheable(result):
+        scan_cache.set(key, result)
+    return result, False
+
+
+_scan_cache: Optional[ScanCache] = None
+_scan_cache_lock = threading.Lock()
+
+
+def get_scan_cache() -> Optional[ScanCache]:
+    """Return the process-wide scan cache (None when disabled or unavailable)."""
+    global _scan_cache
+
+    from config import config
+
+    if not config.SCAN_CACHE_ENABLED:
+        return None
+
+    with _scan_cache_lock:
+        if _scan_cache is None:
+            try:
+                store = DiskCache(
+                    config.SCAN_CACHE_PATH,
+                    ttl=config.SCAN_CACHE_TTL,
+                    max_bytes=config.SCAN_CACHE_MAX_BYTES
+                )
+            except Exception as e:
+                logger.error(f"Scan cache unavailable: {e}")
+                return None
+            _scan_cache = ScanCache(store, memory_size=config.SCAN_CACHE_MEMORY_SIZE)
+        return _scan_cache
@@ -0,0 +1,105 @@
+"""
+Unit Conversion
+Parse ingredient quantities and convert between compatible kitchen units
+"""
+import re
+from typing import Any, Optional, Tuple
+
+from services.ingredient_matcher import singularize
+
+MASS = 'mass'
+VOLUME = 'volume'
+COUNT = 'count'
+
+# Factor to the base unit of each dimension (grams, millilitres, pieces)
+_UNITS = {
+    MASS: {
+        'mg': 0.001, 'milligram': 0.001,
+        'g': 1.0, 'gr': 1.0, 'gram': 1.0, 'gramme': 1.0,
+        'kg': 1000.0, 'kilo': 1000.0, 'kilogram': 1000.0,
+        'oz': 28.3495, 'ounce': 28.3495,
+        'lb': 453.592, 'pound': 453.592,
+    },
+    VOLUME: {
+        'ml': 1.0, 'milliliter': 1.0, 'millilitre': 1.0,
+        'cl': 10.0, 'dl': 100.0,
+        'l': 1000.0, 'liter': 1000.0, 'litre': 1000.0,
+        'tsp': 4.92892, 'teaspoon': 4.92892,
+        'tbsp': 14.7868, 'tablespoon': 14.7868,
+        'floz': 29.5735, 'fluid ounce': 29.5735,
+        'cup': 240.0,
+        'pint': 473.176, 'pt': 473.176,
+        'quart': 946.353, 'qt': 946.353,
+        'gallon': 3785.41, 'gal': 3785.41,
+    },
+    COUNT: {
+        'piece': 1.0, 'pc': 1.0, 'pcs': 1.0, 'unit': 1.0, 'item': 1.0,
+        'each': 1.0, 'ea': 1.0, 'whole': 1.0, 'x': 1.0,
+        'dozen': 12.0,
+    },
+}
+
+_LOOKUP = {name: (dimension, factor) for dimension, units in _UNITS.items() for name, factor in units.items()}
+
+_FRACTION = re.compile(r'^\s*(?:(\d+)\s+)?(\d+)\s*/\s*(\d+)\s*$')
+_NUMBER = re.compile(r'\d+(?:[.,]\d+)?')
+
+
+def normalize_unit(unit: Optional[str]) -> str:
+    """Lowercase and de-pluralise a unit name ("Cups" -> "cup", "L" -> "l")."""
+    name = ' '.join(str(unit or '').lower().replace('.', ' ').split())
+    if name in _LOOKUP:
+        return name
+    if name == 'fl oz':
+        return 'floz'
+    for suffix in ('es', 's'):
+        if name.endswith(suffix) and name[:-len(suffix)] in _LOOKUP:
+            return name[:-len(suffix)]
+    # Unknown units ("cloves", "cans") still compare equal to their singular
+    return ' '.join(singularize(word) for word in name.split())
+
+
+def unit_dimension(unit: Optional[str]) -> Optional[Tuple[str, float]]:
+    """Return ``(dimension, factor_to_base)`` for a known unit, else None."""
+    return _LOOKUP.get(normalize_unit(unit))
+
+
+def parse_quantity(value: Any) -> Optional[float]:
+    """Parse 2, "2.5", "1,5", "1/2" or "1 1/2" into a float (None if absent/invalid)."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    text = str(value).strip()
+    fraction = _FRACTION.match(text)
+    if fraction:
+        whole, numerator, denominator = fraction.groups()
+        if int(denominator) == 0:
+            return None
+        return int(whole or 0) + int(numerator) / int(denominator)
+
+    number = _NUMBER.search(text)
+    if number:
+        return float(number.group().replace(',', '.'))
+    return None
+
+
+def convert(quantity: float, from_unit: Optional[str], to_unit: Optional[str]) -> Optional[float]:
+    """
+    Convert ``quantity`` between units
+
+    Returns:
+        The converted quantity, or None when the units are not comparable
+        (e.g. grams to pieces, or two unknown units with different names)
+    """
+    source = normalize_unit(from_unit)
+    target = normalize_unit(to_unit)
+    if source == target:
+        return quantity
+
+    source_dim = _LOOKUP.get(source)
+    target_dim = _LOOKUP.get(target)
+    if not source_dim or not target_dim or source_dim[0] != target_dim[0]:
+        return None
+    return quantity * source_dim[1] / target_dim[1]
@@ -0,0 +1,274 @@
+"""
+Vision Model Client
+Shared, pooled Ollama client for the receipt and food scanners
+"""
+import bisect
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+import ollama
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (250, 500, 1000, 2000, 5000, 10000, 20000, 30000, 60000, 120000)
+
+# Circuit breaker states
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class VisionServiceError(Exception):
+    """Raised when the vision model cannot be reached or does not answer in time"""
+    pass
+
+
+class VisionCircuitOpen(VisionServiceError):
+    """Raised without calling the model while the circuit breaker is open"""
+    pass
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Connection problems and server-side errors are retried; read timeouts and 4xx are not."""
+    if isinstance(error, ollama.ResponseError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, (ConnectionError, httpx.ConnectTimeout, httpx.PoolTimeout, httpx.RemoteProtocolError))
+
+
+def _is_outage(error: Exception) -> bool:
+    """Timeouts, connection failures and 5xx count toward the breaker; 4xx (the caller's fault) do not."""
+    if isinstance(error, ollama.ResponseError):
+        return error.status_code >= 500
+    return isinstance(error, (ConnectionError, httpx.TransportError))
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with count/sum, safe to share between threads."""
+
+    def __init__(self, buckets_ms=LATENCY_BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self._counts = [0] * (len(self.buckets_ms) + 1)
+        self._sum_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, elapsed_ms: float) -> None:
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets_ms, elapsed_ms)] += 1
+            self._sum_ms += elapsed_ms
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Upper bound of the bucket holding the given fraction of observations (None past the last bound)."""
+        with self._lock:
+            total = sum(self._counts)
+            if not total:
+                return None
+            rank = fraction * total
+            seen = 0
+            for bound, count in zip(self.buckets_ms, self._counts):
+                seen += count
+                if seen >= rank:
+                    return float(bound)
+            return None
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = list(self._counts)
+            total = sum(counts)
+            sum_ms = self._sum_ms
+        labels = [f"le_{bound}" for bound in self.buckets_ms] + ['le_inf']
+        return {
+            'count': total,
+            'avg_ms': round(sum_ms / total, 1) if total else 0.0,
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'buckets': dict(zip(labels, counts)),
+        }
+
+
+class VisionClient:
+    """Ollama chat client with connection reuse, timeouts, retries and a circuit breaker.
+
+    One ``ollama.Client`` (and so one keep-alive httpx connection pool) is
+    shared by every scan in the process. Connect failures and 5xx/429
+    responses are retried with full-jitter exponential backoff; read
+    timeouts are not, because a model that is still busy would only be
+    handed the same work again. After ``failure_threshold`` consecutive
+    calls fail with a timeout, connection error or 5xx (a rejected request
+    such as an unknown model does not count) the breaker opens and calls
+    fail fast for
+    ``reset_timeout`` seconds, then a single trial call decides whether it
+    closes again.
+    """
+
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        model: Optional[str] = None,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        backoff_base: Optional[float] = None,
+        backoff_max: Optional[float] = None,
+        failure_threshold: Optional[int] = None,
+        reset_timeout: Optional[float] = None,
+        pool_size: Optional[int] = None,
+        sleep: Callable[[float], None] = time.sleep,
+        timer: Callable[[], float] = time.monotonic,
+        rng: Optional[random.Random] = None
+    ):
+        self.host = host or config.OLLAMA_HOST
+        self.model = model or config.OLLAMA_VISION_MODEL
+        self.max_retries = config.OLLAMA_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = config.OLLAMA_BACKOFF_BASE if backoff_base is None else backoff_base
+        self.backoff_max = config.OLLAMA_BACKOFF_MAX if backoff_max is None else backoff_max
+        self.failure_threshold = failure_threshold or config.OLLAMA_BREAKER_THRESHOLD
+        self.reset_timeout = config.OLLAMA_BREAKER_RESET if reset_timeout is None else reset_timeout
+        pool_size = pool_size or config.OLLAMA_POOL_SIZE
+
+        # The connection pool is ours to close; ollama.Client wraps it in its own httpx.Client
+        self._transport = httpx.HTTPTransport(
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        )
+        self._client = ollama.Client(
+            host=self.host,
+            timeout=httpx.Timeout(
+                config.OLLAMA_READ_TIMEOUT if read_timeout is None else read_timeout,
+                connect=config.OLLAMA_CONNECT_TIMEOUT if connect_timeout is None else connect_timeout
+            ),
+            transport=self._transport
+        )
+        self._sleep = sleep
+        self._timer = timer
+        self._rng = rng or random.Random()
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.latency = LatencyHistogram()
+        self._counters = {'calls': 0, 'successes': 0, 'failures': 0, 'retries': 0, 'rejected': 0}
+
+    def chat(self, prompt: str, images: Optional[List[str]] = None, model: Optional[str] = None) -> str:
+        """
+        Send one user message (with optional base64 images) and return the reply text
+
+        Raises:
+            VisionCircuitOpen: If the breaker is open (the model is not called)
+            VisionServiceError: If the model is unreachable, times out or keeps failing
+        """
+        self._before_call()
+        message = {'role': 'user', 'content': prompt}
+        if images:
+            message['images'] = images
+
+        attempt = 0
+        while True:
+            start = self._timer()
+            try:
+                response = self._client.chat(model=model or self.model, messages=[message])
+            except Exception as e:
+                self.latency.observe((self._timer() - start) * 1000)
+                if attempt < self.max_retries and _is_retryable(e):
+                    delay = self._backoff(attempt)
+                    attempt += 1
+                    with self._lock:
+                        self._counters['retries'] += 1
+                    logger.warning(f"Vision model call failed ({e}), retry {attempt}/{self.max_retries} in {delay:.2f}s")
+                    self._sleep(delay)
+                    continue
+                self._record(success=False, outage=_is_outage(e))
+                logger.error(f"Vision model call failed after {attempt + 1} attempt(s): {e}")
+                if isinstance(e, httpx.TimeoutException):
+                    raise VisionServiceError('The AI model took too long to respond. Please try again.') from e
+                if isinstance(e, ollama.ResponseError) and e.status_code < 500 and e.status_code != 429:
+                    raise VisionServiceError(f'The AI model rejected the request: {e.error}') from e
+                raise VisionServiceError('AI service is not available. Please ensure Ollama is running.') from e
+
+            self.latency.observe((self._timer() - start) * 1000)
+            self._record(success=True)
+            return response.message.content or ''
+
+    def _backoff(self, attempt: int) -> float:
+        """Full jitter: uniform in [0, min(backoff_max, base * 2^attempt)]."""
+        return self._rng.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _before_call(self) -> None:
+        with self._lock:
+            self._counters['calls'] += 1
+            if self._state == OPEN and self._timer() - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+            if self._state == CLOSED:
+                return
+            if self._state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            self._counters['rejected'] += 1
+        raise VisionCircuitOpen('AI service is temporarily unavailable. Please try again shortly.')
+
+    def _record(self, success: bool, outage: bool = True) -> None:
+        with self._lock:
+            self._trial_in_flight = False
+            if success:
+                self._counters['successes'] += 1
+                self._consecutive_failures = 0
+                if self._state != CLOSED:
+                    logger.info("🔌 Vision model circuit closed")
+                self._state = CLOSED
+                return
+
+            self._counters['failures'] += 1
+            if not outage:
+                # The model answered, so its health is unchanged; a half-open breaker tries again next call
+                return
+            self._consecutive_failures += 1
+            if self._state == HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    logger.warning(f"🔌 Vision model circuit opened after {self._consecutive_failures} failure(s)")
+                self._state = OPEN
+                self._opened_at = self._timer()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats.update({
+                'host': self.host,
+                'model': self.model,
+                'circuit': self._state,
+                'consecutive_failures': self._consecutive_failures,
+            })
+        stats['latency'] = self.latency.snapshot()
+        return stats
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+_vision_client: Optional[VisionClient] = None
+_vision_client_lock = threading.Lock()
+
+
+def get_vision_client() -> VisionClient:
+    """Return the process-wide vision client."""
+    global _vision_client
+    with _vision_client_lock:
+        if _vision_client is None:
+            _vision_client = VisionClient()
+        return _vision_client
+
+
+def vision_client_stats() -> Optional[Dict[str, Any]]:
+    """Stats for the health check (None until the first scan creates the client)."""
+    return _vision_client.stats() if _vision_client is not None else None
@@ -0,0 +1,101 @@
+"""
+Tests for TTLCache
+Test expiry, LRU eviction and hit/miss accounting
+"""
+from utils.cache import TTLCache
+
+
+class FakeClock:
+    """Manually advanced monotonic clock"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache:
+    """Test TTLCache behaviour"""
+
+    def test_get_returns_stored_value(self):
+        """Test a stored value is returned and counted as a hit"""
+        cache = TTLCache(maxsize=4, ttl=10)
+        cache.set('user_1', {'id': 'user_1'})
+
+        assert cache.get('user_1') == {'id': 'user_1'}
+        assert cache.stats()['hits'] == 1
+        assert cache.stats()['misses'] == 0
+
+    def test_entries_expire_after_ttl(self):
+        """Test entries disappear once their TTL elapses"""
+        clock = FakeClock()
+        cache = TTLCache(maxsize=4, ttl=10, timer=clock)
+        cache.set('user_1', 'value')
+
+        clock.now = 9.9
+        assert cache.get('user_1') == 'value'
+
+        clock.now = 10.0
+        assert cache.get('user_1') is None
+        assert 'user_1' not in cache
+        assert cache.stats()['misses'] == 1
+
+    def test_per_entry_ttl_override(self):
+        """Test a shorter per-entry TTL wins over the default"""
+        clock = FakeClock()
+        cache = TTLCache(maxsize=4, ttl=300, timer=clock)
+        cache.set('token', 'claims', ttl=5)
+
+        clock.now = 6
+        assert cache.get('token') is None
+
+    def test_non_positive_ttl_is_not_stored(self):
+        """Test already-expired entries are never cached"""
+        cache = TTLCache(maxsize=4, ttl=300)
+        cache.set('token', 'claims', ttl=-1)
+
+        assert len(cache) == 0
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """Test LRU eviction when the cache is full"""
+        cache = TTLCache(maxsize=2, ttl=10)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        assert 'a' in cache
+        assert 'b' not in cache
+        assert 'c' in cache
+        assert cache.stats()['evictions'] == 1
+
+    def test_pop_invalidates_entry(self):
+        """Test explicit invalidation"""
+        cache = TTLCache(maxsize=2, ttl=10)
+        cache.set('user_1', 'value')
+
+        assert cache.pop('user_1') == 'value'
+        assert cache.get('user_1') is None
+        assert cache.pop('missing') is None
+
+    def test_discard_where(self):
+        """Test predicate-based invalidation"""
+        cache = TTLCache(maxsize=4, ttl=10)
+        cache.set(('user_1', 'a'), 1)
+        cache.set(('user_1', 'b'), 2)
+        cache.set(('user_2', 'a'), 3)
+
+        removed = cache.discard_where(lambda key, _: key[0] == 'user_1')
+
+        assert removed == 2
+        assert len(cache) == 1
+
+    def test_hit_rate(self):
+        """Test hit rate calculation"""
+        cache = TTLCache(maxsize=2, ttl=10)
+        cache.set('a', 1)
+        cache.get('a')
+        cache.get('b')
+
+        assert cache.stats()['hit_rate'] == 0.5
@@ -0,0 +1,112 @@
+"""
+Tests for Dashboard Statistics
+Test counter deltas from write hooks, reconciliation and the dashboard view
+"""
+from datetime import date, datetime, timedelta, timezone
+
+from services.dashboard_stats import (
+    STATS_VERSION, combine_changes, compute_stats, dashboard_view, expiry_day, fridge_item_change,
+    get_dashboard_stats, meal_plan_change, recipe_change, stats_writes
+)
+
+TODAY = date(2026, 3, 11)  # a Wednesday
+
+
+class TestChanges:
+    """Test the per-write deltas"""
+
+    def test_expiry_day_formats(self):
+        """Test date strings, ISO timestamps and datetimes map to one day key"""
+        assert expiry_day('2026-03-12') == '2026-03-12'
+        assert expiry_day('2026-03-12T08:00:00Z') == '2026-03-12'
+        assert expiry_day(datetime(2026, 3, 12, 23, 0)) == '2026-03-12'
+        assert expiry_day('soon') is None
+        assert expiry_day(None) is None
+
+    def test_fridge_update_moves_expiry_day(self):
+        """Test editing expirationDate keeps the item count and moves its day"""
+        before = {'ingredientName': 'Milk', 'expirationDate': '2026-03-12'}
+        after = {**before, 'expirationDate': '2026-03-20'}
+
+        change = combine_changes(fridge_item_change(before, -1), fridge_item_change(after))
+
+        assert change == {'fridgeExpiry': {'2026-03-12': -1, '2026-03-20': 1}}
+
+    def test_unchanged_write_produces_no_stats_write(self):
+        """Test changes that cancel out skip the stats document entirely"""
+        item = {'ingredientName': 'Milk', 'expirationDate': '2026-03-12'}
+
+        assert stats_writes(None, 'user-1', fridge_item_change(item, -1), fridge_item_change(item)) == []
+
+    def test_stats_writes_use_increments(self):
+        """Test counters and per-day maps become Increment transforms"""
+        class Db:
+            def collection(self, name):
+                return self
+
+            def document(self, name):
+                return self
+
+        ops = stats_writes(Db(), 'user-1', recipe_change({'isFavorite': True}), meal_plan_change({'planDate': '2026-03-12'}))
+
+        (op, _, payload), = ops
+        assert op == 'merge'
+        assert payload['totalRecipes'].value == 1 and payload['savedRecipes'].value == 1
+        assert payload['mealPlanDays']['2026-03-12'].value == 1
+
+
+class TestView:
+    """Test compute_stats and dashboard_view"""
+
+    def test_compute_stats_prunes_past_days(self):
+        """Test counters are taken as given and days before the week are dropped"""
+        data = compute_stats(
+            counts={'fridgeItems': 3, 'totalRecipes': 2, 'savedRecipes': 1},
+            fridge_items=[{'expirationDate': '2026-03-01'}, {'expirationDate': '2026-03-12'}, {}],
+            plans=[{'planDate': '2026-03-09'}, {'planDate': '2026-03-09'}],
+            since='2026-03-09'
+        )
+
+        assert (data['fridgeItems'], data['totalRecipes'], data['savedRecipes']) == (3, 2, 1)
+        assert data['fridgeExpiry'] == {'2026-03-12': 1}
+        assert data['mealPlanDays'] == {'2026-03-09': 2}
+        assert data['version'] == STATS_VERSION
+
+    def test_view_windows(self):
+        """Test expiring counts today..+3 days and meals count Monday..Sunday"""
+        data = {
+            'fridgeItems': 5,
+            'fridgeExpiry': {'2026-03-10': 1, '2026-03-11': 1, '2026-03-14': 2, '2026-03-15': 1},
+            'mealPlanDays': {'2026-03-08': 1, '2026-03-09': 2, '2026-03-15': 1, '2026-03-16': 4},
+        }
+
+        view = dashboard_view(data, TODAY)
+
+        assert view == {
+            'totalRecipes': 0, 'savedRecipes': 0, 'fridgeItems': 5, 'expiringItems': 3, 'mealsPlanned': 3
+        }
+
+    def test_fresh_document_is_one_read(self):
+        """Test a current stats document is served without reconciling"""
+        class Snapshot:
+            exists = True
+
+            def to_dict(self):
+                return {'version': STATS_VERSION, 'reconciledAt': datetime.now(timezone.utc) - timedelta(hours=1),
+                        'fridgeItems': 2}
+
+        class Db:
+            reads = 0
+
+            def collection(self, name):
+                return self
+
+            def document(self, name):
+                return self
+
+            def get(self):
+                Db.reads += 1
+                return Snapshot()
+
+        assert get_dashboard_stats(Db(), 'user-1', max_age=86400, today=TODAY)['fridgeItems'] == 2
+        assert Db.reads == 1
@@ -0,0 +1,66 @@
+"""
+Tests for Batched Firestore Writes
+Test chunking of write operations into WriteBatches
+"""
+import pytest
+
+from utils.firestore_batch import commit_batched
+
+
+class FakeBatch:
+    def __init__(self, log):
+        self.log = log
+        self.ops = []
+
+    def set(self, ref, data, merge=False):
+        self.ops.append(('merge' if merge else 'set', ref))
+
+    def update(self, ref, data):
+        self.ops.append(('update', ref))
+
+    def delete(self, ref):
+        self.ops.append(('delete', ref))
+
+    def commit(self):
+        self.log.append(self.ops)
+
+
+class FakeDb:
+    def __init__(self):
+        self.commits = []
+
+    def batch(self):
+        return FakeBatch(self.commits)
+
+
+class TestCommitBatched:
+    """Test commit_batched"""
+
+    def test_chunks_at_500_writes(self):
+        """Test the Firestore batch limit is respected"""
+        db = FakeDb()
+
+        commits = commit_batched(db, (('set', f'doc-{i}', {}) for i in range(1201)))
+
+        assert commits == 3
+        assert [len(ops) for ops in db.commits] == [500, 500, 201]
+
+    def test_no_operations_means_no_commit(self):
+        """Test empty input is a no-op"""
+        db = FakeDb()
+
+        assert commit_batched(db, []) == 0
+        assert db.commits == []
+
+    def test_dispatches_operation_types(self):
+        """Test each op maps to the matching batch call"""
+        db = FakeDb()
+
+        commit_batched(db, [('set', 'a', {}), ('merge', 'b', {}), ('update', 'c', {}), ('delete', 'd', None)])
+
+        assert db.commits == [[('set', 'a'), ('merge', 'b'), ('update', 'c'), ('delete', 'd')]]
+
+    def test_unknown_operation(self):
+        """Test invalid ops are rejected"""
+        with pytest.raises(ValueError):
+            commit_batched(FakeDb(), [('upsert', 'a', {})])
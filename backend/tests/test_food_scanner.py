@@ -0,0 +1,84 @@
+"""
+Tests for the Food Scanner Route
+Test that auto-logging an image the user already scanned does not log it twice
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from routes import food_scanner
+from services.scan_cache import ScanCache
+from utils.disk_cache import DiskCache
+
+ANALYSIS = {
+    'is_food': True,
+    'meal_name': 'Oatmeal',
+    'food_items': ['oats', 'banana'],
+    'nutrition': {'calories': 350},
+    'meal_type_suggestion': 'breakfast'
+}
+
+
+class FakeDb:
+    """Point reads over the NutritionLog entries logged through the fake add_meal_log"""
+
+    def __init__(self):
+        self.meals = {}
+
+    def collection(self, name):
+        return SimpleNamespace(document=lambda doc_id: SimpleNamespace(
+            id=doc_id,
+            get=lambda field_paths=None: SimpleNamespace(exists=name == 'NutritionLog' and doc_id in self.meals)
+        ))
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = FakeDb()
+
+    def add_meal_log(db, user_id, meal_data):
+        meal_id = f"meal-{len(db.meals) + 1}"
+        db.meals[meal_id] = meal_data
+        return meal_id
+
+    cache = ScanCache(DiskCache(':memory:'))
+    monkeypatch.setattr(food_scanner, 'get_scan_cache', lambda: cache)
+    monkeypatch.setattr(food_scanner, 'get_vision_client', lambda: SimpleNamespace(model='vision-model'))
+    monkeypatch.setattr(food_scanner, 'analyze_food_with_ollama', lambda image: dict(ANALYSIS))
+    monkeypatch.setattr(food_scanner, 'add_meal_log', add_meal_log)
+    return db
+
+
+class TestProcessFoodScan:
+    """Test process_food_scan with auto_log"""
+
+    def _scan(self, db, user_id='user-1'):
+        return food_scanner.process_food_scan(db, user_id, 'b64', auto_log=True, content_hash='abc')
+
+    def test_repeat_upload_is_logged_once(self, db):
+        """Test the same image scanned twice logs one meal and returns its id both times"""
+        first = self._scan(db)
+        second = self._scan(db)
+
+        assert len(db.meals) == 1
+        assert (first['logged'], first['meal_id']) == (True, 'meal-1')
+        assert (second['logged'], second['meal_id'], second['duplicate']) == (True, 'meal-1', True)
+
+    def test_other_users_log_their_own_meal(self, db):
+        """Test the applied marker is per user"""
+        self._scan(db)
+        other = self._scan(db, 'user-2')
+
+        assert len(db.meals) == 2
+        assert other['meal_id'] == 'meal-2'
+
+    def test_rescan_after_deleting_the_meal_logs_it_again(self, db):
+        """Test a marker whose meal was deleted does not block logging the image again"""
+        self._scan(db)
+        db.meals.clear()
+
+        again = self._scan(db)
+
+        assert (again['logged'], again['meal_id']) == (True, 'meal-1')
+        assert 'duplicate' not in again
+        assert self._scan(db)['duplicate'] is True
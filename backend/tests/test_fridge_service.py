@@ -0,0 +1,395 @@
+"""
+Tests for the Fridge Inventory Service
+Test the per-user snapshot cache and its write invalidation
+"""
+from datetime import datetime
+
+import pytest
+
+from services import fridge_service
+from services.fridge_service import (
+    apply_receipt_items,
+    get_fridge_ingredient_names,
+    invalidate_fridge,
+    load_fridge_items,
+    plan_consumption,
+    reconcile_receipt_items,
+)
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class FakeFridgeDb:
+    """Minimal Firestore stand-in that counts FridgeItem queries"""
+
+    def __init__(self, items, on_stream=None):
+        self.items = items
+        self.streams = 0
+        self.on_stream = on_stream
+
+    def collection(self, name):
+        assert name == 'FridgeItem'
+        return self
+
+    def where(self, filter=None):
+        return self
+
+    def stream(self):
+        self.streams += 1
+        if self.on_stream:
+            self.on_stream()
+        return [FakeSnapshot(doc_id, data) for doc_id, data in self.items.items()]
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    fridge_service._fridge_cache.clear()
+    yield
+    fridge_service._fridge_cache.clear()
+
+
+class TestFridgeCache:
+    """Test load_fridge_items caching"""
+
+    def test_repeated_reads_hit_firestore_once(self):
+        """Test a session of reads streams the collection once"""
+        db = FakeFridgeDb({'a': {'ingredientName': 'Milk'}, 'b': {'ingredientName': ''}})
+
+        items = load_fridge_items(db, 'user-1')
+        names = get_fridge_ingredient_names(db, 'user-1')
+
+        assert {item['id'] for item in items} == {'a', 'b'}
+        assert names == ['Milk']
+        assert db.streams == 1
+
+    def test_returned_items_are_copies(self):
+        """Test callers cannot corrupt the cached snapshot"""
+        db = FakeFridgeDb({'a': {'ingredientName': 'Milk'}})
+
+        load_fridge_items(db, 'user-1')[0]['ingredientName'] = 'mutated'
+
+        assert load_fridge_items(db, 'user-1')[0]['ingredientName'] == 'Milk'
+
+    def test_invalidate_forces_reload(self):
+        """Test writes invalidate the user's snapshot only"""
+        db = FakeFridgeDb({'a': {'ingredientName': 'Milk'}})
+        load_fridge_items(db, 'user-1')
+        load_fridge_items(db, 'user-2')
+
+        invalidate_fridge('user-1')
+        load_fridge_items(db, 'user-1')
+        load_fridge_items(db, 'user-2')
+
+        assert db.streams == 3
+
+    def test_snapshot_read_during_write_is_not_cached(self):
+        """Test a read racing a write does not cache stale data"""
+        db = FakeFridgeDb({'a': {'ingredientName': 'Milk'}})
+        db.on_stream = lambda: invalidate_fridge('user-1')
+
+        load_fridge_items(db, 'user-1')
+        db.on_stream = None
+        load_fridge_items(db, 'user-1')
+
+        assert db.streams == 2
+
+    def test_write_tracking_is_released_after_reads(self):
+        """Test no per-user state outlives the reads, including failed ones"""
+        db = FakeFridgeDb({'a': {'ingredientName': 'Milk'}})
+        for user_id in ('user-1', 'user-2', 'user-3'):
+            load_fridge_items(db, user_id)
+            invalidate_fridge(user_id)
+
+        def fail():
+            raise RuntimeError('stream failed')
+
+        db.on_stream = fail
+        with pytest.raises(RuntimeError):
+            load_fridge_items(db, 'user-4')
+
+        assert fridge_service._inflight == {}
+
+
+class TestPlanConsumption:
+    """Test plan_consumption"""
+
+    def test_converts_to_item_unit(self):
+        """Test requested amounts are expressed in the stored unit"""
+        items = [{'id': 'flour', 'ingredientName': 'Flour', 'quantity': 1, 'unit': 'kg'}]
+
+        plan, not_found = plan_consumption(items, [{'name': 'flour', 'quantity': 250, 'unit': 'g'}])
+
+        assert plan['flour']['amount'] == pytest.approx(0.25)
+        assert not_found == []
+
+    def test_amounts_for_the_same_item_are_summed(self):
+        """Test several ingredients drawing from one item"""
+        items = [{'id': 'milk', 'ingredientName': 'Milk', 'quantity': 1, 'unit': 'L'}]
+        ingredients = [
+            {'name': 'milk', 'quantity': 200, 'unit': 'ml'},
+            {'name': 'whole milk', 'quantity': '1 1/2', 'unit': 'cups'},
+        ]
+
+        plan, _ = plan_consumption(items, ingredients)
+
+        assert plan['milk']['amount'] == pytest.approx(0.56)
+        assert plan['milk']['ingredients'] == ['milk', 'whole milk']
+
+    def test_incompatible_unit_uses_whole_item(self):
+        """Test unconvertible requests fall back to removing the item"""
+        items = [
+            {'id': 'a', 'ingredientName': 'Chicken', 'quantity': 500, 'unit': 'g'},
+            {'id': 'b', 'ingredientName': 'Eggs', 'quantity': 6, 'unit': 'pieces'},
+        ]
+        ingredients = [
+            {'name': 'chicken', 'quantity': 1, 'unit': 'pieces'},
+            {'name': 'eggs'},
+            {'name': 'saffron', 'quantity': 1, 'unit': 'g'},
+        ]
+
+        plan, not_found = plan_consumption(items, ingredients)
+
+        assert plan['a']['amount'] is None
+        assert plan['b']['amount'] is None
+        assert not_found == ['saffron']
+
+    def test_exhausted_item_moves_to_next_match(self):
+        """Test an item is not over-drawn when another match exists"""
+        items = [
+            {'id': 'a', 'ingredientName': 'Butter', 'quantity': 100, 'unit': 'g'},
+            {'id': 'b', 'ingredientName': 'Butter', 'quantity': 250, 'unit': 'g'},
+        ]
+        ingredients = [
+            {'name': 'butter', 'quantity': 100, 'unit': 'g'},
+            {'name': 'butter', 'quantity': 50, 'unit': 'g'},
+        ]
+
+        plan, _ = plan_consumption(items, ingredients)
+
+        assert plan['a']['amount'] == pytest.approx(100)
+        assert plan['b']['amount'] == pytest.approx(50)
+
+
+class TestReconcileReceiptItems:
+    """Test reconcile_receipt_items"""
+
+    NOW = datetime(2024, 3, 1, 12, 0)
+
+    def _reconcile(self, fridge, receipt):
+        ids = iter(f'new-{i}' for i in range(100))
+        return reconcile_receipt_items(fridge, receipt, 'user-1', new_id=lambda: next(ids), now=self.NOW)
+
+    def test_new_items_become_creates(self):
+        """Test unmatched lines create fridge items with category expiry"""
+        result = self._reconcile([], [{'name': 'Chicken', 'quantity': 500, 'unit': 'g', 'category': 'Meat'}])
+
+        [(op, item_id, data)] = result['writes']
+        assert (op, item_id) == ('set', 'new-0')
+        assert data['expirationDate'] == '2024-03-06'
+        assert data['userId'] == 'user-1'
+        assert result['items_added'] == 1
+
+    def test_existing_item_is_stacked_with_unit_conversion(self):
+        """Test quantities are converted to the stored unit"""
+        fridge = [{'id': 'rice', 'ingredientName': 'Rice', 'quantity': 1, 'unit': 'kg'}]
+
+        result = self._reconcile(fridge, [{'name': 'rice', 'quantity': 500, 'unit': 'g'}])
+
+        assert result['writes'] == [('update', 'rice', {
+            'notes': 'Updated from receipt scan (was 1.0 kg)',
+            'quantity': 1.5,
+            'updatedAt': self.NOW
+        })]
+        assert result['items'][0]['quantity'] == 1.5
+        assert result['items_updated'] == 1
+
+    def test_repeated_lines_collapse_into_one_write(self):
+        """Test one write per document however many lines match it"""
+        fridge = [{'id': 'milk', 'ingredientName': 'Milk', 'quantity': 1, 'unit': 'L'}]
+        receipt = [
+            {'name': 'Milk', 'quantity': 1, 'unit': 'L'},
+            {'name': 'milk', 'quantity': 1, 'unit': 'L'},
+            {'name': 'Tomatoes', 'quantity': 2, 'unit': 'pieces'},
+            {'name': 'Tomato', 'quantity': 1, 'unit': 'pieces'},
+        ]
+
+        result = self._reconcile(fridge, receipt)
+        writes = {item_id: (op, data) for op, item_id, data in result['writes']}
+
+        assert len(result['writes']) == 2
+        assert writes['milk'][1]['quantity'] == 3
+        assert writes['new-0'][0] == 'set'
+        assert writes['new-0'][1]['quantity'] == 3
+        assert (result['items_added'], result['items_updated']) == (1, 3)
+
+
+class FakeRef:
+    def __init__(self, db, path):
+        self.db = db
+        self.path = path
+        self.id = path.rsplit('/', 1)[-1]
+
+    def collection(self, name):
+        return FakeCollection(self.db, f"{self.path}/{name}")
+
+
+class FakeCollection:
+    def __init__(self, db, path):
+        self.db = db
+        self.path = path
+
+    def document(self, doc_id=None):
+        if doc_id is None:
+            self.db.counter += 1
+            doc_id = f"new-{self.db.counter}"
+        return FakeRef(self.db, f"{self.path}/{doc_id}")
+
+    def where(self, filter=None):
+        return self
+
+    def stream(self):
+        prefix = self.path + '/'
+        return [
+            FakeSnapshot(path[len(prefix):], data) for path, data in self.db.docs.items()
+            if path.startswith(prefix) and '/' not in path[len(prefix):]
+        ]
+
+
+def _apply_write(db, op, ref, data):
+    db.writes.append((op, ref.path, data))
+    if op == 'set':
+        db.docs[ref.path] = dict(data)
+    elif op == 'update':
+        db.docs[ref.path].update(data)
+
+
+class FakeTransaction:
+    """
+    Transaction fake with the protocol firestore.transactional drives
+
+    Writes are buffered and applied on _commit; retries are not simulated.
+    """
+
+    _read_only = False
+    _max_attempts = 5
+
+    def __init__(self, db):
+        self.db = db
+        self._id = None
+        self._writes = []
+
+    def _clean_up(self):
+        self._writes = []
+        self._id = None
+
+    def _begin(self, retry_id=None):
+        self._id = b'txn'
+
+    def _commit(self):
+        for write in self._writes:
+            _apply_write(self.db, *write)
+        self._clean_up()
+
+    def _rollback(self):
+        self._clean_up()
+
+    def set(self, ref, data, merge=False):
+        self._writes.append(('merge' if merge else 'set', ref, data))
+
+    def update(self, ref, data):
+        self._writes.append(('update', ref, data))
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self.db = db
+        self._writes = []
+
+    def set(self, ref, data, merge=False):
+        self._writes.append(('merge' if merge else 'set', ref, data))
+
+    def commit(self):
+        self.db.batches += 1
+        for write in self._writes:
+            _apply_write(self.db, *write)
+
+
+class FakeTransactionalDb:
+    def __init__(self, docs):
+        self.docs = docs
+        self.writes = []
+        self.reads = []
+        self.counter = 0
+        self.batches = 0
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def get_all(self, refs, transaction=None):
+        self.reads.extend(ref.id for ref in refs)
+        return [FakeSnapshot(ref.id, self.docs.get(ref.path)) for ref in refs]
+
+    def transaction(self):
+        return FakeTransaction(self)
+
+    def batch(self):
+        return FakeBatch(self)
+
+
+class TestApplyReceiptItems:
+    """Test apply_receipt_items against a fridge changed since it was cached"""
+
+    def _stale_db(self):
+        db = FakeTransactionalDb({
+            'FridgeItem/rice': {'userId': 'user-1', 'ingredientName': 'Rice', 'quantity': 1.0, 'unit': 'kg'},
+            'FridgeItem/milk': {'userId': 'user-1', 'ingredientName': 'Milk', 'quantity': 1.0, 'unit': 'L'},
+        })
+        load_fridge_items(db, 'user-1')
+        return db
+
+    def test_stacks_onto_the_stored_quantity(self):
+        """Test a consume committed elsewhere is kept, not overwritten by the cached quantity"""
+        db = self._stale_db()
+        db.docs['FridgeItem/rice']['quantity'] = 0.2
+
+        result = apply_receipt_items(db, 'user-1', [{'name': 'rice', 'quantity': 500, 'unit': 'g'}])
+
+        assert db.docs['FridgeItem/rice']['quantity'] == pytest.approx(0.7)
+        assert 'updatedAt' in db.docs['FridgeItem/rice']
+        assert db.reads == ['rice']
+        assert result['items_updated'] == 1
+
+    def test_item_deleted_meanwhile_is_recreated(self):
+        """Test a line for an item removed elsewhere creates a new item and counts it"""
+        db = self._stale_db()
+        del db.docs['FridgeItem/milk']
+
+        result = apply_receipt_items(db, 'user-1', [{'name': 'Milk', 'quantity': 2, 'unit': 'L'}])
+
+        [(op, item_id, data)] = result['writes']
+        assert op == 'set' and data['quantity'] == 2
+        assert db.docs[f'FridgeItem/{item_id}']['ingredientName'] == 'Milk'
+        assert [(op, path) for op, path, _ in db.writes] == [
+            ('set', f'FridgeItem/{item_id}'), ('merge', 'users/user-1/stats/dashboard')
+        ]
+
+    def test_oversized_receipt_commits_new_items_in_batches(self, monkeypatch):
+        """Test stacked items stay transactional while new items past the write limit are batched"""
+        monkeypatch.setattr(fridge_service, 'MAX_BATCH_SIZE', 3)
+        db = self._stale_db()
+        lines = [{'name': 'Rice', 'quantity': 1, 'unit': 'kg'}] + [{'name': name} for name in ('Eggs', 'Kale', 'Leek')]
+
+        result = apply_receipt_items(db, 'user-1', lines)
+
+        assert [op for op, _, _ in db.writes] == ['update', 'set', 'set', 'set', 'merge']
+        assert db.batches == 1
+        assert db.docs['FridgeItem/rice']['quantity'] == 2.0
+        assert set(result['timings']) == {'reconcile', 'commit'}
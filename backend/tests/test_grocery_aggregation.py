@@ -0,0 +1,109 @@
+"""
+Tests for Meal Plan Grocery Aggregation
+Test name/unit canonicalisation, servings scaling and fridge subtraction
+"""
+from services.grocery_aggregation import (
+    aggregate_ingredients, group_by_category, shopping_items, subtract_fridge_stock
+)
+
+
+def _plan(*ingredients, servings=1):
+    return {'servings': servings, 'ingredients': list(ingredients)}
+
+
+def _by_name(items):
+    return {item['name']: item for item in items}
+
+
+class TestAggregateIngredients:
+    """Test aggregate_ingredients"""
+
+    def test_convertible_units_add_up_in_largest_unit(self):
+        """Test 500 g + 1 kg of the same ingredient is 1.5 kg"""
+        entries = aggregate_ingredients([
+            _plan({'name': 'Flour', 'quantity': 500, 'unit': 'g'}),
+            _plan({'name': 'flour', 'quantity': '1', 'unit': 'kg'}),
+        ], {})
+
+        items = shopping_items(entries)
+
+        assert items == [{'name': 'Flour', 'quantity': 1.5, 'unit': 'kg', 'category': 'Other', 'purchased': False}]
+
+    def test_plural_names_merge_and_servings_scale(self):
+        """Test "Tomatoes" and "tomato" are one line and servings multiply quantities"""
+        entries = aggregate_ingredients([
+            _plan({'name': 'Tomatoes', 'quantity': 2, 'unit': 'pcs', 'category': 'Vegetables'}, servings=2),
+            _plan({'name': 'tomato', 'quantity': '1/2', 'unit': 'piece'}),
+        ], {})
+
+        items = _by_name(shopping_items(entries))
+
+        assert items['Tomatoes']['quantity'] == 4.5
+        assert items['Tomatoes']['category'] == 'Vegetables'
+
+    def test_incompatible_units_stay_separate(self):
+        """Test grams and pieces of one ingredient are kept as two lines"""
+        entries = aggregate_ingredients([
+            _plan({'name': 'Garlic', 'quantity': 20, 'unit': 'g'}),
+            _plan({'name': 'Garlic', 'quantity': 3, 'unit': 'cloves'}),
+            _plan({'name': 'Garlic', 'quantity': 1, 'unit': 'clove'}),
+        ], {})
+
+        assert sorted((item['quantity'], item['unit']) for item in shopping_items(entries)) == [(4, 'cloves'), (20, 'g')]
+
+    def test_inline_recipe_and_unnamed_ingredients(self):
+        """Test inline recipe ingredients are used and nameless ones skipped"""
+        plan = {'recipe': {'ingredients': [{'ingredient': {'name': 'Rice'}, 'quantity': 200, 'unit': 'g'}, {'quantity': 1}]}}
+
+        items = shopping_items(aggregate_ingredients([plan], {}))
+
+        assert [(item['name'], item['quantity']) for item in items] == [('Rice', 200)]
+
+
+class TestSubtractFridgeStock:
+    """Test subtract_fridge_stock"""
+
+    def test_stock_is_converted_and_subtracted(self):
+        """Test 300 g in the fridge leaves 1.2 kg of a 1.5 kg need"""
+        entries = aggregate_ingredients([_plan({'name': 'Flour', 'quantity': 1.5, 'unit': 'kg'})], {})
+
+        subtract_fridge_stock(entries, [{'ingredientName': 'flour', 'quantity': 300, 'unit': 'g'}])
+
+        assert shopping_items(entries)[0] == {
+            'name': 'Flour', 'quantity': 1.2, 'unit': 'kg', 'category': 'Other', 'purchased': False, 'inFridge': 0.3
+        }
+
+    def test_fully_stocked_items_are_dropped(self):
+        """Test lines covered by the fridge (summed over items) are left off the list"""
+        entries = aggregate_ingredients([_plan({'name': 'Milk', 'quantity': 1, 'unit': 'l'})], {})
+
+        subtract_fridge_stock(entries, [
+            {'ingredientName': 'Milk', 'quantity': 500, 'unit': 'ml'},
+            {'ingredientName': 'milk', 'quantity': '0.5', 'unit': 'L'},
+        ])
+
+        assert shopping_items(entries) == []
+
+    def test_fuzzy_match_and_unit_mismatch(self):
+        """Test a related fridge name is used, but stock in other units is not"""
+        entries = aggregate_ingredients([
+            _plan({'name': 'Chicken', 'quantity': 400, 'unit': 'g'}),
+            _plan({'name': 'Eggs', 'quantity': 6, 'unit': 'pcs'}),
+        ], {})
+
+        subtract_fridge_stock(entries, [
+            {'ingredientName': 'Chicken breast', 'quantity': 250, 'unit': 'g'},
+            {'ingredientName': 'Eggs', 'quantity': 200, 'unit': 'g'},
+        ])
+
+        items = _by_name(shopping_items(entries))
+        assert items['Chicken']['quantity'] == 150
+        assert items['Eggs']['quantity'] == 6 and 'inFridge' not in items['Eggs']
+
+    def test_group_by_category(self):
+        """Test items are grouped under their category"""
+        items = [{'name': 'Milk', 'category': 'Dairy'}, {'name': 'Rice', 'category': 'Other'}, {'name': 'Feta', 'category': 'Dairy'}]
+
+        assert {key: [item['name'] for item in value] for key, value in group_by_category(items).items()} == {
+            'Dairy': ['Milk', 'Feta'], 'Other': ['Rice']
+        }
@@ -0,0 +1,328 @@
+"""
+Tests for Grocery List Item Storage
+Test legacy array migration, stable item ids and per-item writes
+"""
+from firebase_admin import firestore
+
+from services import grocery_service
+from services.grocery_service import (
+    ACTIVE_LIST_FIELD, add_items, create_list, delete_item, delete_list, get_active_list, load_items,
+    migrate_legacy_items, resolve_item, set_item_purchased
+)
+
+
+class FakeSnapshot:
+    def __init__(self, ref, data):
+        self.reference = ref
+        self.id = ref.id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeRef:
+    """Document reference over a dict keyed by path"""
+
+    def __init__(self, db, path):
+        self.db = db
+        self.path = path
+        self.id = path.rsplit('/', 1)[-1]
+
+    def collection(self, name):
+        return FakeCollection(self.db, f"{self.path}/{name}")
+
+    def get(self, transaction=None, field_paths=None):
+        return FakeSnapshot(self, self.db.docs.get(self.path))
+
+
+class FakeQuery:
+    def __init__(self, collection):
+        self.collection = collection
+        self.filters = []
+        self.order = None
+        self.descending = False
+        self.count = None
+
+    def where(self, filter):
+        self.filters.append((filter.field_path, filter.op_string, filter.value))
+        return self
+
+    def order_by(self, field, direction=None):
+        self.order = field
+        self.descending = direction == 'DESCENDING'
+        return self
+
+    def limit(self, count):
+        self.count = count
+        return self
+
+    def select(self, fields):
+        return self
+
+    def stream(self):
+        snapshots = [FakeSnapshot(ref, self.collection.db.docs[ref.path]) for ref in self.collection.list_documents()]
+        for field, _, value in self.filters:
+            snapshots = [snapshot for snapshot in snapshots if snapshot.to_dict().get(field) == value]
+        if self.order:
+            snapshots.sort(key=lambda snapshot: snapshot.to_dict()[self.order], reverse=self.descending)
+        return iter(snapshots[:self.count])
+
+
+class FakeCollection:
+    def __init__(self, db, path):
+        self.db = db
+        self.path = path
+
+    def document(self, doc_id=None):
+        if doc_id is None:
+            self.db.counter += 1
+            doc_id = f"auto{self.db.counter:03d}"
+        return FakeRef(self.db, f"{self.path}/{doc_id}")
+
+    def list_documents(self):
+        prefix = self.path + '/'
+        return [
+            FakeRef(self.db, path) for path in self.db.docs
+            if path.startswith(prefix) and '/' not in path[len(prefix):]
+        ]
+
+    def where(self, filter):
+        return FakeQuery(self).where(filter)
+
+    def order_by(self, field, direction=None):
+        return FakeQuery(self).order_by(field, direction)
+
+
+class FakeWriter:
+    """Batch fake: applies writes as they are made"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def set(self, ref, data, merge=False):
+        if not merge:
+            self.db.docs[ref.path] = dict(data)
+            return
+        self.db.docs.setdefault(ref.path, {})
+        self.update(ref, data)
+
+    def update(self, ref, data):
+        doc = self.db.docs[ref.path]
+        for key, value in data.items():
+            if value is firestore.DELETE_FIELD:
+                doc.pop(key, None)
+            else:
+                doc[key] = value
+
+    def delete(self, ref):
+        self.db.docs.pop(ref.path, None)
+
+    def commit(self):
+        pass
+
+
+class FakeTransaction:
+    """
+    Transaction fake with the protocol firestore.transactional drives
+
+    Writes are buffered and applied on _commit, so a transactional function
+    that reads its own writes, or fails before committing, shows up in tests.
+    """
+
+    _read_only = False
+    _max_attempts = 5
+
+    def __init__(self, db):
+        self.db = db
+        self._id = None
+        self._writes = []
+
+    def _clean_up(self):
+        self._writes = []
+        self._id = None
+
+    def _begin(self, retry_id=None):
+        self._id = b'txn'
+
+    def _commit(self):
+        writer = FakeWriter(self.db)
+        for method, args, kwargs in self._writes:
+            getattr(writer, method)(*args, **kwargs)
+        self._clean_up()
+
+    def _rollback(self):
+        self._clean_up()
+
+    def set(self, ref, data, merge=False):
+        self._writes.append(('set', (ref, data), {'merge': merge}))
+
+    def update(self, ref, data):
+        self._writes.append(('update', (ref, data), {}))
+
+    def delete(self, ref):
+        self._writes.append(('delete', (ref,), {}))
+
+
+class FakeDb:
+    def __init__(self):
+        self.docs = {}
+        self.counter = 0
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeWriter(self)
+
+    def transaction(self):
+        return FakeTransaction(self)
+
+
+def _legacy_list(db):
+    ref = db.collection('GroceryList').document('list-1')
+    db.docs[ref.path] = {
+        'userId': 'user-1',
+        'items': [
+            {'name': 'Milk', 'quantity': '1', 'unit': 'L', 'purchased': False},
+            {'name': 'Eggs', 'quantity': '12', 'unit': 'pcs', 'purchased': True},
+        ],
+    }
+    return ref
+
+
+class TestMigration:
+    """Test migrate_legacy_items"""
+
+    def test_array_moves_to_item_documents_in_order(self):
+        """Test legacy items become documents and the array is removed"""
+        db = FakeDb()
+        list_ref = _legacy_list(db)
+
+        assert migrate_legacy_items(db, list_ref) == 2
+
+        assert 'items' not in db.docs[list_ref.path]
+        assert [item['name'] for item in load_items(db, list_ref)] == ['Milk', 'Eggs']
+        assert all('position' not in item and item['id'] for item in load_items(db, list_ref))
+
+    def test_migration_runs_once(self):
+        """Test a migrated list is left untouched"""
+        db = FakeDb()
+        list_ref = _legacy_list(db)
+        migrate_legacy_items(db, list_ref)
+
+        assert migrate_legacy_items(db, list_ref) == 0
+        assert len(load_items(db, list_ref)) == 2
+
+
+class TestItemWrites:
+    """Test per-item writes"""
+
+    def test_added_items_sort_after_existing(self):
+        """Test new items get ids and append after migrated ones"""
+        db = FakeDb()
+        list_ref = _legacy_list(db)
+        migrate_legacy_items(db, list_ref)
+
+        added = add_items(db, list_ref, [grocery_service.new_item({'name': 'Bread'})])
+
+        assert added[0]['id'] and added[0]['name'] == 'Bread'
+        assert [item['name'] for item in load_items(db, list_ref)] == ['Milk', 'Eggs', 'Bread']
+
+    def test_resolve_by_index_or_id(self):
+        """Test numeric keys address items by display position, others by id"""
+        db = FakeDb()
+        list_id, items = create_list(db, {'userId': 'user-1'}, [{'name': 'Milk'}, {'name': 'Eggs'}])
+        list_ref = db.collection('GroceryList').document(list_id)
+
+        assert resolve_item(db, list_ref, '1').id == items[1]['id']
+        assert resolve_item(db, list_ref, items[0]['id']).id == items[0]['id']
+        assert resolve_item(db, list_ref, '5') is None
+
+    def test_toggle_and_explicit_set(self):
+        """Test toggling flips the flag and an explicit value is idempotent"""
+        db = FakeDb()
+        list_id, items = create_list(db, {'userId': 'user-1'}, [{'name': 'Milk', 'purchased': False}])
+        list_ref = db.collection('GroceryList').document(list_id)
+        item_ref = resolve_item(db, list_ref, items[0]['id'])
+
+        assert set_item_purchased(db, list_ref, item_ref)['purchased'] is True
+        assert set_item_purchased(db, list_ref, item_ref, purchased=True)['purchased'] is True
+        assert set_item_purchased(db, list_ref, resolve_item(db, list_ref, 'missing')) is None
+
+    def test_delete_item_and_list(self):
+        """Test deleting one item, then the list with its remaining items"""
+        db = FakeDb()
+        list_id, items = create_list(db, {'userId': 'user-1'}, [{'name': 'Milk'}, {'name': 'Eggs'}])
+        list_ref = db.collection('GroceryList').document(list_id)
+
+        removed = delete_item(db, list_ref, resolve_item(db, list_ref, '0'))
+
+        assert removed['name'] == 'Milk'
+        assert delete_item(db, list_ref, resolve_item(db, list_ref, removed['id'])) is None
+        assert [item['name'] for item in load_items(db, list_ref)] == ['Eggs']
+
+        delete_list(db, list_ref, 'user-1')
+
+        assert not any(path.startswith('GroceryList/') for path in db.docs)
+
+
+def _user(db, user_id='user-1'):
+    return dict(db.docs.get(f'User/{user_id}', {}))
+
+
+class TestActiveList:
+    """Test the activeGroceryListId pointer"""
+
+    def test_new_list_becomes_active(self):
+        """Test creating a list points the user at it"""
+        db = FakeDb()
+        list_id, _ = create_list(db, {'userId': 'user-1', 'createdAt': 1}, [{'name': 'Milk'}])
+
+        assert _user(db)[ACTIVE_LIST_FIELD] == list_id
+        assert get_active_list(db, 'user-1').id == list_id
+
+    def test_pointer_is_read_fresh(self):
+        """Test a list created elsewhere (e.g. by another worker) is picked up immediately"""
+        db = FakeDb()
+        older, _ = create_list(db, {'userId': 'user-1', 'createdAt': 1}, [])
+        assert get_active_list(db, 'user-1').id == older
+
+        newer, _ = create_list(db, {'userId': 'user-1', 'createdAt': 2}, [])
+
+        assert get_active_list(db, 'user-1').id == newer
+
+    def test_stale_pointer_falls_back_to_newest_and_is_repaired(self):
+        """Test a pointer at a deleted list resolves to the newest remaining list"""
+        db = FakeDb()
+        older, _ = create_list(db, {'userId': 'user-1', 'createdAt': 1}, [])
+        newer, _ = create_list(db, {'userId': 'user-1', 'createdAt': 2}, [])
+        create_list(db, {'userId': 'user-2', 'createdAt': 3}, [])
+        delete_list(db, db.collection('GroceryList').document(newer), 'user-1')
+
+        db.docs['User/user-1'][ACTIVE_LIST_FIELD] = newer
+
+        assert get_active_list(db, 'user-1').id == older
+        assert _user(db)[ACTIVE_LIST_FIELD] == older
+
+    def test_deleting_active_list_clears_pointer(self):
+        """Test the pointer is removed with the active list"""
+        db = FakeDb()
+        list_id, _ = create_list(db, {'userId': 'user-1', 'createdAt': 1}, [])
+
+        delete_list(db, db.collection('GroceryList').document(list_id), 'user-1', was_active=True)
+
+        assert ACTIVE_LIST_FIELD not in _user(db)
+        assert get_active_list(db, 'user-1') is None
+
+    def test_legacy_list_is_migrated_when_resolved(self):
+        """Test resolving a legacy list moves its items array into documents"""
+        db = FakeDb()
+        list_ref = _legacy_list(db)
+        db.docs[list_ref.path]['createdAt'] = 1
+
+        snapshot = get_active_list(db, 'user-1')
+
+        assert snapshot.id == 'list-1'
+        assert [item['name'] for item in load_items(db, list_ref)] == ['Milk', 'Eggs']
@@ -0,0 +1,74 @@
+"""
+Tests for Image Preprocessing
+Test downscaling, grayscale receipts and pass-through behaviour
+"""
+import base64
+import hashlib
+import io
+
+import pytest
+
+Image = pytest.importorskip('PIL.Image')
+
+from services.image_preprocessing import PHOTO, RECEIPT, decode_base64_image, preprocess_image  # noqa: E402
+
+
+def _jpeg(width, height, color=(200, 80, 40)):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, format='JPEG', quality=95)
+    return buffer.getvalue()
+
+
+def _decode(prepared):
+    return Image.open(io.BytesIO(base64.b64decode(prepared.base64)))
+
+
+class TestPreprocessImage:
+    """Test preprocess_image"""
+
+    def test_downscales_longest_edge(self):
+        """Test large photos are capped at max_edge, keeping aspect ratio"""
+        prepared = preprocess_image(_jpeg(4000, 3000), mode=PHOTO, max_edge=1000)
+
+        assert prepared.processed
+        assert (prepared.width, prepared.height) == (1000, 750)
+        assert _decode(prepared).size == (1000, 750)
+        assert prepared.stats()['saved_bytes'] == prepared.original_bytes - prepared.processed_bytes
+
+    def test_receipts_are_grayscale(self):
+        """Test receipt mode drops colour"""
+        prepared = preprocess_image(_jpeg(2000, 3000), mode=RECEIPT, max_edge=1000)
+
+        assert _decode(prepared).mode == 'L'
+
+    def test_accepts_data_url_and_file_objects(self):
+        """Test base64 data URLs and binary streams"""
+        raw = _jpeg(1200, 800)
+        data_url = 'data:image/jpeg;base64,' + base64.b64encode(raw).decode()
+
+        from_string = preprocess_image(data_url, max_edge=600)
+        from_stream = preprocess_image(io.BytesIO(raw), max_edge=600)
+
+        assert from_string.original_bytes == from_stream.original_bytes == len(raw)
+        assert from_string.width == from_stream.width == 600
+        assert from_string.content_hash == from_stream.content_hash == hashlib.sha256(raw).hexdigest()
+
+    def test_small_image_is_not_made_larger(self):
+        """Test the original is kept when re-encoding would not help"""
+        raw = _jpeg(64, 64)
+
+        prepared = preprocess_image(raw, max_edge=1000, quality=95)
+
+        assert prepared.processed_bytes <= len(raw)
+
+    def test_unreadable_data_passes_through(self):
+        """Test non-image payloads are forwarded unchanged"""
+        prepared = preprocess_image(b'not an image')
+
+        assert not prepared.processed
+        assert base64.b64decode(prepared.base64) == b'not an image'
+
+    def test_invalid_base64_is_rejected(self):
+        """Test malformed base64 raises ValueError"""
+        with pytest.raises(ValueError):
+            decode_base64_image('abc')
@@ -0,0 +1,68 @@
+"""
+Tests for Ingredient Matching
+Test name normalisation and indexed fridge lookups
+"""
+from services.ingredient_matcher import IngredientIndex, normalize_ingredient, singularize
+
+
+def _fridge(*names):
+    return [{'id': f'item-{i}', 'ingredientName': name} for i, name in enumerate(names)]
+
+
+class TestNormalization:
+    """Test singularize and normalize_ingredient"""
+
+    def test_plural_forms_fold(self):
+        """Test common plural endings"""
+        assert singularize('tomatoes') == 'tomato'
+        assert singularize('berries') == 'berry'
+        assert singularize('peaches') == 'peach'
+        assert singularize('eggs') == 'egg'
+        assert singularize('hummus') == 'hummus'
+        assert singularize('glass') == 'glass'
+
+    def test_case_and_punctuation_are_ignored(self):
+        """Test canonical names"""
+        assert normalize_ingredient('  Cherry-Tomatoes ') == 'cherry tomato'
+        assert normalize_ingredient("Baker's Flour") == 'baker s flour'
+
+
+class TestIngredientIndex:
+    """Test IngredientIndex.match"""
+
+    def test_matches_in_both_directions(self):
+        """Test query/item token containment either way"""
+        index = IngredientIndex(_fridge('Chicken Breast', 'Tomatoes'))
+
+        assert index.match('chicken').item['id'] == 'item-0'
+        assert index.match('ripe tomato').item['id'] == 'item-1'
+
+    def test_substring_false_positives_are_rejected(self):
+        """Test whole-token matching"""
+        index = IngredientIndex(_fridge('Peanut Butter'))
+
+        assert index.match('pea') is None
+
+    def test_best_scoring_item_wins(self):
+        """Test the closest name is chosen over the first one"""
+        index = IngredientIndex(_fridge('Chicken Breast Fillets', 'Chicken', 'Chicken Breast'))
+
+        assert index.match('chicken breast').item['id'] == 'item-2'
+
+    def test_ties_resolve_to_earliest_item(self):
+        """Test deterministic tie-breaking"""
+        index = IngredientIndex(_fridge('Red Onion', 'White Onion'))
+
+        assert index.match('onion').item['id'] == 'item-0'
+
+    def test_removed_items_are_skipped(self):
+        """Test consumed items are not matched twice"""
+        index = IngredientIndex(_fridge('Eggs', 'Duck Eggs'))
+
+        first = index.match('egg')
+        index.remove(first.position)
+
+        assert first.item['id'] == 'item-0'
+        assert index.match('egg').item['id'] == 'item-1'
+        index.remove(1)
+        assert index.match('egg') is None
@@ -0,0 +1,138 @@
+"""
+Tests for the Background Job Queue
+Test job lifecycle, ownership, back-pressure and restart recovery
+"""
+import os
+import sqlite3
+import threading
+
+import pytest
+
+from services.job_queue import FAILED, RUNNING, SUCCEEDED, JobQueue, JobQueueFull, _process_start_time
+
+
+@pytest.fixture
+def queue(tmp_path):
+    job_queue = JobQueue(tmp_path / 'jobs.sqlite3', max_workers=2, max_pending=2)
+    yield job_queue
+    job_queue.shutdown()
+
+
+class TestJobQueue:
+    """Test JobQueue"""
+
+    def test_successful_job_stores_result(self, queue):
+        """Test results are stored and returned to the owner"""
+        job_id = queue.submit('receipt_scan', 'user-1', lambda x: {'items_added': x}, 3)
+
+        job = queue.wait(job_id, timeout=5, user_id='user-1')
+
+        assert job['status'] == SUCCEEDED
+        assert job['result'] == {'items_added': 3}
+
+    def test_failed_job_records_error(self, queue):
+        """Test exceptions mark the job failed"""
+        def boom():
+            raise RuntimeError('model offline')
+
+        job = queue.wait(queue.submit('food_scan', 'user-1', boom), timeout=5)
+
+        assert job['status'] == FAILED
+        assert job['error'] == 'model offline'
+
+    def test_jobs_are_private_to_their_owner(self, queue):
+        """Test other users cannot read a job"""
+        job_id = queue.submit('receipt_scan', 'user-1', lambda: {})
+
+        assert queue.get(job_id, user_id='user-2') is None
+        assert queue.get('missing') is None
+
+    def test_rejects_when_pending_limit_reached(self, queue):
+        """Test back-pressure once max_pending jobs are in flight"""
+        release = threading.Event()
+        first = queue.submit('receipt_scan', 'user-1', release.wait, 5)
+        queue.submit('receipt_scan', 'user-1', release.wait, 5)
+
+        with pytest.raises(JobQueueFull):
+            queue.submit('receipt_scan', 'user-1', release.wait, 5)
+
+        release.set()
+        assert queue.wait(first, timeout=5)['status'] == SUCCEEDED
+
+    def test_unfinished_jobs_fail_after_restart(self, tmp_path):
+        """Test jobs orphaned by a dead process are marked failed on start-up"""
+        path = tmp_path / 'jobs.sqlite3'
+        first = JobQueue(path)
+        first._conn.execute(
+            "INSERT INTO jobs (id, kind, user_id, owner, status, created_at)"
+            " VALUES ('orphan', 'receipt_scan', 'user-1', NULL, 'running', 0)"
+        )
+        first._conn.commit()
+        first.shutdown()
+
+        restarted = JobQueue(path)
+
+        assert restarted.get('orphan')['status'] == FAILED
+        restarted.shutdown()
+
+    @pytest.mark.skipif(_process_start_time(os.getppid()) is None, reason='needs /proc start times')
+    def test_reused_pid_does_not_keep_a_job_alive(self, tmp_path):
+        """Test a live pid only owns a job if its process start time matches too"""
+        path = tmp_path / 'jobs.sqlite3'
+        parent = os.getppid()
+        with sqlite3.connect(str(path)) as conn:
+            JobQueue(path).shutdown()
+            conn.executemany(
+                "INSERT INTO jobs (id, kind, user_id, owner, status, created_at) VALUES (?, 'receipt_scan', 'user-1', ?, 'running', 0)",
+                [('reused', f"{parent}:1"), ('alive', f"{parent}:{_process_start_time(parent)}")]
+            )
+
+        restarted = JobQueue(path)
+
+        assert restarted.get('reused')['status'] == FAILED
+        assert restarted.get('alive')['status'] == RUNNING
+        restarted.shutdown()
+
+    def test_tables_from_pid_owners_are_upgraded(self, tmp_path):
+        """Test a jobs table without the owner column gains it and its unfinished rows fail"""
+        path = tmp_path / 'jobs.sqlite3'
+        with sqlite3.connect(str(path)) as conn:
+            conn.execute(
+                'CREATE TABLE jobs (id TEXT PRIMARY KEY, kind TEXT NOT NULL, user_id TEXT, owner_pid INTEGER,'
+                ' status TEXT NOT NULL, result TEXT, error TEXT, created_at REAL NOT NULL, started_at REAL, finished_at REAL)'
+            )
+            conn.execute(f"INSERT INTO jobs VALUES ('old', 'food_scan', 'user-1', {os.getppid()}, 'queued', NULL, NULL, 0, NULL, NULL)")
+
+        queue = JobQueue(path)
+
+        assert queue.get('old')['status'] == FAILED
+        assert queue.wait(queue.submit('food_scan', 'user-1', lambda: {}), timeout=5)['status'] == SUCCEEDED
+        queue.shutdown()
+
+
+class TestRun:
+    """Test JobQueue.run for synchronous callers"""
+
+    def test_returns_the_result_and_records_the_job(self, queue):
+        """Test run waits for the worker and the job shows up like a queued one"""
+        assert queue.run('receipt_scan', 'user-1', lambda x: {'items_added': x}, 2) == {'items_added': 2}
+        assert queue.stats()['jobs'] == {SUCCEEDED: 1}
+
+    def test_reraises_the_original_exception(self, queue):
+        """Test the caller sees the job's own exception type"""
+        def boom():
+            raise LookupError('model offline')
+
+        with pytest.raises(LookupError, match='model offline'):
+            queue.run('food_scan', 'user-1', boom)
+
+    def test_shares_the_pending_limit_with_queued_jobs(self, queue):
+        """Test synchronous calls are rejected once queued jobs fill the pool"""
+        release = threading.Event()
+        queue.submit('receipt_scan', 'user-1', release.wait, 5)
+        queue.submit('receipt_scan', 'user-1', release.wait, 5)
+
+        with pytest.raises(JobQueueFull):
+            queue.run('receipt_scan', 'user-2', lambda: {})
+
+        release.set()
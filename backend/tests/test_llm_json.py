@@ -0,0 +1,70 @@
+"""
+Tests for LLM JSON Parsing Helpers
+Test fence stripping, array parsing and per-item recovery
+"""
+from services.llm_json import (
+    extract_json_objects,
+    parse_json_list,
+    strip_code_fences,
+    validate_items,
+)
+
+RECIPE_FIELDS = {'title': str, 'ingredients': list, 'instructions': list}
+
+
+def _recipe(title):
+    return {'title': title, 'ingredients': [{'name': 'rice'}], 'instructions': ['Cook']}
+
+
+class TestParseJsonList:
+    """Test parse_json_list"""
+
+    def test_strips_markdown_fence(self):
+        """Test ```json fences are removed"""
+        assert strip_code_fences('```json\n[1, 2]\n```') == '[1, 2]'
+
+    def test_parses_bare_array(self):
+        """Test a well-formed array is returned as-is"""
+        assert parse_json_list('[{"title": "A"}, {"title": "B"}]') == [{'title': 'A'}, {'title': 'B'}]
+
+    def test_unwraps_single_array_property(self):
+        """Test {"recipes": [...]} wrappers are unwrapped"""
+        assert parse_json_list('{"recipes": [{"title": "A"}]}') == [{'title': 'A'}]
+
+    def test_single_object_becomes_list(self):
+        """Test a lone object is treated as one item"""
+        assert parse_json_list('{"title": "A", "tags": ["x"]}') == [{'title': 'A', 'tags': ['x']}]
+
+    def test_recovers_items_around_malformed_entry(self):
+        """Test a broken entry does not lose its neighbours"""
+        text = '[{"title": "A"}, {"title": "B", "ingredients": [}, {"title": "C"}]'
+
+        titles = [item.get('title') for item in parse_json_list(text)]
+
+        assert 'A' in titles
+        assert 'C' in titles
+        assert 'B' not in titles
+
+    def test_recovers_items_from_truncated_output(self):
+        """Test output cut off mid-item keeps the complete items"""
+        text = '[{"title": "A"}, {"title": "B"}, {"title": "C", "instr'
+
+        assert extract_json_objects(text) == [{'title': 'A'}, {'title': 'B'}]
+
+
+class TestValidateItems:
+    """Test validate_items"""
+
+    def test_drops_items_missing_required_fields(self):
+        """Test schema validation"""
+        items = [_recipe('A'), {'title': 'B'}, {'calories': 100}, 'junk']
+
+        assert validate_items(items, RECIPE_FIELDS) == [_recipe('A')]
+
+    def test_drops_duplicates_and_applies_limit(self):
+        """Test de-duplication on a field and the limit"""
+        items = [_recipe('Pasta'), _recipe('pasta '), _recipe('Soup'), _recipe('Salad')]
+
+        valid = validate_items(items, RECIPE_FIELDS, limit=2, unique_field='title')
+
+        assert [item['title'] for item in valid] == ['Pasta', 'Soup']
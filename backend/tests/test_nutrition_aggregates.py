@@ -0,0 +1,149 @@
+"""
+Tests for Daily Nutrition Aggregates
+Test increment payloads, rebuilding a day from raw logs and the API view
+"""
+from services.nutrition_aggregates import (
+    AGGREGATE_VERSION, add_meal_log, daily_view, meal_delta, nutrient_values, summarize_day
+)
+
+
+class FakeRef:
+    """Document reference that only knows its path"""
+
+    def __init__(self, path):
+        self.path = path
+        self.id = path.rsplit('/', 1)[-1]
+
+    def collection(self, name):
+        return FakeCollection(f"{self.path}/{name}")
+
+
+class FakeCollection:
+    """Collection handing out deterministic document ids"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def document(self, doc_id='new-meal'):
+        return FakeRef(f"{self.path}/{doc_id}")
+
+
+class FakeBatch:
+    """Records batched writes"""
+
+    def __init__(self):
+        self.writes = []
+        self.committed = False
+
+    def set(self, ref, data, merge=False):
+        self.writes.append((ref.path, data, merge))
+
+    def commit(self):
+        self.committed = True
+
+
+class FakeDb:
+    def __init__(self):
+        self.batches = []
+
+    def collection(self, name):
+        return FakeCollection(name)
+
+    def batch(self):
+        self.batches.append(FakeBatch())
+        return self.batches[-1]
+
+
+MEAL = {
+    'user': FakeRef('User/user-1'),
+    'mealName': 'Porridge',
+    'date': '2026-03-02',
+    'mealType': 'breakfast',
+    'nutrition': {'calories': 320, 'protein': '12', 'carbs': 54.5, 'fat': None},
+    'createdAt': '2026-03-02T08:00:00',
+}
+
+
+class TestMealDelta:
+    """Test meal_delta and nutrient_values"""
+
+    def test_nutrient_values_coerce_numbers(self):
+        """Test strings are parsed and missing/invalid values count as zero"""
+        values = nutrient_values({'calories': '250', 'protein': 'lots', 'fat': None})
+
+        assert values == {'calories': 250.0, 'protein': 0.0, 'carbs': 0.0, 'fat': 0.0, 'fiber': 0.0}
+
+    def test_adding_increments_totals_and_embeds_meal(self):
+        """Test an added meal increments every total and is embedded with ids"""
+        delta = meal_delta('meal-1', MEAL)
+
+        assert delta['totals']['calories'].value == 320.0
+        assert delta['totals']['protein'].value == 12.0
+        assert delta['mealCount'].value == 1
+        assert delta['meals']['meal-1']['user'] == 'user-1'
+        assert delta['meals']['meal-1']['id'] == 'meal-1'
+
+    def test_removing_decrements_and_deletes_meal(self):
+        """Test sign=-1 subtracts the same amounts and drops the embedded meal"""
+        from firebase_admin import firestore
+
+        delta = meal_delta('meal-1', MEAL, sign=-1)
+
+        assert delta['totals']['carbs'].value == -54.5
+        assert delta['mealCount'].value == -1
+        assert delta['meals']['meal-1'] is firestore.DELETE_FIELD
+
+
+class TestSummarizeDay:
+    """Test summarize_day and daily_view"""
+
+    def test_rebuild_sums_logs(self):
+        """Test a rebuilt day matches the sum of its logs and is versioned"""
+        second = dict(MEAL, nutrition={'calories': 180, 'fiber': 3}, createdAt='2026-03-02T07:00:00')
+
+        data = summarize_day('2026-03-02', [('meal-1', MEAL), ('meal-2', second)], water_intake=5)
+
+        assert data['totals']['calories'] == 500.0
+        assert data['totals']['fiber'] == 3.0
+        assert data['mealCount'] == 2
+        assert data['waterIntake'] == 5
+        assert data['version'] == AGGREGATE_VERSION
+
+    def test_view_rounds_totals_and_orders_meals(self):
+        """Test float drift from increments is rounded and meals are oldest first"""
+        data = summarize_day('2026-03-02', [
+            ('meal-1', MEAL),
+            ('meal-2', dict(MEAL, createdAt='2026-03-02T07:00:00')),
+        ])
+        data['totals']['protein'] = 0.1 + 0.2
+
+        view = daily_view('2026-03-02', data)
+
+        assert view['totals']['protein'] == 0.3
+        assert [meal['id'] for meal in view['meals']] == ['meal-2', 'meal-1']
+        assert view['meal_count'] == 2
+
+    def test_view_of_missing_day_is_empty(self):
+        """Test a day without a document reads as zeros"""
+        view = daily_view('2026-03-02', None)
+
+        assert view['totals']['calories'] == 0
+        assert view['meals'] == []
+        assert view['water_intake'] == 0
+
+
+class TestAddMealLog:
+    """Test add_meal_log"""
+
+    def test_log_and_aggregate_are_written_in_one_batch(self):
+        """Test the NutritionLog entry and the daily increment commit together"""
+        db = FakeDb()
+
+        meal_id = add_meal_log(db, 'user-1', MEAL)
+
+        assert meal_id == 'new-meal'
+        assert len(db.batches) == 1 and db.batches[0].committed
+        (log_path, log_data, _), (day_path, delta, merge) = db.batches[0].writes
+        assert log_path == 'NutritionLog/new-meal' and log_data is MEAL
+        assert day_path == 'users/user-1/nutrition/2026-03-02' and merge
+        assert delta['mealCount'].value == 1
@@ -0,0 +1,91 @@
+"""
+Tests for Nutrition Trends
+Test rolling averages, goal adherence and macro ratios over daily aggregates
+"""
+import pytest
+
+pytest.importorskip('numpy')
+
+from services.nutrition_aggregates import daily_view, summarize_day  # noqa: E402
+from services.nutrition_trends import compute_trend, rolling_window  # noqa: E402
+
+
+def _day(date_str, calories=0, protein=0, carbs=0, fat=0, water=0):
+    meals = []
+    if calories:
+        nutrition = {'calories': calories, 'protein': protein, 'carbs': carbs, 'fat': fat}
+        meals = [('meal-' + date_str, {'date': date_str, 'nutrition': nutrition})]
+    return daily_view(date_str, summarize_day(date_str, meals, water))
+
+
+GOALS = {'calories': 2000, 'protein': 100, 'carbs': 250, 'fat': 70, 'fiber': 25, 'water': 8}
+
+
+class TestComputeTrend:
+    """Test compute_trend"""
+
+    def test_rolling_average_skips_empty_days(self):
+        """Test days without meals do not pull the rolling average down"""
+        days = [
+            _day('2026-03-01', calories=1800),
+            _day('2026-03-02'),
+            _day('2026-03-03', calories=2200),
+        ]
+
+        trend = compute_trend(days, GOALS, window=3)
+
+        assert [day['rolling']['calories'] for day in trend['days']] == [1800.0, 1800.0, 2000.0]
+        assert trend['summary']['days_logged'] == 2
+        assert trend['summary']['averages']['calories'] == 2000.0
+
+    def test_adherence_rates(self):
+        """Test band goals use the tolerance and minimum goals require reaching them"""
+        days = [
+            _day('2026-03-01', calories=2100, protein=120, water=8),
+            _day('2026-03-02', calories=2600, protein=60, water=4),
+        ]
+
+        adherence = compute_trend(days, GOALS)['summary']['adherence']
+
+        assert adherence['calories'] == 0.5
+        assert adherence['protein'] == 0.5
+        assert adherence['water'] == 0.5
+
+    def test_water_average_uses_logged_days(self):
+        """Test water is averaged over the same days as the other nutrients and adherence"""
+        days = [
+            _day('2026-03-01', calories=2000, water=8),
+            _day('2026-03-02', water=2),
+            _day('2026-03-03', calories=2000, water=6),
+        ]
+
+        summary = compute_trend(days, GOALS)['summary']
+
+        assert summary['averages']['water'] == 7.0
+        assert summary['adherence']['water'] == 0.5
+
+    def test_macro_ratios_are_energy_shares(self):
+        """Test ratios weight fat at 9 kcal/g and protein/carbs at 4 kcal/g"""
+        days = [_day('2026-03-01', calories=720, protein=45, carbs=45, fat=40)]
+
+        trend = compute_trend(days, GOALS)
+
+        assert trend['days'][0]['macro_ratio'] == {'protein': 0.25, 'carbs': 0.25, 'fat': 0.5}
+        assert trend['summary']['macro_ratio'] == {'protein': 0.25, 'carbs': 0.25, 'fat': 0.5}
+
+    def test_empty_range(self):
+        """Test a range with nothing logged returns zeros and empty summaries"""
+        trend = compute_trend([_day('2026-03-01'), _day('2026-03-02')], GOALS)
+
+        assert trend['summary']['days_logged'] == 0
+        assert trend['summary']['averages'] == {}
+        assert trend['days'][0]['rolling']['calories'] is None
+        assert trend['days'][0]['macro_ratio']['fat'] is None
+
+    def test_goal_percentage_and_window(self):
+        """Test per-day percentage of the calorie goal and the default windows"""
+        trend = compute_trend([_day('2026-03-01', calories=1500)], GOALS)
+
+        assert trend['days'][0]['calorie_goal_pct'] == 75.0
+        assert trend['days'][0]['day'] == 'Sun'
+        assert rolling_window(7) == 3 and rolling_window(90) == 7
@@ -0,0 +1,133 @@
+"""
+Tests for Firestore Aggregation Helpers
+Test server-side count/sum/avg and the streaming fallback
+"""
+from types import SimpleNamespace
+
+import pytest
+from google.api_core import exceptions
+
+from utils import queries
+from utils.queries import AVG, COUNT, SUM, aggregate, avg_field, count_documents, sum_field
+
+DOCS = [{'price': 2}, {'price': 3.5}, {'price': 'n/a'}, {'price': True}, {}]
+
+
+class FakeDoc:
+    def __init__(self, data):
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class StreamingQuery:
+    """Query without aggregation support (older client or emulator)"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.selected = None
+        self.streams = 0
+
+    def select(self, fields):
+        self.selected = fields
+        return self
+
+    def stream(self, transaction=None):
+        self.streams += 1
+        return iter(FakeDoc({key: value for key, value in doc.items() if key in self.selected}) for doc in self.docs)
+
+
+class FakeAggregationQuery:
+    def __init__(self, query):
+        self.query = query
+        self.specs = []
+
+    def count(self, alias):
+        self.specs.append((alias, len(self.query.docs)))
+        return self
+
+    def sum(self, field, alias):
+        self.specs.append((alias, 42))
+        return self
+
+    def avg(self, field, alias):
+        self.specs.append((alias, 7.5))
+        return self
+
+    def get(self, transaction=None):
+        self.query.round_trips += 1
+        return [[SimpleNamespace(alias=alias, value=value) for alias, value in self.specs]]
+
+
+class AggregatingQuery(StreamingQuery):
+    """Query whose aggregations run "server-side" in a single round trip"""
+
+    def __init__(self, docs):
+        super().__init__(docs)
+        self.round_trips = 0
+
+    def count(self, alias):
+        return FakeAggregationQuery(self).count(alias)
+
+    def sum(self, field, alias):
+        return FakeAggregationQuery(self).sum(field, alias)
+
+    def avg(self, field, alias):
+        return FakeAggregationQuery(self).avg(field, alias)
+
+
+class UnimplementedQuery(StreamingQuery):
+    """Query whose backend rejects aggregations with the real client's error"""
+
+    def count(self, alias):
+        return self
+
+    def get(self, transaction=None):
+        raise exceptions.MethodNotImplemented('aggregation queries are not supported')
+
+
+class TestAggregate:
+    """Test aggregate and its wrappers"""
+
+    def test_server_side_aggregations_share_one_round_trip(self):
+        """Test several aggregations are chained into one request without streaming"""
+        query = AggregatingQuery(DOCS)
+
+        result = aggregate(query, {'n': (COUNT, None), 'total': (SUM, 'price'), 'mean': (AVG, 'price')})
+
+        assert result == {'n': 5, 'total': 42, 'mean': 7.5}
+        assert query.round_trips == 1 and query.streams == 0
+
+    def test_fallback_streams_projected_fields(self):
+        """Test unsupported aggregations stream only the needed fields, skipping non-numbers"""
+        query = StreamingQuery(DOCS)
+
+        result = aggregate(query, {'n': (COUNT, None), 'total': (SUM, 'price'), 'mean': (AVG, 'price')})
+
+        assert result == {'n': 5, 'total': 5.5, 'mean': 2.75}
+        assert query.selected == ['price'] and query.streams == 1
+
+    def test_wrappers_on_empty_results(self):
+        """Test count is 0, sum is 0 and avg is None when nothing matches"""
+        assert count_documents(StreamingQuery([])) == 0
+        assert sum_field(StreamingQuery([]), 'price') == 0
+        assert avg_field(StreamingQuery([]), 'price') is None
+
+    def test_unknown_aggregation_is_rejected(self):
+        """Test a typo in the aggregation kind raises instead of falling back"""
+        with pytest.raises(ValueError):
+            aggregate(AggregatingQuery(DOCS), {'x': ('median', 'price')})
+
+    def test_server_rejection_falls_back_to_streaming(self):
+        """Test the google.api_core error for an unsupported RPC triggers the fallback"""
+        query = UnimplementedQuery(DOCS)
+
+        assert count_documents(query) == 5
+        assert query.streams == 1
+
+    def test_fallback_errors_exist_in_the_client_library(self):
+        """Test every error caught for the fallback is a real exception class"""
+        assert all(
+            isinstance(error, type) and issubclass(error, Exception) for error in queries._AGGREGATION_UNSUPPORTED
+        )
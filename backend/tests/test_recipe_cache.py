@@ -0,0 +1,145 @@
+"""
+Tests for the AI Recipe Cache
+Test request fingerprinting, the variant pool and the SQLite backend
+"""
+import random
+
+from services.recipe_cache import RecipeCache, requirements_fingerprint
+from utils.disk_cache import DiskCache
+
+
+class FakeClock:
+    """Manually advanced wall clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _requirements(**overrides):
+    requirements = {
+        'ingredients': ['Chicken', 'tomatoes', 'garlic'],
+        'dietary_preferences': ['healthy'],
+        'preferred_cuisines': ['italian'],
+        'max_cooking_time': 40,
+        'difficulty': 'medium',
+        'cooking_skill': 'medium',
+        'servings': 4,
+    }
+    requirements.update(overrides)
+    return requirements
+
+
+class TestRequirementsFingerprint:
+    """Test requirements_fingerprint normalisation"""
+
+    def test_ingredient_order_and_case_are_ignored(self):
+        """Test equivalent ingredient lists share a key"""
+        a = requirements_fingerprint('', _requirements())
+        b = requirements_fingerprint('', _requirements(ingredients=['garlic', ' TOMATOES', 'chicken', 'chicken']))
+
+        assert a == b
+
+    def test_cooking_time_is_bucketed(self):
+        """Test times in the same 15-minute bucket share a key"""
+        a = requirements_fingerprint('', _requirements(max_cooking_time=40))
+        b = requirements_fingerprint('', _requirements(max_cooking_time=45))
+        c = requirements_fingerprint('', _requirements(max_cooking_time=50))
+
+        assert a == b
+        assert a != c
+
+    def test_query_and_preferences_change_key(self):
+        """Test meaningful differences produce different keys"""
+        base = requirements_fingerprint('pasta', _requirements())
+
+        assert base == requirements_fingerprint('  Pasta ', _requirements())
+        assert base != requirements_fingerprint('soup', _requirements())
+        assert base != requirements_fingerprint('pasta', _requirements(dietary_preferences=['vegan']))
+
+
+class TestRecipeCache:
+    """Test the variant pool policy"""
+
+    def test_misses_until_pool_is_full(self):
+        """Test lookups miss until `variants` recipes were generated"""
+        cache = RecipeCache(DiskCache(':memory:'), variants=2, rng=random.Random(0))
+
+        assert cache.get('key') is None
+        cache.put('key', {'title': 'A'})
+        assert cache.get('key') is None
+        cache.put('key', {'title': 'B'})
+
+        assert cache.get('key')['title'] in {'A', 'B'}
+
+    def test_served_recipe_is_a_copy(self):
+        """Test callers cannot mutate the cached entry"""
+        cache = RecipeCache(DiskCache(':memory:'), variants=1)
+        cache.put('key', {'title': 'A', 'ingredients': []})
+
+        served = cache.get('key')
+        served['ingredients'].append('mutated')
+
+        assert cache.get('key')['ingredients'] == []
+
+    def test_pool_keeps_latest_variants(self):
+        """Test the pool is capped at `variants` entries"""
+        store = DiskCache(':memory:')
+        cache = RecipeCache(store, variants=2)
+        for title in ['A', 'B', 'C']:
+            cache.put('key', {'title': title})
+
+        assert [recipe['title'] for recipe in store.get('key')] == ['B', 'C']
+
+
+class TestDiskCache:
+    """Test the SQLite-backed store"""
+
+    def test_values_survive_reopen(self, tmp_path):
+        """Test entries persist across instances"""
+        path = tmp_path / 'cache.sqlite3'
+        DiskCache(path).set('key', {'value': 1})
+
+        assert DiskCache(path).get('key') == {'value': 1}
+
+    def test_entries_expire(self):
+        """Test TTL expiry"""
+        clock = FakeClock()
+        cache = DiskCache(':memory:', ttl=10, timer=clock)
+        cache.set('key', 'value')
+
+        clock.now += 11
+
+        assert cache.get('key') is None
+        assert len(cache) == 0
+
+    def test_least_recently_read_entry_is_evicted(self):
+        """Test LRU eviction on max_entries"""
+        clock = FakeClock()
+        cache = DiskCache(':memory:', max_entries=2, timer=clock)
+        cache.set('a', 1)
+        clock.now += 1
+        cache.set('b', 2)
+        clock.now += 1
+        cache.get('a')
+        clock.now += 1
+        cache.set('c', 3)
+
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert cache.get('c') == 3
+
+    def test_byte_cap(self):
+        """Test eviction on max_bytes"""
+        clock = FakeClock()
+        cache = DiskCache(':memory:', max_bytes=30, timer=clock)
+        cache.set('a', 'x' * 10)
+        clock.now += 1
+        cache.set('b', 'y' * 10)
+        clock.now += 1
+        cache.set('c', 'z' * 10)
+
+        assert cache.get('a') is None
+        assert cache.stats()['bytes'] <= 30
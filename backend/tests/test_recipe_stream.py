@@ -0,0 +1,81 @@
+"""
+Tests for the Incremental Recipe Parser
+Test per-field events from chunked model output
+"""
+import json
+
+from services.recipe_stream import IncrementalRecipeParser
+
+RECIPE = {
+    'title': 'Garlic "Butter" Pasta',
+    'description': 'Quick weeknight pasta',
+    'ingredients': [
+        {'name': 'spaghetti', 'amount': '200', 'unit': 'g'},
+        {'name': 'garlic', 'amount': '3', 'unit': 'cloves'},
+    ],
+    'instructions': ['Boil the pasta', 'Fry the garlic, then toss'],
+    'prepTime': 5,
+    'cookTime': 15,
+    'nutrition': {'calories': 520, 'protein': 14},
+}
+
+
+def _feed_in_chunks(text, size):
+    parser = IncrementalRecipeParser()
+    events = []
+    for start in range(0, len(text), size):
+        events.extend(parser.feed(text[start:start + size]))
+    return parser, events
+
+
+class TestIncrementalRecipeParser:
+    """Test IncrementalRecipeParser"""
+
+    def test_chunk_size_does_not_change_result(self):
+        """Test any chunking reassembles the same recipe"""
+        text = json.dumps(RECIPE, indent=2)
+
+        for size in (1, 3, 17, len(text)):
+            parser, _ = _feed_in_chunks(text, size)
+            assert parser.done
+            assert parser.result() == RECIPE
+
+    def test_array_elements_are_emitted_individually(self):
+        """Test ingredients and instructions stream element by element"""
+        _, events = _feed_in_chunks(json.dumps(RECIPE), 7)
+
+        ingredients = [e['data'] for e in events if e['event'] == 'ingredient']
+        instructions = [e['data']['value'] for e in events if e['event'] == 'instruction']
+        fields = [e['data']['name'] for e in events if e['event'] == 'field']
+
+        assert [i['index'] for i in ingredients] == [0, 1]
+        assert ingredients[1]['value']['name'] == 'garlic'
+        assert instructions == RECIPE['instructions']
+        assert fields == ['title', 'description', 'prepTime', 'cookTime', 'nutrition']
+
+    def test_field_is_emitted_as_soon_as_it_closes(self):
+        """Test the title arrives before the rest of the object"""
+        parser = IncrementalRecipeParser()
+
+        assert parser.feed('{"title": "Sou') == []
+        events = parser.feed('p", "ingr')
+
+        assert events == [{'event': 'field', 'data': {'name': 'title', 'value': 'Soup'}}]
+
+    def test_trailing_number_waits_for_delimiter(self):
+        """Test a number split across chunks is not emitted early"""
+        parser = IncrementalRecipeParser()
+
+        assert parser.feed('{"cookTime": 1') == []
+        assert parser.feed('5') == []
+        events = parser.feed('0}')
+
+        assert events[0]['data'] == {'name': 'cookTime', 'value': 150}
+        assert parser.done
+
+    def test_ignores_fence_and_preamble(self):
+        """Test prose and ```json fences before the object are skipped"""
+        parser = IncrementalRecipeParser()
+        parser.feed('Here you go:\n```json\n{"title": "Soup"}\n```')
+
+        assert parser.result() == {'title': 'Soup'}
@@ -0,0 +1,100 @@
+"""
+Tests for the Vision Scan Cache
+Test content-hash keys, the memory/disk tiers and per-key locking
+"""
+import threading
+import time
+
+from services.scan_cache import ScanCache, analysis_key, applied_key, cached_analysis
+from utils.disk_cache import DiskCache
+
+
+class TestScanCache:
+    """Test ScanCache"""
+
+    def test_values_survive_a_restart(self, tmp_path):
+        """Test entries written through one instance are read from disk by the next"""
+        path = tmp_path / 'scan_cache.sqlite3'
+        ScanCache(DiskCache(path)).set('analysis:receipt:m:abc', {'items': [{'name': 'Milk'}]})
+
+        assert ScanCache(DiskCache(path)).get('analysis:receipt:m:abc') == {'items': [{'name': 'Milk'}]}
+
+    def test_reads_return_copies(self):
+        """Test callers cannot mutate the cached value"""
+        cache = ScanCache(DiskCache(':memory:'))
+        cache.set('key', {'items': []})
+
+        cache.get('key')['items'].append('mutated')
+
+        assert cache.get('key') == {'items': []}
+
+    def test_memory_tier_answers_repeats(self):
+        """Test repeated reads are served from memory"""
+        store = DiskCache(':memory:')
+        cache = ScanCache(store)
+        cache.set('key', {'value': 1})
+
+        for _ in range(3):
+            cache.get('key')
+
+        assert store.hits == 0
+        assert cache.stats()['memory']['hits'] == 3
+
+    def test_keys_separate_kinds_models_and_users(self):
+        """Test keys include everything that changes the result"""
+        assert analysis_key('receipt', 'model-a', 'h') != analysis_key('receipt', 'model-b', 'h')
+        assert analysis_key('receipt', 'model-a', 'h') != analysis_key('food', 'model-a', 'h')
+        assert applied_key('receipt', 'user-1', 'h') != applied_key('receipt', 'user-2', 'h')
+
+    def test_locked_serialises_the_same_key(self):
+        """Test a second caller waits for the first and then sees its result"""
+        cache = ScanCache(DiskCache(':memory:'))
+        calls = []
+
+        def scan():
+            with cache.locked('applied:receipt:user-1:h'):
+                if cache.get('applied:receipt:user-1:h') is None:
+                    calls.append(1)
+                    time.sleep(0.05)
+                    cache.set('applied:receipt:user-1:h', {'items_added': 2})
+
+        threads = [threading.Thread(target=scan) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert calls == [1]
+        assert cache._locks == {}
+
+
+class TestCachedAnalysis:
+    """Test cached_analysis"""
+
+    def test_second_call_skips_the_model(self):
+        """Test an identical image is only analysed once"""
+        cache = ScanCache(DiskCache(':memory:'))
+        calls = []
+
+        def analyze():
+            calls.append(1)
+            return {'is_receipt': True, 'items': []}
+
+        first = cached_analysis(cache, 'k', analyze, cacheable=lambda r: 'items' in r)
+        second = cached_analysis(cache, 'k', analyze, cacheable=lambda r: 'items' in r)
+
+        assert first == ({'is_receipt': True, 'items': []}, False)
+        assert second == ({'is_receipt': True, 'items': []}, True)
+        assert len(calls) == 1
+
+    def test_failures_are_not_cached(self):
+        """Test results rejected by cacheable are retried next time"""
+        cache = ScanCache(DiskCache(':memory:'))
+
+        cached_analysis(cache, 'k', lambda: {'is_receipt': False}, cacheable=lambda r: 'items' in r)
+
+        assert cache.get('k') is None
+
+    def test_works_without_a_cache(self):
+        """Test a disabled cache just runs the analysis"""
+        assert cached_analysis(None, None, lambda: {'items': []}, cacheable=bool) == ({'items': []}, False)
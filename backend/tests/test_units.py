@@ -0,0 +1,53 @@
+"""
+Tests for Unit Conversion
+Test quantity parsing and conversion between kitchen units
+"""
+import pytest
+
+from services.units import convert, normalize_unit, parse_quantity
+
+
+class TestParseQuantity:
+    """Test parse_quantity"""
+
+    @pytest.mark.parametrize('value, expected', [
+        (2, 2.0),
+        ('2.5', 2.5),
+        ('1,5', 1.5),
+        ('1/2', 0.5),
+        ('1 1/2', 1.5),
+        ('200g', 200.0),
+    ])
+    def test_parses_common_formats(self, value, expected):
+        """Test numbers, decimals and fractions"""
+        assert parse_quantity(value) == pytest.approx(expected)
+
+    @pytest.mark.parametrize('value', [None, '', 'a pinch', True, '1/0'])
+    def test_missing_or_invalid(self, value):
+        """Test unparseable quantities return None"""
+        assert parse_quantity(value) is None
+
+
+class TestConvert:
+    """Test normalize_unit and convert"""
+
+    def test_normalizes_case_and_plurals(self):
+        """Test unit spellings fold together"""
+        assert normalize_unit('Cups') == 'cup'
+        assert normalize_unit('L') == 'l'
+        assert normalize_unit('pieces') == 'piece'
+        assert normalize_unit('tbsp.') == 'tbsp'
+
+    def test_converts_within_dimension(self):
+        """Test mass and volume conversions"""
+        assert convert(1.5, 'kg', 'g') == pytest.approx(1500)
+        assert convert(250, 'ml', 'L') == pytest.approx(0.25)
+        assert convert(2, 'cups', 'ml') == pytest.approx(480)
+        assert convert(1, 'dozen', 'pieces') == pytest.approx(12)
+
+    def test_incompatible_units(self):
+        """Test cross-dimension and unknown units"""
+        assert convert(1, 'g', 'ml') is None
+        assert convert(2, 'pieces', 'g') is None
+        assert convert(2, 'cloves', 'heads') is None
+        assert convert(2, 'Cloves', 'clove') == 2
@@ -0,0 +1,73 @@
+"""
+Tests for Image Upload Handling
+Test multipart, raw and JSON scanner uploads and the size limit
+"""
+import base64
+import io
+
+import pytest
+from flask import Flask
+
+from utils.uploads import UploadTooLarge, read_image_upload
+
+IMAGE = b'\xff\xd8\xff\xe0 fake jpeg payload'
+
+
+@pytest.fixture
+def app():
+    return Flask(__name__)
+
+
+class TestReadImageUpload:
+    """Test read_image_upload"""
+
+    def test_multipart_file_and_fields(self, app):
+        """Test the file part is handed over as a stream with coerced options"""
+        data = {'image': (io.BytesIO(IMAGE), 'receipt.jpg'), 'auto_log': 'true', 'meal_type': 'lunch'}
+        with app.test_request_context('/scan', method='POST', data=data, content_type='multipart/form-data'):
+            image, options = read_image_upload()
+
+            assert image.read() == IMAGE
+            assert options == {'auto_log': True, 'meal_type': 'lunch'}
+
+    def test_raw_image_body(self, app):
+        """Test image/* bodies are spooled and options read from the query string"""
+        with app.test_request_context('/scan?async=1', method='POST', data=IMAGE, content_type='image/jpeg'):
+            image, options = read_image_upload()
+
+            assert image.read() == IMAGE
+            assert options == {'async': True}
+
+    def test_legacy_json_body(self, app):
+        """Test {"image": "<base64>"} keeps working"""
+        encoded = base64.b64encode(IMAGE).decode()
+        with app.test_request_context('/scan', method='POST', json={'image': encoded, 'async': True}):
+            image, options = read_image_upload()
+
+            assert image == encoded
+            assert options['async'] is True
+
+    def test_missing_image(self, app):
+        """Test requests without an image"""
+        with app.test_request_context('/scan', method='POST', json={'date': '2024-01-01'}):
+            assert read_image_upload()[0] is None
+        with app.test_request_context('/scan', method='POST', data=b'', content_type='image/png'):
+            assert read_image_upload()[0] is None
+
+    def test_oversized_upload_is_rejected_before_reading(self, app):
+        """Test Content-Length is checked against the limit"""
+        with app.test_request_context('/scan', method='POST', data=IMAGE * 100, content_type='image/jpeg'):
+            with pytest.raises(UploadTooLarge):
+                read_image_upload(max_bytes=1024)
+
+    def test_oversized_stream_without_length_is_rejected(self, app):
+        """Test the limit is enforced while streaming"""
+        environ = {
+            'wsgi.input': io.BytesIO(IMAGE * 100),
+            'wsgi.input_terminated': True,
+            'HTTP_TRANSFER_ENCODING': 'chunked',
+            'CONTENT_TYPE': 'image/jpeg',
+        }
+        with app.test_request_context('/scan', method='POST', environ_overrides=environ):
+            with pytest.raises(UploadTooLarge):
+                read_image_upload(max_bytes=1024)
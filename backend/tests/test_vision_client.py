@@ -0,0 +1,228 @@
+"""
+Tests for the Vision Model Client
+Test connection reuse, timeouts, retries and the circuit breaker against a fake Ollama server
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip('ollama')
+
+from services.vision_client import (  # noqa: E402
+    CLOSED, OPEN, LatencyHistogram, VisionCircuitOpen, VisionClient, VisionServiceError
+)
+
+
+class FakeOllama(ThreadingHTTPServer):
+    """Minimal /api/chat server: replies with queued status codes, then 200."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeOllamaHandler)
+        self.statuses = []
+        self.delay = 0.0
+        self.requests = []
+        self.connections = set()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.requests.append(body)
+        self.server.connections.add(self.client_address)
+        time.sleep(self.server.delay)
+
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        if status == 200:
+            payload = {
+                'model': body['model'],
+                'created_at': '2026-01-01T00:00:00Z',
+                'message': {'role': 'assistant', 'content': '{"is_receipt": false}'},
+                'done': True,
+            }
+        else:
+            payload = {'error': f'status {status}'}
+        encoded = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeClock:
+    """Manually advanced monotonic clock"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def server():
+    fake = FakeOllama()
+    thread = threading.Thread(target=fake.serve_forever, daemon=True)
+    thread.start()
+    yield fake
+    fake.shutdown()
+    fake.server_close()
+
+
+def make_client(server, **overrides):
+    options = {
+        'host': server.url,
+        'model': 'vision-test',
+        'connect_timeout': 1,
+        'read_timeout': 2,
+        'max_retries': 2,
+        'backoff_base': 0.01,
+        'backoff_max': 0.05,
+        'failure_threshold': 2,
+        'reset_timeout': 30,
+        'sleep': lambda seconds: None,
+    }
+    options.update(overrides)
+    return VisionClient(**options)
+
+
+class TestVisionClient:
+    """Test VisionClient"""
+
+    def test_chat_reuses_one_connection(self, server):
+        """Test consecutive calls share a kept-alive connection"""
+        client = make_client(server)
+
+        replies = [client.chat('Is this a receipt?', images=['aGVsbG8=']) for _ in range(3)]
+
+        assert replies == ['{"is_receipt": false}'] * 3
+        assert len(server.connections) == 1
+        assert server.requests[0]['model'] == 'vision-test'
+        assert server.requests[0]['messages'][0]['images'] == ['aGVsbG8=']
+        assert client.stats()['latency']['count'] == 3
+        client.close()
+
+    def test_server_errors_are_retried(self, server):
+        """Test 5xx responses are retried with backoff"""
+        delays = []
+        client = make_client(server, sleep=delays.append)
+        server.statuses = [503, 500]
+
+        assert client.chat('prompt') == '{"is_receipt": false}'
+        assert len(server.requests) == 3
+        assert len(delays) == 2 and all(0 <= delay <= 0.05 for delay in delays)
+        assert client.stats()['retries'] == 2
+        client.close()
+
+    def test_client_errors_are_not_retried(self, server):
+        """Test 4xx responses fail immediately"""
+        client = make_client(server)
+        server.statuses = [400]
+
+        with pytest.raises(VisionServiceError):
+            client.chat('prompt')
+
+        assert len(server.requests) == 1
+        client.close()
+
+    def test_client_errors_do_not_open_the_circuit(self, server):
+        """Test rejected requests (bad request, unknown model) never trip the breaker"""
+        client = make_client(server, max_retries=0)
+        server.statuses = [400, 404, 400]
+
+        for _ in range(3):
+            with pytest.raises(VisionServiceError, match='rejected'):
+                client.chat('prompt')
+
+        assert client.state == CLOSED
+        assert client.stats()['consecutive_failures'] == 0
+        assert client.chat('prompt') == '{"is_receipt": false}'
+        client.close()
+
+    def test_close_releases_pooled_connections(self, server):
+        """Test close() shuts the connection pool the client opened"""
+        client = make_client(server)
+        client.chat('prompt')
+        assert client._transport._pool.connections
+
+        client.close()
+
+        assert not client._transport._pool.connections
+
+    def test_read_timeout_is_bounded(self, server):
+        """Test a hung model call fails after the read timeout without retrying"""
+        client = make_client(server, read_timeout=0.2)
+        server.delay = 1.0
+
+        start = time.monotonic()
+        with pytest.raises(VisionServiceError, match='too long'):
+            client.chat('prompt')
+
+        assert time.monotonic() - start < 1.0
+        assert client.stats()['retries'] == 0
+        client.close()
+
+    def test_unreachable_host_raises_service_error(self):
+        """Test connection failures surface as VisionServiceError after retries"""
+        client = VisionClient(
+            host='http://127.0.0.1:9', model='vision-test', connect_timeout=0.5,
+            max_retries=1, sleep=lambda seconds: None
+        )
+
+        with pytest.raises(VisionServiceError):
+            client.chat('prompt')
+
+        assert client.stats()['retries'] == 1
+        client.close()
+
+    def test_circuit_opens_and_recovers(self, server):
+        """Test the breaker fails fast once open and closes after a good trial call"""
+        clock = FakeClock()
+        client = make_client(server, max_retries=0, timer=clock)
+        server.statuses = [500, 500]
+
+        for _ in range(2):
+            with pytest.raises(VisionServiceError):
+                client.chat('prompt')
+        assert client.state == OPEN
+
+        with pytest.raises(VisionCircuitOpen):
+            client.chat('prompt')
+        assert len(server.requests) == 2
+
+        clock.now += 31
+        assert client.chat('prompt') == '{"is_receipt": false}'
+        assert client.state == CLOSED
+        assert client.stats()['rejected'] == 1
+        client.close()
+
+
+class TestLatencyHistogram:
+    """Test LatencyHistogram"""
+
+    def test_buckets_and_percentiles(self):
+        """Test observations land in the right bucket and percentiles use bucket bounds"""
+        histogram = LatencyHistogram(buckets_ms=(100, 1000))
+        for elapsed in (50, 80, 400, 5000):
+            histogram.observe(elapsed)
+
+        snapshot = histogram.snapshot()
+
+        assert snapshot['buckets'] == {'le_100': 2, 'le_1000': 1, 'le_inf': 1}
+        assert snapshot['p50_ms'] == 100.0
+        assert snapshot['p95_ms'] is None
+        assert snapshot['count'] == 4
@@ -2,7 +2,13 @@
 Utils Package
 Utility functions for authentication, Firebase, and response handling
 """
-from .auth import get_current_user_id, require_current_user, attach_current_user
+from .auth import (
+    get_current_user_id,
+    require_current_user,
+    attach_current_user,
+    invalidate_user_cache,
+    public_endpoint,
+)
 from .firebase_connector import initialize_firebase, get_db
 from .response_handler import success_response, error_response
 
@@ -10,6 +16,8 @@ __all__ = [
     'get_current_user_id',
     'require_current_user', 
     'attach_current_user',
+    'invalidate_user_cache',
+    'public_endpoint',
     'initialize_firebase',
     'get_db',
     'success_response',
@@ -2,36 +2,99 @@
 Enhanced Authentication and Authorization System
 Supports Firebase Authentication, JWT tokens, and role-based access control
 """
+import hashlib
 import logging
+import time
 from datetime import datetime, timedelta
 from typing import Optional, Callable
 from functools import wraps
 
-from flask import g, request
+from flask import current_app, g, request
 from firebase_admin import auth as firebase_auth
 import jwt
 
+from config import config
+from utils.cache import TTLCache
 from utils.firebase_connector import get_db
 from utils.response_handler import APIResponse
 
 DEMO_USER_ID = 'demo_user_01'
 logger = logging.getLogger(__name__)
 
+# Per-process caches in front of token verification and the User document read.
+# Claims are keyed by a hash of the ID token so raw tokens never sit in memory
+# longer than the request; user documents are keyed by user id.
+_claims_cache = TTLCache(maxsize=config.USER_CACHE_MAX_SIZE, ttl=config.USER_CACHE_TTL)
+_user_cache = TTLCache(maxsize=config.USER_CACHE_MAX_SIZE, ttl=config.USER_CACHE_TTL)
+
+
+# Endpoints that never need a user: Flask's built-in static handler plus any
+# view decorated with @public_endpoint (asset serving, health probes, ...).
+_PUBLIC_ENDPOINTS = {'static'}
+
+
+def public_endpoint(func: Callable) -> Callable:
+    """
+    Mark a view as public so no user is ever resolved while serving it
+    
+    User resolution is lazy: it only happens when a handler calls
+    require_current_user()/get_current_user_id(). On public endpoints
+    get_current_user_id() returns None instead of resolving.
+    """
+    func.skip_user_resolution = True
+    return func
+
+
+def is_public_endpoint() -> bool:
+    """Return True when the current request targets a public endpoint."""
+    endpoint = request.endpoint
+    if endpoint is None:
+        # Unmatched routes (404s) have nothing to authorize
+        return True
+    if endpoint in _PUBLIC_ENDPOINTS:
+        return True
+    view = current_app.view_functions.get(endpoint)
+    return bool(getattr(view, 'skip_user_resolution', False))
+
 
 def _users_collection():
     return get_db().collection('User')
 
 
+def _token_cache_key(id_token: str) -> str:
+    return hashlib.sha256(id_token.encode('utf-8')).hexdigest()
+
+
+def _cache_user(user_data: dict) -> None:
+    _user_cache.set(user_data['id'], dict(user_data))
+
+
+def invalidate_user_cache(user_id: Optional[str]) -> None:
+    """Drop the cached User document so the next request re-reads Firestore.
+
+    Call this after any write to ``User/{user_id}``.
+    """
+    if user_id:
+        _user_cache.pop(user_id)
+
+
+def get_user_cache_stats() -> dict:
+    """Hit/miss counters for the token-claims and user-document caches."""
+    return {
+        'claims': _claims_cache.stats(),
+        'users': _user_cache.stats(),
+    }
+
+
 def _ensure_demo_user() -> dict:
     """Guarantee a demo user exists for development and return it."""
 
-    user_ref = _users_collection().document(DEMO_USER_ID)
-    snapshot = user_ref.get()
-    if snapshot.exists:
-        user_data = snapshot.to_dict()
-        user_data['id'] = snapshot.id
+    user_data = _load_user_document(DEMO_USER_ID)
+    if user_data:
         return user_data
 
+    user_ref = _users_collection().document(DEMO_USER_ID)
+
     demo_user = {
         'id': DEMO_USER_ID,
         'displayName': 'Demo User',
@@ -54,6 +117,7 @@ def _ensure_demo_user() -> dict:
 
     user_ref.set(demo_user)
     demo_user['id'] = DEMO_USER_ID
+    _cache_user(demo_user)
     return demo_user
 
 
@@ -61,12 +125,17 @@ def _load_user_document(user_id: str) -> Optional[dict]:
     if not user_id:
         return None
 
+    cached = _user_cache.get(user_id)
+    if cached is not None:
+        return dict(cached)
+
     snapshot = _users_collection().document(user_id).get()
     if not snapshot.exists:
         return None
 
     user_data = snapshot.to_dict()
     user_data['id'] = snapshot.id
+    _cache_user(user_data)
     return user_data
 
 
@@ -79,15 +148,35 @@ def _create_user_document(user_id: str, defaults: dict) -> dict:
     }
     user_ref.set(payload)
     payload['id'] = user_id
+    _cache_user(payload)
     return payload
 
 
+def _verify_id_token(id_token: str) -> dict:
+    """Verify a Firebase ID token, reusing claims verified earlier in this process."""
+
+    cache_key = _token_cache_key(id_token)
+    decoded = _claims_cache.get(cache_key)
+    if decoded is not None:
+        return decoded
+
+    decoded = firebase_auth.verify_id_token(id_token)
+
+    # Never keep claims around past the token's own expiry
+    ttl = None
+    expires_at = decoded.get('exp')
+    if expires_at:
+        ttl = min(config.USER_CACHE_TTL, expires_at - time.time())
+    _claims_cache.set(cache_key, decoded, ttl=ttl)
+    return decoded
+
+
 def _load_user_from_firebase_token(id_token: str) -> Optional[dict]:
     if not id_token:
         return None
 
     try:
-        decoded = firebase_auth.verify_id_token(id_token)
+        decoded = _verify_id_token(id_token)
     except (firebase_auth.InvalidIdTokenError, firebase_auth.ExpiredIdTokenError) as exc:
         logger.warning('Invalid Firebase ID token: %s', exc)
         return None
@@ -150,10 +239,12 @@ def attach_current_user() -> dict:
 
 
 def get_current_user_id() -> Optional[str]:
-    """Get the current user ID without requiring authentication."""
+    """Get the current user ID, resolving it on first use (None on public endpoints)."""
     if hasattr(g, 'current_user_id'):
         return g.current_user_id
-    return None
+    if is_public_endpoint():
+        return None
+    return attach_current_user()['id']
 
 
 def require_current_user() -> str:
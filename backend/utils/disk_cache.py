@@ -0,0 +1,140 @@
+"""
+Persistent Local Cache
+SQLite-backed key/value store with TTL and LRU eviction that survives restarts
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+
+class DiskCache:
+    """JSON value cache stored in a local SQLite file.
+
+    Entries expire after ``ttl`` seconds. When the cache holds more than
+    ``max_entries`` entries or ``max_bytes`` of payload, the least recently
+    read entries are evicted first. Safe to share between threads; several
+    processes may point at the same file (SQLite handles the locking).
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        ttl: float = 86400.0,
+        max_entries: int = 10000,
+        max_bytes: Optional[int] = None,
+        timer: Callable[[], float] = time.time
+    ):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._timer = timer
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if str(path) != ':memory:':
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, timeout=10)
+        with self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                ' key TEXT PRIMARY KEY,'
+                ' value TEXT NOT NULL,'
+                ' size INTEGER NOT NULL,'
+                ' expires_at REAL NOT NULL,'
+                ' accessed_at REAL NOT NULL)'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)')
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the decoded value for ``key`` or ``default`` when absent/expired."""
+        now = self._timer()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, expires_at FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    with self._conn:
+                        self._conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+                self.misses += 1
+                return default
+
+            with self._conn:
+                self._conn.execute('UPDATE cache SET accessed_at = ? WHERE key = ?', (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a JSON-serialisable ``value`` and evict entries beyond the caps."""
+        payload = json.dumps(value, default=str)
+        now = self._timer()
+        lifetime = self.ttl if ttl is None else ttl
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO cache (key, value, size, expires_at, accessed_at)'
+                ' VALUES (?, ?, ?, ?, ?)',
+                (key, payload, len(payload), now + lifetime, now)
+            )
+            self._evict(now)
+
+    def delete(self, key: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM cache')
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute('DELETE FROM cache WHERE expires_at <= ?', (now,))
+
+        count, total = self._conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache'
+        ).fetchone()
+        over_entries = max(0, count - self.max_entries)
+        if over_entries:
+            self._conn.execute(
+                'DELETE FROM cache WHERE key IN '
+                '(SELECT key FROM cache ORDER BY accessed_at ASC LIMIT ?)',
+                (over_entries,)
+            )
+            total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM cache').fetchone()[0]
+
+        if self.max_bytes is not None and total > self.max_bytes:
+            rows = self._conn.execute('SELECT key, size FROM cache ORDER BY accessed_at ASC')
+            doomed = []
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                doomed.append((key,))
+                total -= size
+            self._conn.executemany('DELETE FROM cache WHERE key = ?', doomed)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current occupancy."""
+        with self._lock:
+            count, total = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache'
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                'entries': count,
+                'bytes': total,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,60 @@
+"""
+Batched Firestore Writes
+Commit large sets of writes in as few WriteBatch round trips as possible
+"""
+import logging
+from typing import Any, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Firestore rejects batches with more than 500 writes
+MAX_BATCH_SIZE = 500
+
+# (operation, document_reference, data) with operation in {'set', 'merge', 'update', 'delete'}
+WriteOp = Tuple[str, Any, Optional[dict]]
+
+
+def commit_batched(db, operations: Iterable[WriteOp], batch_size: int = MAX_BATCH_SIZE) -> int:
+    """
+    Apply write operations in chunked WriteBatches
+
+    Each chunk is atomic on its own; a failure in a later chunk leaves the
+    earlier chunks committed.
+
+    Args:
+        db: Firestore client
+        operations: ``(op, ref, data)`` tuples; ``data`` is ignored for deletes
+        batch_size: Writes per commit (capped at 500)
+
+    Returns:
+        Number of batches committed
+    """
+    batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+    batch = db.batch()
+    pending = 0
+    commits = 0
+
+    for op, ref, data in operations:
+        if op == 'set':
+            batch.set(ref, data)
+        elif op == 'merge':
+            batch.set(ref, data, merge=True)
+        elif op == 'update':
+            batch.update(ref, data)
+        elif op == 'delete':
+            batch.delete(ref)
+        else:
+            raise ValueError(f"Unknown batch operation: {op}")
+
+        pending += 1
+        if pending == batch_size:
+            batch.commit()
+            commits += 1
+            batch = db.batch()
+            pending = 0
+
+    if pending:
+        batch.commit()
+        commits += 1
+
+    return commits
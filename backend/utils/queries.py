@@ -0,0 +1,195 @@
+"""
+Firestore Query Helpers
+Shared read patterns (batched dereferencing, range queries, aggregations) used by the route and service modules
+"""
+import logging
+from typing import Dict, Iterable, Optional, Tuple
+
+from google.api_core import exceptions
+from google.cloud.firestore_v1.base_query import FieldFilter
+from google.cloud.firestore_v1.document import DocumentReference
+
+logger = logging.getLogger(__name__)
+
+COUNT = 'count'
+SUM = 'sum'
+AVG = 'avg'
+
+# Aggregation queries are missing from older client libraries and, for
+# sum/avg, from older emulator builds; those fall back to streaming
+_AGGREGATION_UNSUPPORTED = (
+    AttributeError,
+    NotImplementedError,
+    exceptions.MethodNotImplemented,
+    exceptions.InvalidArgument,
+    exceptions.FailedPrecondition,
+)
+
+
+def is_document_reference(value) -> bool:
+    """Return True if ``value`` is a Firestore DocumentReference."""
+    return isinstance(value, DocumentReference)
+
+
+def get_documents(db, refs: Iterable[DocumentReference]) -> Dict[str, object]:
+    """
+    Resolve many document references with a single batched read
+
+    Args:
+        db: Firestore client
+        refs: Document references (duplicates are fetched once)
+
+    Returns:
+        Mapping of document path to snapshot, for documents that exist
+    """
+    unique_refs = {}
+    for ref in refs:
+        if is_document_reference(ref):
+            unique_refs.setdefault(ref.path, ref)
+
+    if not unique_refs:
+        return {}
+
+    return {
+        snapshot.reference.path: snapshot
+        for snapshot in db.get_all(list(unique_refs.values()))
+        if snapshot.exists
+    }
+
+
+def meal_plans_in_range(
+    db,
+    user_id: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
+):
+    """
+    Query a user's meal plans whose planDate falls within [start_date, end_date]
+
+    Dates are 'YYYY-MM-DD' strings, so lexical order matches date order.
+    Backed by the (userId ASC, planDate ASC) composite index declared in
+    firestore.indexes.json, so reads scale with the range, not the history.
+
+    Returns:
+        Firestore query ordered by planDate (either bound may be omitted)
+    """
+    query = db.collection('MealPlan').where(filter=FieldFilter('userId', '==', user_id))
+    if start_date:
+        query = query.where(filter=FieldFilter('planDate', '>=', start_date))
+    if end_date:
+        query = query.where(filter=FieldFilter('planDate', '<=', end_date))
+    return query.order_by('planDate')
+
+
+def daily_nutrition_in_range(db, user_id: str, start_date: str, end_date: str):
+    """
+    Query a user's daily nutrition aggregates (users/{uid}/nutrition) for [start_date, end_date]
+
+    A single-field range on 'date' within the user's subcollection, so no
+    composite index is needed and one query replaces a get() per day.
+
+    Returns:
+        Firestore query ordered by date
+    """
+    return db.collection('users').document(user_id).collection('nutrition').where(
+        filter=FieldFilter('date', '>=', start_date)
+    ).where(
+        filter=FieldFilter('date', '<=', end_date)
+    ).order_by('date')
+
+
+def latest_grocery_list_query(db, user_id: str):
+    """
+    Query for a user's most recently created grocery list
+
+    Backed by the (userId ASC, createdAt DESC) composite index declared in
+    firestore.indexes.json. Only used when the User document's
+    activeGroceryListId pointer is missing or stale.
+    """
+    return db.collection('GroceryList').where(
+        filter=FieldFilter('userId', '==', user_id)
+    ).order_by('createdAt', direction='DESCENDING').limit(1)
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _aggregate_by_streaming(query, aggregations: Dict[str, Tuple[str, Optional[str]]], transaction=None):
+    """Compute aggregations client-side, downloading only the summed/averaged fields."""
+    fields = sorted({field for _, field in aggregations.values() if field})
+    totals = {field: 0.0 for field in fields}
+    counts = {field: 0 for field in fields}
+    matched = 0
+    for doc in query.select(fields).stream(transaction=transaction):
+        matched += 1
+        data = doc.to_dict() or {}
+        for field in fields:
+            value = data.get(field)
+            # Like the server, non-numeric values are ignored by sum/avg
+            if _is_number(value):
+                totals[field] += value
+                counts[field] += 1
+
+    results = {}
+    for alias, (kind, field) in aggregations.items():
+        if kind == COUNT:
+            results[alias] = matched
+        elif kind == SUM:
+            results[alias] = totals[field]
+        else:
+            results[alias] = totals[field] / counts[field] if counts[field] else None
+    return results
+
+
+def aggregate(query, aggregations: Dict[str, Tuple[str, Optional[str]]], transaction=None) -> Dict[str, Optional[float]]:
+    """
+    Run several count/sum/avg aggregations over a query in one round trip
+
+    Aggregations run server-side, so matching documents are counted rather
+    than downloaded (billed as one read per 1000 index entries). Where the
+    client library or emulator does not support them, the query is streamed
+    with a projection of just the needed fields instead.
+
+    Args:
+        query: Firestore query or collection reference
+        aggregations: ``{alias: (COUNT, None) | (SUM, field) | (AVG, field)}``
+        transaction: Optional transaction to read in
+
+    Returns:
+        ``{alias: value}``; sums of no values are 0, averages of no values None
+    """
+    try:
+        aggregation_query = None
+        for alias, (kind, field) in aggregations.items():
+            target = aggregation_query or query
+            if kind == COUNT:
+                aggregation_query = target.count(alias=alias)
+            elif kind == SUM:
+                aggregation_query = target.sum(field, alias=alias)
+            elif kind == AVG:
+                aggregation_query = target.avg(field, alias=alias)
+            else:
+                raise ValueError(f"Unknown aggregation: {kind}")
+        if aggregation_query is None:
+            return {}
+        rows = aggregation_query.get(transaction=transaction)
+        return {result.alias: result.value for row in rows for result in row}
+    except _AGGREGATION_UNSUPPORTED as e:
+        logger.debug(f"Aggregation query unavailable ({e}); streaming instead")
+        return _aggregate_by_streaming(query, aggregations, transaction)
+
+
+def count_documents(query, transaction=None) -> int:
+    """Number of documents matching ``query``."""
+    return int(aggregate(query, {'count': (COUNT, None)}, transaction)['count'] or 0)
+
+
+def sum_field(query, field: str, transaction=None) -> float:
+    """Sum of the numeric values of ``field`` over ``query``."""
+    return aggregate(query, {'sum': (SUM, field)}, transaction)['sum'] or 0
+
+
+def avg_field(query, field: str, transaction=None) -> Optional[float]:
+    """Average of the numeric values of ``field`` over ``query`` (None if there are none)."""
+    return aggregate(query, {'avg': (AVG, field)}, transaction)['avg']
@@ -0,0 +1,108 @@
+"""
+Image Upload Handling
+Accept scanner images as multipart/form-data, raw image/* bodies or legacy base64 JSON
+"""
+import tempfile
+from typing import Any, BinaryIO, Dict, Optional, Tuple, Union
+
+from flask import request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from config import config
+
+# Raw bodies larger than this spill from memory to a temporary file
+SPOOL_MEMORY_BYTES = 1024 * 1024
+_CHUNK_BYTES = 64 * 1024
+
+# Base64 inflates payloads by 4/3; allow for that (plus the JSON wrapper) on legacy uploads
+_BASE64_OVERHEAD = 4 / 3
+_JSON_SLACK_BYTES = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds MAX_IMAGE_UPLOAD_BYTES"""
+    pass
+
+
+def _coerce(value: str) -> Union[str, bool]:
+    lowered = value.strip().lower()
+    if lowered in ('true', '1', 'yes'):
+        return True
+    if lowered in ('false', '0', 'no'):
+        return False
+    return value
+
+
+def _spool_stream(stream: BinaryIO, max_bytes: int) -> Optional[BinaryIO]:
+    """Copy a request stream into a spooled temp file, aborting past ``max_bytes``."""
+    spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES)
+    total = 0
+    while True:
+        chunk = stream.read(_CHUNK_BYTES)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            spooled.close()
+            raise UploadTooLarge(f'Image exceeds the {max_bytes // (1024 * 1024)} MB upload limit')
+        spooled.write(chunk)
+    if not total:
+        spooled.close()
+        return None
+    spooled.seek(0)
+    return spooled
+
+
+def read_image_upload(max_bytes: Optional[int] = None) -> Tuple[Optional[Union[BinaryIO, str]], Dict[str, Any]]:
+    """
+    Extract the scanner image and its options from the current request
+
+    Supported bodies:
+        - multipart/form-data with an ``image`` file part; other form fields are options
+        - raw ``image/*`` body streamed to a spooled temp file; options come from the query string
+        - JSON ``{"image": "<base64>", ...}`` (legacy clients)
+
+    The size limit is checked against Content-Length before anything is
+    buffered, and enforced while streaming bodies without one.
+
+    Returns:
+        ``(image, options)``; image is a seekable binary file or a base64
+        string (None if missing). Form/query flags such as "true" are
+        converted to booleans.
+
+    Raises:
+        UploadTooLarge: If the upload exceeds ``max_bytes`` (MAX_IMAGE_UPLOAD_BYTES)
+    """
+    max_bytes = max_bytes or config.MAX_IMAGE_UPLOAD_BYTES
+    mimetype = request.mimetype or ''
+    limit_message = f'Image exceeds the {max_bytes // (1024 * 1024)} MB upload limit'
+
+    if mimetype == 'application/json':
+        json_limit = int(max_bytes * _BASE64_OVERHEAD) + _JSON_SLACK_BYTES
+        if request.content_length and request.content_length > json_limit:
+            raise UploadTooLarge(limit_message)
+        data = request.get_json(silent=True) or {}
+        image = data.get('image')
+        return (image if isinstance(image, str) and image else None), data
+
+    if request.content_length and request.content_length > max_bytes:
+        raise UploadTooLarge(limit_message)
+
+    if mimetype == 'multipart/form-data':
+        # Werkzeug already spools file parts to disk; hand the stream over as-is
+        try:
+            request.max_content_length = max_bytes
+        except AttributeError:  # Read-only before Flask 3.1 - the Content-Length check covers it
+            pass
+        try:
+            options = {key: _coerce(value) for key, value in request.form.items()}
+            upload = request.files.get('image')
+        except RequestEntityTooLarge:
+            raise UploadTooLarge(limit_message)
+        return (upload.stream if upload is not None else None), options
+
+    options = {key: _coerce(value) for key, value in request.args.items()}
+    if mimetype.startswith('image/') or mimetype == 'application/octet-stream':
+        return _spool_stream(request.stream, max_bytes), options
+
+    return None, options